@@ -7,16 +7,13 @@ from pydantic import BaseModel, Field
 from langchain_core.tools import BaseTool
 
 # Import Logic from Phase 1 (Data Foundation)
-from knowledge_engine.core.database import GraphDatabaseManager
-from knowledge_engine.core.config import settings as knowledge_settings
-from llama_index.core import PropertyGraphIndex
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
+from knowledge_engine.retrieval.engine import get_retrieval_engine
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 from governance.auth.models import UserIdentity
 from governance.policy.access_control import AccessControlPolicy
-from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.database import AsyncGraphDatabaseManager
+from knowledge_engine.core.queries import register_query
 
 # Import Agent Settings for Redis/Caching config
 from agent_service.core.config import agent_settings
@@ -28,6 +25,17 @@ try:
 except Exception:
     redis_client = None
 
+# --- QUERIES ---
+# {rls}: the caller's row-level security predicate on d (AccessControlPolicy)
+SECURE_SEARCH_QUERY = register_query("retrieval.secure_entity_search", """
+    CALL db.index.fulltext.queryNodes("entity_name_index", $query) YIELD node, score
+    WITH node, score
+    MATCH (node)-[:MENTIONS]->(d:Document)
+    WHERE {rls}  // <--- RLS APPLIED HERE
+    RETURN node.name as entity, d.file_name as source, node.text as text
+    LIMIT 5
+""")
+
 # --- INPUT SCHEMA ---
 class HybridSearchInput(BaseModel):
     query: str = Field(
@@ -51,27 +59,12 @@ class HybridSearchTool(BaseTool):
         This is separated so we can run it in a thread for async support.
         """
         try:
-            # 1. Get Singleton DB Connection
-            db_manager = GraphDatabaseManager.get_instance()
-            store = db_manager.get_store()
-            
-            # 2. Reconstruct Index (Lightweight operation, connects to existing store)
-            # In a high-load scenario, this index object could be cached as a singleton too.
-            index = PropertyGraphIndex.from_existing(
-                property_graph_store=store,
-                llm=OpenAI(model=knowledge_settings.OPENAI_MODEL, temperature=0),
-                embed_model=OpenAIEmbedding(model_name=knowledge_settings.EMBEDDING_MODEL),
-            )
-            
-            # 3. Configure Retriever (Hybrid Mode: Vector + Graph traversal)
-            retriever = index.as_retriever(
-                include_text=True,
-                vector_store_query_mode="hybrid",
-                similarity_top_k=5  # Retrieve top 5 most relevant chunks
-            )
+            # 1-3. Process-wide index, clients and hybrid retriever (Vector + Graph traversal),
+            # built once instead of per call
+            engine = get_retrieval_engine()
             
             # 4. Execute Retrieval
-            nodes = retriever.retrieve(query)
+            nodes = engine.retrieve(query, similarity_top_k=5)  # Retrieve top 5 most relevant chunks
             
             if not nodes:
                 return "No relevant information found in the knowledge base."
@@ -103,8 +96,10 @@ class HybridSearchTool(BaseTool):
         """
         # 1. Extract User Identity from LangGraph Config
         user_identity = None
+        bookmarks = None
         if config and "configurable" in config:
             user_identity = config["configurable"].get("user_identity")
+            bookmarks = config["configurable"].get("graph_bookmarks")
             
         if not user_identity:
             # Fail closed if no identity is present in a secured env
@@ -114,25 +109,18 @@ class HybridSearchTool(BaseTool):
         rls = AccessControlPolicy.get_rls_filters(user_identity)
         
         # 3. Execute Search (Modified Logic)
-        return await self._execute_secure_search(query, rls)
+        return await self._execute_secure_search(query, rls, bookmarks)
 
-    async def _execute_secure_search(self, query: str, rls: dict) -> str:
-        # ... Init DB ...
-        db_manager = GraphDatabaseManager.get_instance()
+    async def _execute_secure_search(self, query: str, rls: dict, bookmarks: Optional[List[str]] = None) -> str:
+        # Async driver: the Neo4j round trip does not block the event loop
+        db_manager = AsyncGraphDatabaseManager.get_instance()
 
-        cypher_query = f"""
-            CALL db.index.fulltext.queryNodes("entity_name_index", $query) YIELD node, score
-            WITH node, score
-            MATCH (node)-[:MENTIONS]->(d:Document)
-            WHERE {rls['cypher']}  // <--- RLS APPLIED HERE
-            RETURN node.name as entity, d.file_name as source, node.text as text
-            LIMIT 5
-        """
+        cypher_query = SECURE_SEARCH_QUERY.substitute(rls=rls['cypher'])
         
         # Merge params
         params = {"query": query, **rls['params']}
         
-        results = db_manager.run_cypher(cypher_query, params)
+        results = await db_manager.execute_read(cypher_query, params, bookmarks=bookmarks)
         
         if not results:
             return "No relevant information found (or access denied)."
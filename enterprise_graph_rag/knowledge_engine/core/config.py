@@ -1,3 +1,4 @@
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -9,11 +10,31 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = Field(..., description="Required OpenAI Key")
     OPENAI_MODEL: str = "gpt-4o"
     EMBEDDING_MODEL: str = "text-embedding-3-small"
+    # Must match EMBEDDING_MODEL's output size; used when creating vector indexes
+    EMBEDDING_DIMENSIONS: int = 1536
 
     # Neo4j
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USERNAME: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    # Optimization: Lazy Shared Driver
+    # One pool per process for raw Cypher and the graph store; seconds to wait for a free connection
+    NEO4J_MAX_POOL_SIZE: int = 50
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 60.0
+    NEO4J_MAX_CONNECTION_LIFETIME: int = 200
+    # Optimization: Cluster Routing
+    # Use with a neo4j:// URI: reads open READ sessions (followers / read replicas), writes
+    # WRITE sessions, and sessions share bookmarks for read-your-writes. Off = single instance.
+    NEO4J_ROUTING_ENABLED: bool = False
+    # Optimization: Query Observability
+    # Queries at/over the threshold are logged with redacted parameters;
+    # this share of named executions runs under PROFILE (plan + db hits logged)
+    SLOW_QUERY_THRESHOLD_MS: float = 500
+    QUERY_PROFILE_SAMPLE_RATE: float = 0.0
+    # Optimization: Async Graph Access
+    # Connections in the async driver's pool (API / agent) and records fetched per round trip
+    NEO4J_ASYNC_POOL_SIZE: int = 100
+    NEO4J_FETCH_SIZE: int = 1000
     
     # Resiliency
     MAX_RETRIES: int = 3
@@ -26,6 +47,94 @@ class Settings(BaseSettings):
     # Optimization: Ingestion Concurrency
     # Limit parallel LLM requests to avoid RateLimits (429 Errors)
     INGESTION_CONCURRENCY: int = 5 
+    # Upper bound the AIMD scheduler may ramp up to while requests succeed
+    INGESTION_MAX_CONCURRENCY: int = 32
+
+    # Optimization: Streaming Ingestion
+    # Chunks per extraction window, windows buffered between stages, and indexing workers
+    INGESTION_WINDOW_SIZE: int = 64
+    INGESTION_QUEUE_SIZE: int = 4
+    INGESTION_INDEX_WORKERS: int = 2
+
+    # Optimization: Stage Split
+    # "all" runs parse + extract here; "parse" only parses into the spool dir;
+    # "extract" only indexes what is in the spool dir. 0 parse workers = one per core.
+    INGESTION_STAGES: Literal["all", "parse", "extract"] = "all"
+    INGESTION_PARSE_WORKERS: int = 0
+    INGESTION_SPOOL_DIR: str = "./data/.parsed_spool"
+
+    # Optimization: Delta Load Manifest
+    # Local record of file stat + hash so unchanged files are never re-read
+    MANIFEST_PATH: str = "./data/.ingestion_manifest.db"
+    HASH_WORKERS: int = 8
+    # Candidate hashes per membership query, and how long confirmed hashes are trusted locally
+    HASH_CHECK_BATCH_SIZE: int = 1000
+    KNOWN_HASH_CACHE_TTL: int = 300
+
+    # Optimization: Chunk-level Extraction Cache
+    # Backend: "sqlite" (local), "redis" (shared, falls back to sqlite), or "none"
+    EXTRACTION_CACHE_BACKEND: str = "sqlite"
+    EXTRACTION_CACHE_PATH: str = "./data/.extraction_cache.db"
+    EXTRACTION_CACHE_REDIS_URL: Optional[str] = None
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 500_000
+
+    # Optimization: Extraction Pre-filter
+    # Backend: "lexical", "spacy" (NER via the model Presidio uses, plus lexical) or "none".
+    # Chunks scoring below the threshold are embedded but not sent to the LLM.
+    PREFILTER_BACKEND: str = "lexical"
+    PREFILTER_THRESHOLD: float = 0.2
+    PREFILTER_SPACY_MODEL: str = "en_core_web_lg"
+
+    # Optimization: Near-duplicate Chunks
+    # Chunks whose MinHash similarity to an extracted chunk reaches the threshold reuse its triples
+    NEAR_DUP_ENABLED: bool = True
+    NEAR_DUP_THRESHOLD: float = 0.9
+    NEAR_DUP_NUM_PERM: int = 128
+    NEAR_DUP_SHINGLE_SIZE: int = 5
+    NEAR_DUP_MAX_ENTRIES: int = 200_000
+
+    # Optimization: Embedding Service
+    # Inputs / approx. tokens per provider request, and the on-disk cache keyed by (model, text hash)
+    EMBEDDING_BATCH_SIZE: int = 2048
+    EMBEDDING_BATCH_MAX_TOKENS: int = 250_000
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "./data/.embedding_cache"
+    # Query embeddings are cached in memory only, per process
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10_000
+
+    # Optimization: Crash-safe Resume
+    # Per-chunk stage journal (parsed / extracted / embedded / written) read back by retried tasks
+    INGESTION_JOURNAL_ENABLED: bool = True
+    INGESTION_JOURNAL_PATH: str = "./data/.ingestion_journal.db"
+
+    # Optimization: Update Mode
+    # A modified file is diffed chunk-by-chunk against its previous version
+    INGESTION_UPDATE_MODE: bool = True
+
+    # Optimization: Bulk Graph Writes
+    # Rows buffered before an UNWIND flush, max seconds a row may wait, retries on transient errors
+    GRAPH_WRITE_BATCH_SIZE: int = 2000
+    GRAPH_WRITE_FLUSH_INTERVAL: float = 2.0
+    GRAPH_WRITE_MAX_RETRIES: int = 5
+
+    # Optimization: Entity Resolution
+    # Blocking prefix length; same-name pairs merge, other pairs above the candidate
+    # threshold merge only if their embeddings agree
+    RESOLUTION_PREFIX_LENGTH: int = 4
+    RESOLUTION_CANDIDATE_THRESHOLD: float = 0.75
+    RESOLUTION_EMBEDDING_THRESHOLD: float = 0.9
+    RESOLUTION_MAX_BLOCK_SIZE: int = 1000
+    RESOLUTION_MAX_CLUSTER_SIZE: int = 50
+    RESOLUTION_BATCH_SIZE: int = 500
+    RESOLUTION_REPORT_DIR: str = "./data/resolution_reports"
+
+    # Optimization: Batched Cleanup
+    # Nodes / relationships deleted per transaction by cleanup and wipes
+    CLEANUP_BATCH_SIZE: int = 10_000
+    # Coalesced post-ingestion cleanup: at most one pass per interval; the fleet-wide
+    # lock expires after the timeout if its holder dies
+    CLEANUP_INTERVAL_SECONDS: int = 300
+    CLEANUP_LOCK_TIMEOUT: int = 3600
 
     ALLOWED_ENTITY_TYPES: List[str] = ["Person", "Organization", "Project", "Location", "Topic", "Document"]
     ALLOWED_RELATION_TYPES: List[str] = ["MANAGES", "REPORTS_TO", "WORKS_ON", "LOCATED_AT", "MENTIONS", "HAS_TOPIC"]
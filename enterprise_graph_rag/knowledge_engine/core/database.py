@@ -1,24 +1,205 @@
 import logging
-from typing import Any, List, Dict
-from neo4j import GraphDatabase, Driver
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+from neo4j import (
+    READ_ACCESS, WRITE_ACCESS, AsyncDriver, AsyncGraphDatabase, Bookmarks, Driver, GraphDatabase
+)
 from neo4j.exceptions import ServiceUnavailable, AuthError
 from tenacity import retry, stop_after_attempt, wait_fixed
 from llama_index.graph_stores.neo4j import Neo4jPropertyGraphStore
+from llama_index.graph_stores.neo4j.neo4j_property_graph import VECTOR_INDEX_NAME
 
 from knowledge_engine.core.config import settings
 from knowledge_engine.core.exceptions import DatabaseConnectionError
 from knowledge_engine.core.logging import logger
+from knowledge_engine.core.queries import QueryTimer, query_name, register_query
+
+# iter_cypher row formats
+ROW_FORMATS = ("dict", "tuple", "columns")
+
+# Label of the nodes recording applied migrations; kept by graph cleanup and wipes
+MIGRATION_LABEL = "__SchemaMigration"
+
+APPLIED_MIGRATIONS_QUERY = register_query(
+    "migrations.applied", f"MATCH (m:{MIGRATION_LABEL}) RETURN m.version AS version, m.checksum AS checksum"
+)
+RECORD_MIGRATION_QUERY = register_query("migrations.record", f"""
+MERGE (m:{MIGRATION_LABEL} {{version: $version}})
+SET m.name = $name, m.checksum = $checksum, m.applied_at = timestamp()
+""")
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One versioned schema step. Statements are idempotent (IF NOT EXISTS), so a
+    step that was interrupted half-way can simply be re-run. `backs` lists the
+    queries the step makes index-backed, for the migration report.
+    """
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+    backs: Tuple[str, ...] = ()
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256("\n".join(self.statements).encode("utf-8")).hexdigest()[:16]
+
+
+def build_migrations(embedding_dimensions: int) -> List[Migration]:
+    """The schema, in order. Append new steps; never edit an applied one."""
+    return [
+        Migration(
+            version=1,
+            name="ingestion_keys",
+            statements=(
+                "CREATE CONSTRAINT document_file_hash_unique IF NOT EXISTS "
+                "FOR (d:Document) REQUIRE d.file_hash IS UNIQUE",
+                "CREATE INDEX document_file_path IF NOT EXISTS FOR (d:Document) ON (d.file_path)",
+                "CREATE INDEX chunk_file_path IF NOT EXISTS FOR (c:Chunk) ON (c.file_path)",
+                "CREATE INDEX chunk_file_hash IF NOT EXISTS FOR (c:Chunk) ON (c.file_hash)",
+                # The graph store creates an equivalent one; this keeps it independent of the store
+                "CREATE CONSTRAINT node_id_unique IF NOT EXISTS FOR (n:__Node__) REQUIRE n.id IS UNIQUE",
+            ),
+            backs=(
+                "IngestionPipeline._get_processed_hashes: MATCH (d:Document {file_hash})",
+                "BulkGraphWriter links: MERGE (d:Document {file_hash})",
+                "IngestionPipeline._get_previous_chunk_hashes: MATCH (d:Document {file_path})",
+                "IngestionPipeline._apply_document_update: MATCH (c:Chunk {file_path})",
+                "BulkGraphWriter: MERGE / MATCH (n:__Node__ {id})",
+            ),
+        ),
+        Migration(
+            version=2,
+            name="entity_name_lookup",
+            statements=(
+                "CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)",
+                "CREATE INDEX base_entity_name IF NOT EXISTS FOR (e:__Entity__) ON (e.name)",
+            ),
+            backs=(
+                "Exact entity lookups: MATCH (e:Entity {name}) / (e:__Entity__ {name})",
+            ),
+        ),
+        Migration(
+            version=3,
+            name="entity_name_fulltext",
+            statements=(
+                "CREATE FULLTEXT INDEX entity_name_index IF NOT EXISTS "
+                "FOR (n:__Entity__|Entity) ON EACH [n.name]",
+            ),
+            backs=(
+                "HybridSearchTool._execute_secure_search: db.index.fulltext.queryNodes('entity_name_index')",
+            ),
+        ),
+        Migration(
+            version=4,
+            name="vector_indexes",
+            statements=(
+                # Same name as the graph store's index so its retrievers use it
+                f"CREATE VECTOR INDEX {VECTOR_INDEX_NAME} IF NOT EXISTS "
+                "FOR (e:__Entity__) ON (e.embedding) OPTIONS {indexConfig: {"
+                f"`vector.dimensions`: {int(embedding_dimensions)}, "
+                "`vector.similarity_function`: 'cosine'}}",
+                "CREATE VECTOR INDEX chunk_embedding IF NOT EXISTS "
+                "FOR (c:Chunk) ON (c.embedding) OPTIONS {indexConfig: {"
+                f"`vector.dimensions`: {int(embedding_dimensions)}, "
+                "`vector.similarity_function`: 'cosine'}}",
+            ),
+            backs=(
+                f"PropertyGraphIndex vector retrieval: db.index.vector.queryNodes('{VECTOR_INDEX_NAME}')",
+                "Chunk similarity search: db.index.vector.queryNodes('chunk_embedding')",
+            ),
+        ),
+        Migration(
+            version=5,
+            name="entity_normalized_name",
+            statements=(
+                "CREATE INDEX entity_normalized_name IF NOT EXISTS FOR (e:__Entity__) ON (e.normalized_name)",
+                # Entities written before the key existed (same rule as normalize_entity_name)
+                "MATCH (e:__Entity__) WHERE e.normalized_name IS NULL AND e.name IS NOT NULL "
+                "CALL { WITH e SET e.normalized_name = toLower(trim(e.name)) } IN TRANSACTIONS OF 10000 ROWS",
+            ),
+            backs=(
+                "EntityResolver.fetch_neighbours: MATCH (e:__Entity__) WHERE e.normalized_name STARTS WITH $prefix",
+            ),
+        ),
+        Migration(
+            version=6,
+            name="entity_id_unique",
+            statements=(
+                # Was created by the graph store's constructor, which no longer runs
+                "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS FOR (n:__Entity__) REQUIRE n.id IS UNIQUE",
+            ),
+            backs=(
+                "Graph store entity lookups: MATCH (e:__Entity__ {id})",
+            ),
+        ),
+    ]
+
+
+def driver_config() -> Dict[str, Any]:
+    """Pool settings shared by the sync and async drivers."""
+    return {
+        "auth": (settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
+        "max_connection_lifetime": settings.NEO4J_MAX_CONNECTION_LIFETIME,
+        "connection_acquisition_timeout": settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "connection_timeout": settings.CONNECTION_TIMEOUT,
+    }
+
+
+class SharedDriverGraphStore(Neo4jPropertyGraphStore):
+    """
+    Neo4jPropertyGraphStore on drivers the managers already own. The parent
+    constructor opens a sync and an async driver of its own, introspects the
+    schema and creates indexes; the migrations own the schema here, so only
+    the version probe (vector index support) is kept.
+    """
+
+    def __init__(self, driver: Driver, async_driver: AsyncDriver, database: Optional[str] = None):
+        self.sanitize_query_output = True
+        self.enhanced_schema = False
+        self._apoc_meta_config = {}
+        self._driver = driver
+        self._async_driver = async_driver
+        self._database = database
+        self._timeout = None
+        self.structured_schema = {}
+        self.verify_version()
+
+    def close(self) -> None:
+        # The drivers belong to the managers
+        pass
+
 
 class GraphDatabaseManager:
+    """
+    Optimization: Lazy Shared Driver
+    Construction does no I/O: the driver opens connections on first use, and
+    the first query (or get_store / ensure_ready) applies pending migrations.
+    Raw Cypher and the LlamaIndex store share the one connection pool.
+    """
     _instance = None
+    # Bumped whenever this process applies a migration; cached retrieval state keys on it
+    schema_generation = 0
     
     def __init__(self):
         if GraphDatabaseManager._instance is not None:
             raise RuntimeError("Use get_instance()")
         
-        self._driver: Driver = None
-        self._store: Neo4jPropertyGraphStore = None
-        self._connect()
+        self._driver: Driver = GraphDatabase.driver(
+            settings.NEO4J_URI,
+            max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+            **driver_config(),
+        )
+        self._store: Optional[Neo4jPropertyGraphStore] = None
+        # Fed by every session of this process when routing is on (read-your-writes)
+        self._bookmark_manager = GraphDatabase.bookmark_manager()
+        self.migration_report: List[Dict[str, Any]] = []
+        self._ready = False
+        self._preparing = False
+        # Re-entrant: migrate() runs its statements through run_cypher
+        self._ready_lock = threading.RLock()
         GraphDatabaseManager._instance = self
 
     @classmethod
@@ -27,32 +208,106 @@ class GraphDatabaseManager:
             cls()
         return cls._instance
 
+    def ensure_ready(self):
+        """Connects and migrates once per process; later calls return immediately."""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready or self._preparing:
+                return
+            self._preparing = True
+            try:
+                self._connect()
+            finally:
+                self._preparing = False
+            self._ready = True
+
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
     def _connect(self):
         try:
             logger.info("connecting_to_neo4j", uri=settings.NEO4J_URI)
-            self._driver = GraphDatabase.driver(
-                settings.NEO4J_URI, 
-                auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
-                max_connection_lifetime=200
-            )
             # Verify connectivity
             self._driver.verify_connectivity()
-            
-            # Initialize LlamaIndex Store
-            self._store = Neo4jPropertyGraphStore(
-                username=settings.NEO4J_USERNAME,
-                password=settings.NEO4J_PASSWORD,
-                url=settings.NEO4J_URI,
-            )
+            self.migration_report = self.migrate()
             logger.info("neo4j_connected_successfully")
         except (ServiceUnavailable, AuthError) as e:
             logger.error("neo4j_connection_failed", error=str(e))
             raise DatabaseConnectionError(f"Failed to connect to Neo4j: {str(e)}")
 
+    def migrate(self, migrations: Optional[List[Migration]] = None) -> List[Dict[str, Any]]:
+        """
+        Applies pending schema migrations and records each one as a
+        (:__SchemaMigration) node. Returns a report of every step and the
+        queries it makes index-backed.
+        """
+        migrations = migrations or build_migrations(settings.EMBEDDING_DIMENSIONS)
+        applied = {
+            r['version']: r['checksum']
+            for r in self.run_cypher(APPLIED_MIGRATIONS_QUERY)
+        }
+
+        report = []
+        for migration in migrations:
+            entry = {"version": migration.version, "name": migration.name, "backs": list(migration.backs)}
+            report.append(entry)
+
+            if migration.version in applied:
+                entry["status"] = "applied"
+                if applied[migration.version] != migration.checksum:
+                    # e.g. EMBEDDING_DIMENSIONS changed: the index must be dropped by hand
+                    entry["status"] = "changed"
+                    logger.warning("schema_migration_changed", version=migration.version, name=migration.name)
+                continue
+
+            try:
+                for statement in migration.statements:
+                    self.run_cypher(statement)
+            except Exception as e:
+                # e.g. duplicate data blocks a constraint; keep serving, retry next start
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+                logger.warning("schema_migration_failed", version=migration.version, name=migration.name, error=str(e))
+                continue
+
+            self.run_cypher(
+                RECORD_MIGRATION_QUERY,
+                {"version": migration.version, "name": migration.name, "checksum": migration.checksum}
+            )
+            entry["status"] = "new"
+            self.schema_generation += 1
+            logger.info("schema_migration_applied", version=migration.version, name=migration.name)
+
+        return report
+
     def get_store(self) -> Neo4jPropertyGraphStore:
+        if self._store is None:
+            self.ensure_ready()
+            # Async store methods go through the async manager's (also lazy) driver
+            self._store = SharedDriverGraphStore(
+                self._driver, AsyncGraphDatabaseManager.get_instance()._get_driver()
+            )
         return self._store
 
+    def _session(self, access: str = "write", bookmarks: Optional[Iterable[str]] = None, **config):
+        """
+        Optimization: Cluster Routing
+        With NEO4J_ROUTING_ENABLED (and a neo4j:// URI), read sessions go to
+        followers / read replicas and write sessions to the leader. All
+        sessions share the process bookmark manager, and `bookmarks` from
+        another process (e.g. an ingestion task's) make a read wait for those
+        writes. Off, every session is a default one, as on a single instance.
+        """
+        if settings.NEO4J_ROUTING_ENABLED:
+            config["default_access_mode"] = READ_ACCESS if access == "read" else WRITE_ACCESS
+            config["bookmark_manager"] = self._bookmark_manager
+            if bookmarks:
+                config["bookmarks"] = Bookmarks.from_raw_values(bookmarks)
+        return self._driver.session(**config)
+
+    def last_bookmarks(self) -> List[str]:
+        """Bookmarks of this process's writes, to hand to readers elsewhere."""
+        return sorted(self._bookmark_manager.get_bookmarks())
+
     def health_check(self) -> bool:
         try:
             self._driver.verify_connectivity()
@@ -60,20 +315,199 @@ class GraphDatabaseManager:
         except Exception:
             return False
 
-    def run_cypher(self, query: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Safe execution of Cypher queries."""
+    def run_cypher(self, query: str, params: Dict[str, Any] = None, access: str = "write",
+                   bookmarks: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Safe execution of Cypher queries. Pass access="read" for queries that only read."""
         if not self._driver:
             raise DatabaseConnectionError("Driver not initialized")
+        self.ensure_ready()
         
-        with self._driver.session() as session:
+        with self._session(access, bookmarks) as session:
             try:
-                result = session.run(query, params or {})
-                return [record.data() for record in result]
+                with QueryTimer(query, access, params) as timer:
+                    result = session.run(timer.text, params or {})
+                    rows = [record.data() for record in result]
+                    timer.finish(len(rows), result.consume().profile if timer.profiled else None)
+                return rows
             except Exception as e:
-                logger.error("cypher_execution_failed", query=query, error=str(e))
+                logger.error("cypher_execution_failed", query_name=query_name(query), query=query, error=str(e))
+                raise e
+
+    def iter_cypher(self, query: str, params: Dict[str, Any] = None, fetch_size: Optional[int] = None,
+                    row_format: str = "dict", access: str = "write",
+                    bookmarks: Optional[Iterable[str]] = None) -> Iterator[Any]:
+        """
+        Optimization: Streaming Results
+        Yields results as the server sends them, fetch_size records per round
+        trip, instead of building the whole list like run_cypher. row_format:
+          "dict"    one dict per record (as run_cypher)
+          "tuple"   one tuple per record, values in RETURN order (raw driver values)
+          "columns" one {column: [values]} dict per fetch_size records
+        The session stays open until the iterator is exhausted or closed.
+        """
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+        if not self._driver:
+            raise DatabaseConnectionError("Driver not initialized")
+        self.ensure_ready()
+        fetch_size = fetch_size or settings.NEO4J_FETCH_SIZE
+
+        with self._session(access, bookmarks, fetch_size=fetch_size) as session:
+            try:
+                # Timed until the stream ends, so consumer time is included
+                with QueryTimer(query, access, params, allow_profile=False) as timer:
+                    result = session.run(query, params or {})
+                    if row_format == "dict":
+                        for record in result:
+                            timer.rows += 1
+                            yield record.data()
+                    elif row_format == "tuple":
+                        for record in result:
+                            timer.rows += 1
+                            yield tuple(record.values())
+                    else:
+                        keys = result.keys()
+                        batch = []
+                        for record in result:
+                            timer.rows += 1
+                            batch.append(record.values())
+                            if len(batch) == fetch_size:
+                                yield dict(zip(keys, map(list, zip(*batch))))
+                                batch = []
+                        if batch:
+                            yield dict(zip(keys, map(list, zip(*batch))))
+            except Exception as e:
+                logger.error("cypher_execution_failed", query_name=query_name(query), query=query, error=str(e))
+                raise e
+
+    def run_write_transaction(self, statements: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Runs several statements atomically in one managed write transaction."""
+        self.run_planned_write_transaction(lambda read: statements)
+
+    def run_planned_write_transaction(
+        self, plan: Callable[[Callable[..., List[Dict[str, Any]]]], List[Tuple[str, Dict[str, Any]]]]
+    ) -> None:
+        """
+        Like run_write_transaction, for statements that depend on the graph:
+        plan(read) returns them, where read(query, params) runs a query in the
+        same write transaction (on the leader) and returns its rows. plan runs
+        again if the driver retries the transaction.
+        """
+        if not self._driver:
+            raise DatabaseConnectionError("Driver not initialized")
+        self.ensure_ready()
+        statements: List[Tuple[str, Dict[str, Any]]] = []
+
+        def _work(tx):
+            def read(query: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+                with QueryTimer(query, "write", params) as timer:
+                    result = tx.run(timer.text, params or {})
+                    rows = [record.data() for record in result]
+                    timer.finish(len(rows), result.consume().profile if timer.profiled else None)
+                return rows
+
+            statements[:] = plan(read)
+            for query, params in statements:
+                with QueryTimer(query, "write", params) as timer:
+                    summary = tx.run(timer.text, params or {}).consume()
+                    timer.finish(0, summary.profile if timer.profiled else None)
+
+        with self._session("write") as session:
+            try:
+                session.execute_write(_work)
+            except Exception as e:
+                logger.error("write_transaction_failed", statements=len(statements), error=str(e))
                 raise e
 
     def close(self):
         if self._driver:
             self._driver.close()
-            logger.info("neo4j_driver_closed")
\ No newline at end of file
+            logger.info("neo4j_driver_closed")
+
+
+class AsyncGraphDatabaseManager:
+    """
+    Optimization: Async Graph Access
+    Non-blocking counterpart of GraphDatabaseManager for code running on an
+    event loop (FastAPI routes, LangGraph tools). Queries run as managed
+    read/write transactions on the async driver's own connection pool, so a
+    Neo4j round trip yields the loop instead of stalling every other request.
+
+    The driver is created on first use and belongs to that event loop. Schema
+    migrations stay with the sync manager, which runs them at startup.
+    """
+    _instance = None
+
+    def __init__(self):
+        if AsyncGraphDatabaseManager._instance is not None:
+            raise RuntimeError("Use get_instance()")
+
+        self._driver: Optional[AsyncDriver] = None
+        self._bookmark_manager = AsyncGraphDatabase.bookmark_manager()
+        AsyncGraphDatabaseManager._instance = self
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls()
+        return cls._instance
+
+    def _get_driver(self) -> AsyncDriver:
+        if self._driver is None:
+            logger.info("connecting_to_neo4j_async", uri=settings.NEO4J_URI)
+            self._driver = AsyncGraphDatabase.driver(
+                settings.NEO4J_URI,
+                max_connection_pool_size=settings.NEO4J_ASYNC_POOL_SIZE,
+                **driver_config(),
+            )
+        return self._driver
+
+    async def _execute(self, access: str, query: str, params: Optional[Dict[str, Any]],
+                       bookmarks: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        async def _work(tx):
+            with QueryTimer(query, access, params) as timer:
+                result = await tx.run(timer.text, params or {})
+                rows = await result.data()
+                timer.finish(len(rows), (await result.consume()).profile if timer.profiled else None)
+            return rows
+
+        # fetch_size: records pulled per round trip while the result is consumed
+        config: Dict[str, Any] = {"fetch_size": settings.NEO4J_FETCH_SIZE}
+        if settings.NEO4J_ROUTING_ENABLED:
+            # execute_read / execute_write already route; bookmarks add read-your-writes
+            config["bookmark_manager"] = self._bookmark_manager
+            if bookmarks:
+                config["bookmarks"] = Bookmarks.from_raw_values(bookmarks)
+        async with self._get_driver().session(**config) as session:
+            try:
+                run = session.execute_read if access == "read" else session.execute_write
+                return await run(_work)
+            except Exception as e:
+                logger.error("cypher_execution_failed", query_name=query_name(query), query=query,
+                             access=access, error=str(e))
+                raise e
+
+    async def execute_read(self, query: str, params: Dict[str, Any] = None,
+                           bookmarks: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Read query in a managed transaction (retried on transient errors).
+        `bookmarks` (e.g. from an ingestion task) make it see those writes.
+        """
+        return await self._execute("read", query, params, bookmarks)
+
+    async def execute_write(self, query: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Write query in a managed transaction (retried on transient errors)."""
+        return await self._execute("write", query, params)
+
+    async def health_check(self) -> bool:
+        try:
+            await self._get_driver().verify_connectivity()
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        if self._driver:
+            await self._driver.close()
+            self._driver = None
+            logger.info("neo4j_async_driver_closed")
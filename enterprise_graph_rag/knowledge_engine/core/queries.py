@@ -0,0 +1,155 @@
+import time
+import random
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.logging import logger
+
+# Metric label of queries passed as plain strings (migrations, one-off scripts)
+ADHOC = "adhoc"
+
+QUERY_SECONDS = Histogram(
+    "graph_query_duration_seconds",
+    "Neo4j query latency by registered query name",
+    ["query", "access"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+QUERY_ROWS = Histogram(
+    "graph_query_rows",
+    "Rows returned per Neo4j query execution",
+    ["query"],
+    buckets=(0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+QUERY_ERRORS = Counter("graph_query_errors_total", "Failed Neo4j query executions", ["query"])
+
+
+class CypherQuery(str):
+    """
+    Cypher text carrying its registry name. A str subclass, so it goes
+    anywhere query text does; the database managers read `.name` to label
+    metrics and logs.
+    """
+    name: str
+
+    def __new__(cls, name: str, text: str):
+        query = super().__new__(cls, text)
+        query.name = name
+        return query
+
+    def substitute(self, **parts: str) -> "CypherQuery":
+        """
+        Fills {placeholders} that cannot be parameters (labels, relationship
+        types, WHERE fragments); the result keeps the name, so label
+        cardinality stays that of the registry.
+        """
+        text = str(self)
+        for key, value in parts.items():
+            text = text.replace("{" + key + "}", value)
+        return CypherQuery(self.name, text)
+
+
+QUERY_REGISTRY: Dict[str, CypherQuery] = {}
+
+
+def register_query(name: str, text: str) -> CypherQuery:
+    """Defines a named query at module level; names are unique across the codebase."""
+    if name in QUERY_REGISTRY and QUERY_REGISTRY[name] != text:
+        raise ValueError(f"Cypher query {name!r} is already registered")
+    QUERY_REGISTRY[name] = CypherQuery(name, text)
+    return QUERY_REGISTRY[name]
+
+
+def query_name(query: str) -> str:
+    return getattr(query, "name", ADHOC)
+
+
+def redact_params(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shapes, not values: parameters carry document text, entity names and user ids."""
+    def shape(value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, str):
+            return f"<str:{len(value)}>"
+        if isinstance(value, (list, tuple)):
+            return f"<list:{len(value)}>"
+        if isinstance(value, dict):
+            return {k: shape(v) for k, v in value.items()}
+        return f"<{type(value).__name__}>"
+
+    return {k: shape(v) for k, v in (params or {}).items()}
+
+
+def summarize_profile(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Total db hits and the operator tree, flattened, of a PROFILE plan."""
+    operators = []
+    db_hits = 0
+    stack = [plan]
+    while stack:
+        op = stack.pop()
+        hits = op.get("dbHits", 0) or 0
+        db_hits += hits
+        operators.append(f"{op.get('operatorType', '?')}(rows={op.get('rows', 0)}, db_hits={hits})")
+        stack.extend(reversed(op.get("children") or []))
+    return {"db_hits": db_hits, "operators": operators}
+
+
+class QueryTimer:
+    """
+    Optimization: Query Observability
+    Wraps one execution of a query: latency and row-count histograms per
+    registered name, a slow-query log line with redacted parameters, and
+    for a sample of named executions the text to run is prefixed with
+    PROFILE so the plan and its db hits get logged.
+
+        with QueryTimer(query, "read", params) as timer:
+            result = session.run(timer.text, params)
+            rows = [r.data() for r in result]
+            timer.finish(len(rows), result.consume().profile if timer.profiled else None)
+    """
+
+    def __init__(self, query: str, access: str, params: Optional[Dict[str, Any]] = None,
+                 allow_profile: bool = True):
+        self.name = query_name(query)
+        self.access = access
+        self.params = params
+        # Ad-hoc text may be schema commands, which cannot be profiled
+        self.profiled = (
+            allow_profile
+            and self.name != ADHOC
+            and settings.QUERY_PROFILE_SAMPLE_RATE > 0
+            and random.random() < settings.QUERY_PROFILE_SAMPLE_RATE
+        )
+        self.text = f"PROFILE {query}" if self.profiled else str(query)
+        self.rows = 0
+        self._start = 0.0
+
+    def __enter__(self) -> "QueryTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def finish(self, rows: int, profile: Optional[Dict[str, Any]] = None):
+        self.rows = rows
+        if profile:
+            logger.info("cypher_query_profile", query=self.name, rows=rows, **summarize_profile(profile))
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        # A stream the caller stopped reading early is not a failure
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            QUERY_ERRORS.labels(self.name).inc()
+            return False
+
+        QUERY_SECONDS.labels(self.name, self.access).observe(seconds)
+        QUERY_ROWS.labels(self.name).observe(self.rows)
+        if seconds * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            logger.warning(
+                "slow_cypher_query",
+                query=self.name,
+                access=self.access,
+                duration_ms=round(seconds * 1000, 1),
+                rows=self.rows,
+                params=redact_params(self.params),
+            )
+        return False
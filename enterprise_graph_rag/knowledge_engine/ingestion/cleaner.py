@@ -1,86 +1,177 @@
 import logging
-from knowledge_engine.core.database import GraphDatabaseManager
+from typing import Callable, Dict, Iterable, Optional
+from knowledge_engine.core.database import MIGRATION_LABEL, GraphDatabaseManager
 from knowledge_engine.core.logging import logger
+from knowledge_engine.core.queries import register_query
 from knowledge_engine.core.config import settings
+from knowledge_engine.ingestion.resolution import EntityResolver
+from knowledge_engine.ingestion.writer import BASE_ENTITY_LABEL, ENTITY_LABEL, cypher_name
+
+# (operation, done so far, total at start)
+Progress = Callable[[str, int, int], None]
+
+# Count / batched-delete pairs for _delete_in_batches
+_ORPHANS = "MATCH (n:Entity) WHERE NOT (n)--()"
+ORPHANS_COUNT_QUERY = register_query("cleanup.orphans.count", f"{_ORPHANS} RETURN count(n) AS total")
+ORPHANS_DELETE_QUERY = register_query(
+    "cleanup.orphans.delete", f"{_ORPHANS} WITH n LIMIT $batch_size DELETE n RETURN count(*) AS deleted"
+)
+
+# {allowed}: one `NOT n:Label` per allowed label (labels cannot be parameters)
+NOISE_COUNT_QUERY = register_query("cleanup.noise.count", "MATCH (n) WHERE {allowed} RETURN count(n) AS total")
+NOISE_DELETE_QUERY = register_query(
+    "cleanup.noise.delete",
+    "MATCH (n) WHERE {allowed} WITH n LIMIT $batch_size DETACH DELETE n RETURN count(*) AS deleted",
+)
+
+WIPE_RELATIONSHIPS_COUNT_QUERY = register_query(
+    "cleanup.wipe.relationships.count", "MATCH ()-[r]->() RETURN count(r) AS total"
+)
+WIPE_RELATIONSHIPS_DELETE_QUERY = register_query(
+    "cleanup.wipe.relationships.delete",
+    "MATCH ()-[r]->() WITH r LIMIT $batch_size DELETE r RETURN count(*) AS deleted",
+)
+WIPE_NODES_COUNT_QUERY = register_query(
+    "cleanup.wipe.nodes.count", f"MATCH (n) WHERE NOT n:{MIGRATION_LABEL} RETURN count(n) AS total"
+)
+WIPE_NODES_DELETE_QUERY = register_query(
+    "cleanup.wipe.nodes.delete",
+    f"MATCH (n) WHERE NOT n:{MIGRATION_LABEL} WITH n LIMIT $batch_size DETACH DELETE n RETURN count(*) AS deleted",
+)
 
 class GraphCleaner:
     def __init__(self):
         self.db = GraphDatabaseManager.get_instance()
 
-    def deduplicate_entities(self):
+    def _resolver(self) -> EntityResolver:
+        return EntityResolver(
+            self.db,
+            prefix_length=settings.RESOLUTION_PREFIX_LENGTH,
+            candidate_threshold=settings.RESOLUTION_CANDIDATE_THRESHOLD,
+            embedding_threshold=settings.RESOLUTION_EMBEDDING_THRESHOLD,
+            max_block_size=settings.RESOLUTION_MAX_BLOCK_SIZE,
+            max_cluster_size=settings.RESOLUTION_MAX_CLUSTER_SIZE,
+            batch_size=settings.RESOLUTION_BATCH_SIZE,
+            report_dir=settings.RESOLUTION_REPORT_DIR
+        )
+
+    def deduplicate_entities(self, dry_run: bool = False) -> dict:
         """
-        Runs Cypher queries to merge duplicate entities based on name similarity.
+        Full pass: fuzzy-resolves every entity in the graph (see EntityResolver).
+        Scans the whole graph, so it is a maintenance command (`manage.py clean`);
+        ingestion runs resolve_entities() on what it created instead.
         """
         logger.info("starting_graph_cleanup")
-        
-        # 1. Merge Case-Insensitive Duplicates
-        # Example: 'alice' and 'Alice' -> Merged to 'Alice'
-        query_case_merge = """
-        MATCH (n:Entity)
-        WITH toLower(n.name) as name_lower, collect(n) as nodes
-        WHERE size(nodes) > 1
-        CALL apoc.refactor.mergeNodes(nodes, {properties:"combine", mergeRels:true})
-        YIELD node
-        RETURN count(node) as merged_count
+        # Optimization: Python-side blocking + vectorized scoring; merges are
+        # plain batched Cypher, so this works without APOC
+        report = self._resolver().resolve_all(dry_run=dry_run)
+        logger.info("deduplication_complete", merged_nodes=report["merged_entities"])
+        return report
+
+    def resolve_entities(self, entity_ids: Iterable[str], dry_run: bool = False) -> dict:
         """
-        
-        # Note: APOC is standard in Neo4j Enterprise/Aura. 
-        # If APOC is missing, we would need a more complex Python-side logic.
-        try:
-            # We wrap this in try/catch in case APOC isn't installed
-            results = self.db.run_cypher(query_case_merge)
-            merged = results[0].get('merged_count', 0) if results else 0
-            logger.info("deduplication_complete", merged_nodes=merged)
-        except Exception as e:
-            logger.warning("apoc_merge_failed", reason="Ensure APOC plugin is enabled in Neo4j", error=str(e))
+        Incremental pass: resolves only the given (newly created) entities
+        against entities sharing their normalized-name prefix, looked up
+        through the normalized_name index. Existing entities survive merges,
+        so their ids stay stable.
+        """
+        ids = set(entity_ids)
+        if not ids:
+            return {"mode": "incremental", "entities": 0, "clusters": [], "merged_entities": 0}
+        return self._resolver().resolve_ids(ids, dry_run=dry_run)
 
-    def remove_orphans(self):
-        """Remove entities that have no connections (hallucinations)."""
-        query = """
-        MATCH (n:Entity)
-        WHERE NOT (n)--()
-        DELETE n
-        RETURN count(n) as deleted_count
+    def _delete_in_batches(self, operation: str, count_query: str, delete_query: str,
+                           dry_run: bool = False, progress: Optional[Progress] = None) -> int:
+        """
+        Optimization: Batched Deletes
+        delete_query removes at most $batch_size matches per call and returns
+        `deleted`; each call is its own transaction, so memory stays bounded and
+        concurrent reads are never blocked for long. Matches are defined by
+        the query itself, so an interrupted run resumes by running it again.
+        Dry-run only counts.
         """
-        results = self.db.run_cypher(query)
-        count = results[0]['deleted_count'] if results else 0
-        logger.info("orphans_removed", count=count)
+        results = self.db.run_cypher(count_query, access="read")
+        total = results[0]['total'] if results else 0
+        if dry_run or total == 0:
+            logger.info("cleanup_counted", operation=operation, total=total, dry_run=dry_run)
+            if progress:
+                progress(operation, 0, total)
+            return total
 
-    def remove_noise_nodes(self):
+        batch_size = max(1, settings.CLEANUP_BATCH_SIZE)
+        deleted = 0
+        while True:
+            results = self.db.run_cypher(delete_query, {"batch_size": batch_size})
+            batch = results[0]['deleted'] if results else 0
+            deleted += batch
+            logger.info("cleanup_progress", operation=operation, deleted=deleted, total=total)
+            if progress:
+                progress(operation, deleted, total)
+            if batch < batch_size:
+                return deleted
+
+    def remove_orphans(self, dry_run: bool = False, progress: Optional[Progress] = None) -> int:
+        """Remove entities that have no connections (hallucinations)."""
+        count = self._delete_in_batches("orphans", ORPHANS_COUNT_QUERY, ORPHANS_DELETE_QUERY, dry_run, progress)
+        logger.info("orphans_removed", count=count, dry_run=dry_run)
+        return count
+
+    def remove_noise_nodes(self, dry_run: bool = False, progress: Optional[Progress] = None) -> int:
         """
         Optimization: Remove nodes that do not strictly adhere to the Allowed Schema.
         This cleans up 'hallucinated' labels.
         """
-        allowed = settings.ALLOWED_ENTITY_TYPES + ["Chunk"] # Always keep Chunks
-        
-        # Neo4j Cypher to find nodes that have labels NOT in our allow list
-        # Note: Cypher labels are dynamic, so we check intersection.
-        # This is a bit complex in Cypher, so a simpler approach is:
-        # Match nodes that have NO allowed labels.
-        
-        labels_str = ":".join(allowed) # e.g. :Person:Organization:Project
+        # Always keep Chunks, the schema migration records, and every entity
+        # the writer stores: it labels them __Entity__:Entity on top of the
+        # extractor's label, which is the default 'entity' unless an ontology
+        # label was assigned
+        allowed = settings.ALLOWED_ENTITY_TYPES + [BASE_ENTITY_LABEL, ENTITY_LABEL, "Chunk", MIGRATION_LABEL]
         
         # Heuristic: If a node does NOT have any of the allowed labels, detach delete.
-        # Constructing dynamic query:
-        
-        where_clause = " AND ".join([f"NOT n:{label}" for label in allowed])
-        
-        query = f"""
-        MATCH (n)
-        WHERE {where_clause}
-        DETACH DELETE n
-        RETURN count(n) as deleted_count
-        """
+        where_clause = " AND ".join([f"NOT n:{cypher_name(label)}" for label in allowed])
         
         try:
-            results = self.db.run_cypher(query)
-            count = results[0]['deleted_count'] if results else 0
+            count = self._delete_in_batches(
+                "noise_nodes",
+                NOISE_COUNT_QUERY.substitute(allowed=where_clause),
+                NOISE_DELETE_QUERY.substitute(allowed=where_clause),
+                dry_run,
+                progress,
+            )
             if count > 0:
-                logger.info("noise_nodes_removed", count=count)
+                logger.info("noise_nodes_removed", count=count, dry_run=dry_run)
+            return count
         except Exception as e:
             logger.warning("noise_cleanup_failed", error=str(e))
+            return 0
+
+    def wipe(self, dry_run: bool = False, progress: Optional[Progress] = None) -> Dict[str, int]:
+        """
+        Deletes the whole graph in batches: relationships first, so no single
+        DETACH DELETE of a highly connected node has to hold all its
+        relationships in one transaction. Migration records are kept, because
+        the constraints and indexes they describe survive a wipe.
+        """
+        counts = {
+            "relationships": self._delete_in_batches(
+                "relationships", WIPE_RELATIONSHIPS_COUNT_QUERY, WIPE_RELATIONSHIPS_DELETE_QUERY, dry_run, progress
+            ),
+            "nodes": self._delete_in_batches(
+                "nodes", WIPE_NODES_COUNT_QUERY, WIPE_NODES_DELETE_QUERY, dry_run, progress
+            ),
+        }
+        if not dry_run:
+            logger.warning("database_cleared", **counts)
+        return counts
+
+    def run_incremental(self, entity_ids: Iterable[str]):
+        """Post-ingestion cleanup scoped to the entities a batch created."""
+        self.resolve_entities(entity_ids)
 
-    def run_all(self):
-        self.deduplicate_entities()
-        self.remove_orphans()
-        self.remove_noise_nodes()
\ No newline at end of file
+    def run_all(self, dry_run: bool = False, progress: Optional[Progress] = None) -> Dict[str, int]:
+        """Full maintenance pass. Dry-run reports what each step would change."""
+        return {
+            "merged_entities": self.deduplicate_entities(dry_run=dry_run)["merged_entities"],
+            "orphans": self.remove_orphans(dry_run=dry_run, progress=progress),
+            "noise_nodes": self.remove_noise_nodes(dry_run=dry_run, progress=progress),
+        }
@@ -0,0 +1,132 @@
+import re
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_engine.ingestion.extraction_cache import Triple
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Picks (bands, rows) with bands * rows = num_perm whose S-curve
+    (1/bands) ** (1/rows) sits closest to the similarity threshold.
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures over word shingles plus an LSH band index.
+
+    Boilerplate (headers, disclaimers, templated sections) produces chunks
+    that are nearly, not exactly, identical, so the content-hash extraction
+    cache misses them. A chunk whose estimated Jaccard similarity to an
+    already indexed chunk reaches `threshold` reuses that chunk's triples.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5,
+                 max_entries: int = 200_000, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.bands, self.rows = _optimal_bands(threshold, num_perm)
+
+        # a, b < 2**32 and 32-bit shingle hashes keep a * x + b inside uint64
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._results: Dict[str, List[Triple]] = {}
+        self._lock = threading.Lock()
+
+        self.near_duplicates = 0
+        self.llm_calls_avoided = 0
+        self.tokens_avoided = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (num_perm, shingles) permuted hashes -> min per permutation
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return np.bitwise_and(permuted, _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def match_or_add(self, key: str, signature: np.ndarray) -> Optional[str]:
+        """
+        Returns the key of an indexed near-duplicate (or `key` itself if it
+        is already indexed), or indexes `key` and returns None. Candidates
+        from the LSH buckets are confirmed against the estimated Jaccard
+        similarity before they count as a match.
+        """
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            if key in self._signatures:
+                return key
+            seen = set()
+            for band, band_key in enumerate(band_keys):
+                for candidate in self._buckets[band].get(band_key, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    similarity = float(np.mean(self._signatures[candidate] == signature))
+                    if similarity >= self.threshold:
+                        self.near_duplicates += 1
+                        return candidate
+
+            if len(self._signatures) < self.max_entries:
+                self._signatures[key] = signature
+                for band, band_key in enumerate(band_keys):
+                    self._buckets[band][band_key].append(key)
+            return None
+
+    def set_result(self, key: str, triples: List[Triple]):
+        with self._lock:
+            if key in self._signatures:
+                self._results[key] = triples
+
+    def result(self, key: str) -> Optional[List[Triple]]:
+        with self._lock:
+            return self._results.get(key)
+
+    def record_avoided(self, tokens: int):
+        with self._lock:
+            self.llm_calls_avoided += 1
+            self.tokens_avoided += tokens
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "near_duplicates": self.near_duplicates,
+                "dedup_llm_calls_avoided": self.llm_calls_avoided,
+                "dedup_tokens_avoided": self.tokens_avoided,
+            }
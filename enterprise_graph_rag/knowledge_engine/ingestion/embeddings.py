@@ -0,0 +1,315 @@
+import os
+import re
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.logging import logger
+from knowledge_engine.ingestion.scheduler import AdaptiveScheduler, approx_tokens
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# digest (32 bytes) + row number (uint64)
+_RECORD = np.dtype([("digest", "S32"), ("row", "<u8")])
+
+
+def plan_batches(texts: Sequence[str], max_size: int, max_tokens: Optional[int] = None) -> List[List[str]]:
+    """Splits texts into request-sized batches by input count and approximate tokens."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    tokens = 0
+    for text in texts:
+        cost = approx_tokens(text)
+        if current and (len(current) >= max_size or (max_tokens and tokens + cost > max_tokens)):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(text)
+        tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def embed_texts(
+    embed_model: BaseEmbedding,
+    texts: List[str],
+    scheduler: Optional[AdaptiveScheduler] = None,
+    max_tokens: Optional[int] = None,
+) -> List[Embedding]:
+    """
+    Embeds texts in provider-sized batches. With a scheduler, batches run
+    concurrently under its adaptive limit and are retried on 429s and
+    transient failures.
+    """
+    if not texts:
+        return []
+    batches = plan_batches(texts, embed_model.embed_batch_size, max_tokens)
+
+    async def _embed(batch: List[str]) -> List[Embedding]:
+        if scheduler is None:
+            return await embed_model.aget_text_embedding_batch(batch)
+        return await scheduler.run(
+            lambda: embed_model.aget_text_embedding_batch(batch),
+            tokens=sum(approx_tokens(t) for t in batch),
+        )
+
+    results = await asyncio.gather(*(_embed(b) for b in batches))
+    return [embedding for batch in results for embedding in batch]
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for one model, keyed by sha256(text).
+
+    Vectors live in an append-only float32 matrix (`<model>.f32`) that is
+    memory-mapped for reads; `<model>.idx` is an append-only list of
+    (digest, row) records. get_many() returns views into the mapping, so a
+    hit costs neither a network call nor a copy. Appends take an exclusive
+    file lock, and other processes pick up new rows on their next miss.
+    """
+
+    def __init__(self, cache_dir: str, model: str, dimensions: int):
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.dimensions = dimensions
+        self._matrix_path = os.path.join(cache_dir, f"{slug}.{dimensions}.f32")
+        self._index_path = os.path.join(cache_dir, f"{slug}.{dimensions}.idx")
+        for path in (self._matrix_path, self._index_path):
+            open(path, "ab").close()
+
+        self._rows: Dict[bytes, int] = {}
+        self._index_offset = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load_index(self):
+        """Reads index records appended since the last call (by us or another process)."""
+        size = os.path.getsize(self._index_path)
+        usable = (size - self._index_offset) // _RECORD.itemsize * _RECORD.itemsize
+        if usable <= 0:
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            records = np.frombuffer(f.read(usable), dtype=_RECORD)
+        self._index_offset += usable
+        for digest, row in zip(records["digest"], records["row"]):
+            self._rows[bytes(digest)] = int(row)
+
+    def _view(self) -> Optional[np.memmap]:
+        rows = os.path.getsize(self._matrix_path) // (4 * self.dimensions)
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r",
+                                     shape=(rows, self.dimensions))
+        return self._matrix
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        digests = [self.digest(t) for t in texts]
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._load_index()
+            matrix = self._view()
+            out: List[Optional[np.ndarray]] = []
+            for d in digests:
+                row = self._rows.get(d)
+                out.append(matrix[row] if matrix is not None and row is not None and row < matrix.shape[0] else None)
+            return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Embedding]):
+        fresh = {}
+        for text, vector in zip(texts, vectors):
+            if len(vector) != self.dimensions:
+                logger.warning("embedding_dimension_mismatch", expected=self.dimensions, got=len(vector))
+                return
+            fresh.setdefault(self.digest(text), vector)
+
+        with self._lock, open(self._index_path, "ab") as index_file, open(self._matrix_path, "ab") as matrix_file:
+            if fcntl is not None:
+                fcntl.flock(index_file, fcntl.LOCK_EX)
+            try:
+                self._load_index()
+                fresh = {d: v for d, v in fresh.items() if d not in self._rows}
+                if not fresh:
+                    return
+                # A writer killed mid-append leaves a partial row (or record) behind;
+                # appending after it would misalign every later row with the index
+                row_bytes = 4 * self.dimensions
+                size = os.path.getsize(self._matrix_path)
+                if size % row_bytes:
+                    matrix_file.truncate(size - size % row_bytes)
+                size = os.path.getsize(self._index_path)
+                if size % _RECORD.itemsize:
+                    index_file.truncate(size - size % _RECORD.itemsize)
+                start = os.path.getsize(self._matrix_path) // row_bytes
+                # Vectors first: an index record never points past the matrix
+                matrix_file.write(np.asarray(list(fresh.values()), dtype=np.float32).tobytes())
+                matrix_file.flush()
+                records = np.empty(len(fresh), dtype=_RECORD)
+                records["digest"] = list(fresh.keys())
+                records["row"] = np.arange(start, start + len(fresh), dtype=np.uint64)
+                index_file.write(records.tobytes())
+                index_file.flush()
+                self._load_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(index_file, fcntl.LOCK_UN)
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-memory LRU with EmbeddingCache's get_many / put_many, for
+    query embeddings. Queries stay out of the on-disk cache: every distinct
+    question would be kept there, and in each process's index, for good.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._vectors: "OrderedDict[str, Embedding]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[Embedding]]:
+        with self._lock:
+            out = []
+            for text in texts:
+                vector = self._vectors.get(text)
+                if vector is not None:
+                    self._vectors.move_to_end(text)
+                out.append(vector)
+            return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Embedding]):
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._vectors[text] = vector
+                self._vectors.move_to_end(text)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+
+class EmbeddingService:
+    """
+    Embedding front door for ingestion and retrieval: collapses duplicate
+    texts, serves known texts from the on-disk cache and sends only the
+    rest to the provider, in batches up to its input and token limits.
+    """
+
+    def __init__(self, embed_model: BaseEmbedding,
+                 cache: Optional[Union[EmbeddingCache, QueryEmbeddingCache]] = None,
+                 scheduler: Optional[AdaptiveScheduler] = None, max_batch_tokens: Optional[int] = None):
+        self.embed_model = embed_model
+        self.cache = cache
+        self.scheduler = scheduler
+        self.max_batch_tokens = max_batch_tokens
+        self.stats = {"requested": 0, "unique": 0, "cache_hits": 0, "embedded": 0}
+        self._stats_lock = threading.Lock()
+
+    def _lookup(self, texts: List[str]):
+        unique = list(dict.fromkeys(texts))
+        cached = self.cache.get_many(unique) if self.cache is not None else [None] * len(unique)
+        found = {t: v for t, v in zip(unique, cached) if v is not None}
+        missing = [t for t in unique if t not in found]
+        with self._stats_lock:
+            self.stats["requested"] += len(texts)
+            self.stats["unique"] += len(unique)
+            self.stats["cache_hits"] += len(found)
+            self.stats["embedded"] += len(missing)
+        return found, missing
+
+    def _store(self, found: dict, missing: List[str], vectors: List[Embedding], texts: List[str]):
+        if self.cache is not None and missing:
+            self.cache.put_many(missing, vectors)
+        found.update(zip(missing, vectors))
+        return [v.tolist() if isinstance(v, np.ndarray) else v for v in (found[t] for t in texts)]
+
+    async def aembed(self, texts: List[str]) -> List[Embedding]:
+        if not texts:
+            return []
+        found, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await embed_texts(self.embed_model, missing, self.scheduler, self.max_batch_tokens)
+        return await asyncio.to_thread(self._store, found, missing, vectors, texts)
+
+    def embed(self, texts: List[str]) -> List[Embedding]:
+        """Blocking variant for the synchronous query paths."""
+        if not texts:
+            return []
+        found, missing = self._lookup(texts)
+        vectors: List[Embedding] = []
+        for batch in plan_batches(missing, self.embed_model.embed_batch_size, self.max_batch_tokens):
+            vectors.extend(self.embed_model.get_text_embedding_batch(batch))
+        return self._store(found, missing, vectors, texts)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """LlamaIndex embedding model backed by an EmbeddingService, for retrievers."""
+
+    _service: EmbeddingService = PrivateAttr()
+
+    def __init__(self, service: EmbeddingService, **kwargs):
+        super().__init__(
+            model_name=service.embed_model.model_name,
+            embed_batch_size=service.embed_model.embed_batch_size,
+            **kwargs,
+        )
+        self._service = service
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._service.embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return (await self._service.aembed([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._service.embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._service.embed(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._service.aembed(texts)
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(cache_dir: str, model: str, dimensions: int) -> EmbeddingCache:
+    """One EmbeddingCache per (dir, model, dimensions) per process."""
+    key = f"{os.path.abspath(cache_dir)}|{model}|{dimensions}"
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            _CACHES[key] = EmbeddingCache(cache_dir, model, dimensions)
+        return _CACHES[key]
+
+
+def build_query_embed_model(embed_model: BaseEmbedding) -> BaseEmbedding:
+    """Wraps a query-path embedding model with a per-process LRU of recent queries."""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embed_model
+    cache = QueryEmbeddingCache(settings.QUERY_EMBEDDING_CACHE_SIZE)
+    return CachedEmbedding(EmbeddingService(embed_model, cache, max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS))
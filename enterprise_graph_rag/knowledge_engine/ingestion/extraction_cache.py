@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from knowledge_engine.core.logging import logger
+from knowledge_engine.ingestion.manifest import sqlite_transaction
+
+Triple = Tuple[str, str, str]
+
+
+def extraction_cache_key(
+    text: str,
+    model: str,
+    entity_types: Sequence[str],
+    relation_types: Sequence[str],
+    prompt_version: str,
+) -> str:
+    """
+    Content-addressed key: the same chunk text under the same ontology,
+    model and prompt always yields the same key.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    fingerprint = json.dumps(
+        [prompt_version, model, sorted(entity_types), sorted(relation_types), text_hash],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """Base class: maps a cache key to the triples extracted for that chunk."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[Triple]]:
+        triples = self._get(key)
+        with self._lock:
+            if triples is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return triples
+
+    def put(self, key: str, triples: List[Triple]) -> None:
+        self._put(key, [list(t) for t in triples])
+
+    def stats(self) -> dict:
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+    def _get(self, key: str) -> Optional[List[Triple]]:
+        raise NotImplementedError
+
+    def _put(self, key: str, triples: List[list]) -> None:
+        raise NotImplementedError
+
+
+class SQLiteExtractionCache(ExtractionCache):
+    """
+    Local on-disk cache. Least recently used entries are evicted once
+    the table grows past max_entries; the table is only counted every
+    evict_every puts (about 1% of max_entries), so a put is not a full count.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 500_000):
+        super().__init__()
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.evict_every = max(1, min(1000, max_entries // 100))
+        self._puts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    triples TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used)")
+
+    def _connect(self):
+        return sqlite_transaction(self.db_path)
+
+    def _get(self, key: str) -> Optional[List[Triple]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT triples FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [tuple(t) for t in json.loads(row[0])]
+
+    def _put(self, key: str, triples: List[list]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, triples, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(triples), time.time()),
+            )
+            with self._lock:
+                self._puts += 1
+                if self._puts % self.evict_every:
+                    return
+            (count,) = conn.execute("SELECT count(*) FROM extractions").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM extractions WHERE key IN "
+                    "(SELECT key FROM extractions ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+
+
+class RedisExtractionCache(ExtractionCache):
+    """
+    Shared cache for a worker fleet. A sorted set tracks last use so the
+    cache stays bounded to max_entries regardless of Redis eviction policy.
+    """
+
+    PREFIX = "extraction_cache:"
+    LRU_KEY = "extraction_cache:__lru__"
+
+    def __init__(self, client, max_entries: int = 500_000):
+        super().__init__()
+        self.client = client
+        self.max_entries = max_entries
+
+    def _get(self, key: str) -> Optional[List[Triple]]:
+        raw = self.client.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        self.client.zadd(self.LRU_KEY, {key: time.time()})
+        return [tuple(t) for t in json.loads(raw)]
+
+    def _put(self, key: str, triples: List[list]) -> None:
+        pipe = self.client.pipeline()
+        pipe.set(self.PREFIX + key, json.dumps(triples))
+        pipe.zadd(self.LRU_KEY, {key: time.time()})
+        pipe.zcard(self.LRU_KEY)
+        count = pipe.execute()[-1]
+
+        overflow = count - self.max_entries
+        if overflow > 0:
+            evicted = self.client.zpopmin(self.LRU_KEY, overflow)
+            if evicted:
+                keys = [k.decode() if isinstance(k, bytes) else k for k, _ in evicted]
+                self.client.delete(*[self.PREFIX + k for k in keys])
+
+
+def build_extraction_cache(backend: str, sqlite_path: str, redis_url: Optional[str],
+                           max_entries: int) -> Optional[ExtractionCache]:
+    """
+    Factory honoring EXTRACTION_CACHE_BACKEND:
+    'redis' uses Redis when reachable (falls back to SQLite), 'sqlite' stays local,
+    'none' disables caching.
+    """
+    if backend == "none":
+        return None
+
+    if backend == "redis" and redis_url:
+        try:
+            import redis
+            client = redis.from_url(redis_url)
+            client.ping()
+            logger.info("extraction_cache_backend", backend="redis")
+            return RedisExtractionCache(client, max_entries=max_entries)
+        except Exception as e:
+            logger.warning("extraction_cache_redis_unavailable", error=str(e))
+
+    logger.info("extraction_cache_backend", backend="sqlite", path=sqlite_path)
+    return SQLiteExtractionCache(sqlite_path, max_entries=max_entries)
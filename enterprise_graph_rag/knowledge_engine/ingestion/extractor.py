@@ -0,0 +1,246 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import PrivateAttr
+from llama_index.core.llms.llm import LLM
+from llama_index.core.prompts import PromptTemplate
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.graph_stores.types import EntityNode, Relation, KG_NODES_KEY, KG_RELATIONS_KEY
+from llama_index.core.indices.property_graph import SimpleLLMPathExtractor
+
+from knowledge_engine.ingestion.dedup import NearDuplicateIndex
+from knowledge_engine.ingestion.extraction_cache import ExtractionCache, Triple, extraction_cache_key
+from knowledge_engine.ingestion.scheduler import AdaptiveScheduler, approx_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the template below changes: cached extractions are keyed on it.
+EXTRACTION_PROMPT_VERSION = "v1"
+
+EXTRACTION_PROMPT_TMPL = (
+    "Some text is provided below. Given the text, extract up to "
+    "{max_knowledge_triplets} "
+    "knowledge triplets in the form of (subject, predicate, object). Avoid stopwords.\n"
+    "Only extract entities of these types: {allowed_entity_types}\n"
+    "Only use these predicates: {allowed_relation_types}\n"
+    "---------------------\n"
+    "Example:\n"
+    "Text: Alice manages Project Apollo from the Berlin office.\n"
+    "Triplets:\n"
+    "(Alice, MANAGES, Project Apollo)\n"
+    "(Project Apollo, LOCATED_AT, Berlin)\n"
+    "---------------------\n"
+    "Text: {text}\n"
+    "Triplets:\n"
+)
+
+
+def _fold(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class CachedPathExtractor(SimpleLLMPathExtractor):
+    """
+    Ontology-guided triple extractor with a content-addressed cache in front
+    of the LLM. A chunk that was already extracted under the same ontology,
+    model and prompt version costs no LLM call. With a scheduler, LLM calls
+    run under its adaptive (AIMD) limit instead of a fixed worker count.
+    """
+
+    _cache: Optional[ExtractionCache] = PrivateAttr(default=None)
+    _scheduler: Optional[AdaptiveScheduler] = PrivateAttr(default=None)
+    _model_name: str = PrivateAttr(default="")
+    _entity_types: List[str] = PrivateAttr(default_factory=list)
+    _relation_types: List[str] = PrivateAttr(default_factory=list)
+    _dedup: Optional[NearDuplicateIndex] = PrivateAttr(default=None)
+    _inflight: Dict[str, asyncio.Future] = PrivateAttr(default_factory=dict)
+    _checkpoint: Optional[Callable[[BaseNode, List[Triple]], None]] = PrivateAttr(default=None)
+
+    def __init__(
+        self,
+        llm: LLM,
+        allowed_entity_types: Sequence[str],
+        allowed_relation_types: Sequence[str],
+        model_name: str,
+        cache: Optional[ExtractionCache] = None,
+        scheduler: Optional[AdaptiveScheduler] = None,
+        dedup: Optional[NearDuplicateIndex] = None,
+        checkpoint: Optional[Callable[[BaseNode, List[Triple]], None]] = None,
+        max_paths_per_chunk: int = 10,
+        num_workers: int = 4,
+    ) -> None:
+        prompt = PromptTemplate(EXTRACTION_PROMPT_TMPL).partial_format(
+            allowed_entity_types=", ".join(allowed_entity_types),
+            allowed_relation_types=", ".join(allowed_relation_types),
+        )
+        super().__init__(
+            llm=llm,
+            extract_prompt=prompt,
+            max_paths_per_chunk=max_paths_per_chunk,
+            num_workers=num_workers,
+        )
+        self._cache = cache
+        self._scheduler = scheduler
+        self._model_name = model_name
+        self._entity_types = list(allowed_entity_types)
+        self._relation_types = list(allowed_relation_types)
+        self._dedup = dedup
+        # Called with each chunk's triples as soon as they exist; must be quick
+        self._checkpoint = checkpoint
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedPathExtractor"
+
+    def cache_key(self, node: BaseNode) -> str:
+        return extraction_cache_key(
+            node.get_content(metadata_mode=MetadataMode.NONE),
+            self._model_name,
+            self._entity_types,
+            self._relation_types,
+            EXTRACTION_PROMPT_VERSION,
+        )
+
+    async def _aextract_triples(self, node: BaseNode) -> Optional[List[Triple]]:
+        """
+        One LLM round trip for a single chunk. None when the answer could not
+        be parsed: unlike an empty result, that must not be cached or reused.
+        """
+        text = node.get_content(metadata_mode=MetadataMode.LLM)
+
+        def _call():
+            return self.llm.apredict(
+                self.extract_prompt,
+                text=text,
+                max_knowledge_triplets=self.max_paths_per_chunk,
+            )
+
+        try:
+            if self._scheduler is None:
+                llm_response = await _call()
+            else:
+                llm_response = await self._scheduler.run(
+                    _call,
+                    tokens=approx_tokens(text),
+                    token_counter=approx_tokens,
+                )
+            triples = self.parse_fn(llm_response)
+        except ValueError as e:
+            logger.error(f"Error during extraction: {e!s}")
+            return None
+        if not triples and "(" in llm_response:
+            # Triple-shaped lines that did not parse: a malformed answer, not an empty chunk
+            logger.warning(f"Unparsable extraction response: {llm_response[:200]!r}")
+            return None
+        return triples
+
+    @staticmethod
+    def attach_triples(node: BaseNode, triples: List[Triple]) -> BaseNode:
+        """Stores triples on the node the same way SimpleLLMPathExtractor does."""
+        existing_nodes = node.metadata.pop(KG_NODES_KEY, [])
+        existing_relations = node.metadata.pop(KG_RELATIONS_KEY, [])
+
+        metadata = node.metadata.copy()
+        for subj, rel, obj in triples:
+            subj_node = EntityNode(name=subj, properties=metadata)
+            obj_node = EntityNode(name=obj, properties=metadata)
+            rel_node = Relation(
+                label=rel,
+                source_id=subj_node.id,
+                target_id=obj_node.id,
+                properties=metadata,
+            )
+            existing_nodes.extend([subj_node, obj_node])
+            existing_relations.append(rel_node)
+
+        node.metadata[KG_NODES_KEY] = existing_nodes
+        node.metadata[KG_RELATIONS_KEY] = existing_relations
+        return node
+
+    async def _extract_once(self, key: str, node: BaseNode) -> Optional[List[Triple]]:
+        """
+        Extracts a chunk; identical chunks in flight at the same time share one
+        call (and its failure: None).
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            triples = await asyncio.shield(pending)
+            if self._dedup is not None:
+                self._dedup.record_avoided(approx_tokens(node.get_content(metadata_mode=MetadataMode.LLM)))
+            return triples
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            triples = await self._aextract_triples(node)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if self._dedup is not None and triples is not None:
+            self._dedup.set_result(key, triples)
+        future.set_result(triples)
+        return triples
+
+    async def _reuse_near_duplicate(self, key: str, node: BaseNode) -> Optional[List[Triple]]:
+        """Triples of an already seen near-duplicate chunk, if there is one."""
+        if self._dedup is None:
+            return None
+        signature = self._dedup.signature(node.get_content(metadata_mode=MetadataMode.NONE))
+        if signature is None:
+            return None
+        match = self._dedup.match_or_add(key, signature)
+        if match is None:
+            return None
+
+        triples = self._dedup.result(match)
+        if triples is None and match in self._inflight:
+            triples = await asyncio.shield(self._inflight[match])
+        if triples is None and self._cache is not None:
+            triples = await asyncio.to_thread(self._cache.get, match)
+        if triples is None:
+            return None  # the original's result is gone; extract this one
+
+        # Templated sections differ in exactly the names that matter: only keep
+        # triples whose subject and object this chunk mentions too
+        text = _fold(node.get_content(metadata_mode=MetadataMode.NONE))
+        triples = [(subj, rel, obj) for subj, rel, obj in triples if _fold(subj) in text and _fold(obj) in text]
+        if not triples:
+            return None
+
+        self._dedup.record_avoided(approx_tokens(node.get_content(metadata_mode=MetadataMode.LLM)))
+        return triples
+
+    async def _aextract(self, node: BaseNode) -> BaseNode:
+        key = self.cache_key(node)
+        triples = None
+        if self._cache is not None:
+            triples = await asyncio.to_thread(self._cache.get, key)
+
+        if triples is None:
+            triples = await self._reuse_near_duplicate(key, node)
+            if triples is None:
+                triples = await self._extract_once(key, node)
+            if triples is None:
+                # Nothing cached or journaled: the next run extracts the chunk again
+                return self.attach_triples(node, [])
+            if self._cache is not None:
+                await asyncio.to_thread(self._cache.put, key, triples)
+
+        if self._checkpoint is not None:
+            # Inline rather than in a thread: a cancelled task drops queued
+            # executor jobs, and this is the record of a paid-for LLM call
+            self._checkpoint(node, triples)
+        return self.attach_triples(node, triples)
+
+    async def acall(
+        self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any
+    ) -> Sequence[BaseNode]:
+        if self._scheduler is None:
+            return await super().acall(nodes, show_progress=show_progress, **kwargs)
+        # The scheduler bounds concurrency; every chunk is queued up front
+        return await asyncio.gather(*(self._aextract(node) for node in nodes))
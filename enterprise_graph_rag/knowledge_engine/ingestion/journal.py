@@ -0,0 +1,130 @@
+import os
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from knowledge_engine.ingestion.extraction_cache import Triple
+from knowledge_engine.ingestion.manifest import sqlite_transaction
+
+# Per-chunk stages, in order. A chunk only ever moves forward.
+PARSED = 1
+EXTRACTED = 2
+EMBEDDED = 3
+WRITTEN = 4
+
+STAGE_NAMES = {PARSED: "parsed", EXTRACTED: "extracted", EMBEDDED: "embedded", WRITTEN: "written"}
+
+
+class IngestionJournal:
+    """
+    Local crash-safe record of how far each chunk of an unfinished file got.
+
+    A killed worker that retries the batch reads it back: written chunks are
+    skipped outright and extracted chunks reuse their journaled triples, so
+    no LLM extraction is paid for twice. A file's rows are dropped once its
+    Document link commits, which keeps the journal as small as the work in
+    flight. Extracted triples are committed per chunk, as soon as they exist.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    file_hash TEXT NOT NULL,
+                    stage INTEGER NOT NULL,
+                    triples TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_file_hash ON chunks (file_hash)")
+
+    def _connect(self):
+        # Several Celery worker processes may share the journal file.
+        # WAL + NORMAL: commits survive a killed process without an fsync each
+        return sqlite_transaction(self.db_path, "PRAGMA synchronous=NORMAL")
+
+    def advance(self, stage: int, chunk_ids: Iterable[str], file_hash: str):
+        """Moves chunks to `stage`; never moves one backwards."""
+        now = time.time()
+        rows = [(chunk_id, file_hash, stage, now) for chunk_id in chunk_ids]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO chunks (chunk_id, file_hash, stage, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(chunk_id) DO UPDATE SET
+                    stage = MAX(stage, excluded.stage),
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+
+    def mark_written(self, chunk_ids: Iterable[str]):
+        """Called once the graph transaction holding these chunks committed."""
+        rows = [(time.time(), chunk_id) for chunk_id in chunk_ids]
+        if rows:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"UPDATE chunks SET stage = {WRITTEN}, triples = NULL, updated_at = ? WHERE chunk_id = ?",
+                    rows,
+                )
+
+    def record_extracted(self, chunk_id: str, file_hash: str, triples: List[Triple]):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO chunks (chunk_id, file_hash, stage, triples, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(chunk_id) DO UPDATE SET
+                    stage = MAX(stage, excluded.stage),
+                    triples = excluded.triples,
+                    updated_at = excluded.updated_at
+                """,
+                (chunk_id, file_hash, EXTRACTED, json.dumps(triples), time.time()),
+            )
+
+    def _select(self, chunk_ids: List[str], where: str) -> List[tuple]:
+        rows: List[tuple] = []
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(conn.execute(
+                    f"SELECT chunk_id, stage, triples FROM chunks WHERE chunk_id IN ({placeholders}) AND {where}",
+                    batch,
+                ))
+        return rows
+
+    def written(self, chunk_ids: List[str]) -> Set[str]:
+        return {row[0] for row in self._select(chunk_ids, f"stage >= {WRITTEN}")}
+
+    def extracted(self, chunk_ids: List[str]) -> Dict[str, List[Triple]]:
+        """Triples of chunks that finished extraction in an earlier attempt."""
+        return {
+            row[0]: [tuple(t) for t in json.loads(row[2])]
+            for row in self._select(chunk_ids, f"stage >= {EXTRACTED} AND triples IS NOT NULL")
+        }
+
+    def complete_files(self, file_hashes: Iterable[str]):
+        """The files' Document links are committed: nothing left to resume."""
+        hashes = [(h,) for h in file_hashes]
+        if hashes:
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM chunks WHERE file_hash = ?", hashes)
+
+    def stage_counts(self, file_hash: Optional[str] = None) -> Dict[str, int]:
+        query = "SELECT stage, count(*) FROM chunks"
+        params: tuple = ()
+        if file_hash:
+            query += " WHERE file_hash = ?"
+            params = (file_hash,)
+        with self._connect() as conn:
+            counts = dict(conn.execute(query + " GROUP BY stage", params).fetchall())
+        return {name: counts.get(stage, 0) for stage, name in STAGE_NAMES.items()}
@@ -1,152 +1,638 @@
 import os
-import hashlib
+import time
 import asyncio
-from typing import List, Set
-from llama_index.core import SimpleDirectoryReader, PropertyGraphIndex, Settings as LlamaSettings
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from llama_index.core import Settings as LlamaSettings
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.graph_stores.types import KG_NODES_KEY, KG_RELATIONS_KEY, TRIPLET_SOURCE_KEY
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
 
-# Import Schema-guided extractors
-from llama_index.core.indices.property_graph import SimpleLLMPathExtractor
-
 from knowledge_engine.core.config import settings
 from knowledge_engine.core.database import GraphDatabaseManager
 from knowledge_engine.core.logging import logger
+from knowledge_engine.core.queries import register_query
 from knowledge_engine.core.exceptions import IngestionError
+from knowledge_engine.ingestion.manifest import FileManifest
+from knowledge_engine.ingestion.extraction_cache import Triple, build_extraction_cache
+from knowledge_engine.ingestion.journal import EMBEDDED, PARSED, IngestionJournal
+from knowledge_engine.ingestion.dedup import NearDuplicateIndex
+from knowledge_engine.ingestion.prefilter import build_prefilter
+from knowledge_engine.ingestion.extractor import CachedPathExtractor
+from knowledge_engine.ingestion.scheduler import AdaptiveScheduler
+from knowledge_engine.ingestion.embeddings import EmbeddingService, get_embedding_cache
+from knowledge_engine.ingestion.writer import BulkGraphWriter
+from knowledge_engine.ingestion.parsing import (
+    ParseStage, claim_spool, list_spool, read_spool, release_spool, spool_path, write_spool
+)
+
+KNOWN_HASHES_QUERY = register_query("loader.known_hashes", """
+UNWIND $hashes AS hash
+MATCH (d:Document {file_hash: hash})
+RETURN hash
+""")
+
+# Documents ingested before update mode have no file_path (only their chunks
+# do) and chunks without a chunk_hash; they are found through their chunks
+PREVIOUS_CHUNK_HASHES_QUERY = register_query("loader.previous_chunk_hashes", """
+UNWIND $paths AS path
+MATCH (d:Document {file_path: path})
+OPTIONAL MATCH (c:Chunk)-[:BELONGS_TO]->(d)
+RETURN path, d.file_hash AS file_hash, collect(c.chunk_hash) AS chunk_hashes
+UNION ALL
+UNWIND $paths AS path
+MATCH (:Chunk {file_path: path})-[:BELONGS_TO]->(d:Document)
+WHERE d.file_path IS NULL
+WITH DISTINCT path, d
+RETURN path, d.file_hash AS file_hash, [] AS chunk_hashes
+""")
+
+# Update mode: applied in one transaction by _apply_document_update.
+# A chunk without a chunk_hash predates update mode and cannot be matched
+# against the new version, so it is always replaced.
+UPDATE_ADOPT_LEGACY_QUERY = register_query("loader.update_adopt_legacy", """
+MATCH (:Chunk {file_path: $file_path})-[:BELONGS_TO]->(d:Document)
+WHERE d.file_path IS NULL
+WITH DISTINCT d
+SET d.file_path = $file_path
+""")
+
+UPDATE_REMOVE_RELATIONS_QUERY = register_query("loader.update_remove_relations", """
+MATCH (:Document {file_path: $file_path})<-[:BELONGS_TO]-(c:Chunk)
+WHERE c.chunk_hash IN $removed OR c.chunk_hash IS NULL
+MATCH (c)-[:MENTIONS]->(e)-[r]-()
+WHERE r.triplet_source_id = c.id OR c.id IN coalesce(r.source_chunk_ids, [])
+WITH r, collect(DISTINCT c.id) AS gone
+WITH r, [s IN coalesce(r.source_chunk_ids, [r.triplet_source_id]) WHERE NOT s IN gone] AS rest
+SET r.source_chunk_ids = rest, r.triplet_source_id = coalesce(head(rest), r.triplet_source_id)
+WITH r, rest WHERE rest = []
+DELETE r
+""")
+
+UPDATE_REMOVE_CHUNKS_QUERY = register_query("loader.update_remove_chunks", """
+MATCH (:Document {file_path: $file_path})<-[:BELONGS_TO]-(c:Chunk)
+WHERE c.chunk_hash IN $removed OR c.chunk_hash IS NULL
+OPTIONAL MATCH (c)-[:MENTIONS]->(e)
+WITH collect(DISTINCT c) AS chunks, collect(DISTINCT e) AS entities
+FOREACH (c IN chunks | DETACH DELETE c)
+WITH entities
+UNWIND entities AS e
+WITH e WHERE NOT (e)<-[:MENTIONS]-()
+    AND NOT EXISTS { MATCH (e)-[r]-() WHERE r.triplet_source_id IS NOT NULL }
+DETACH DELETE e
+""")
+
+# Versions of the file ingested before update mode each have a Document; one is kept
+UPDATE_RELINK_QUERY = register_query("loader.update_relink", """
+MATCH (d:Document {file_path: $file_path})
+WITH collect(d) AS documents
+WITH head(documents) AS d, tail(documents) AS stale
+FOREACH (s IN stale | DETACH DELETE s)
+WITH d WHERE d IS NOT NULL
+SET d.file_hash = $file_hash, d.updated_at = timestamp()
+WITH d
+MATCH (c:Chunk {file_path: $file_path})
+SET c.file_hash = $file_hash
+MERGE (c)-[:BELONGS_TO]->(d)
+""")
+
+
+@dataclass
+class FilePlan:
+    """Work for one file: the chunks to extract and, for an update, the chunks to drop."""
+    file_path: str
+    file_hash: str
+    new_nodes: List[BaseNode] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    is_update: bool = False
+    pending: int = 0
+    file_name: Optional[str] = None
+    chunk_ids: List[str] = field(default_factory=list)
 
 class IngestionPipeline:
     def __init__(self):
         self.db_manager = GraphDatabaseManager.get_instance()
+        # Busy seconds per stage for the last run, summed over concurrent workers
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        # Entities the last run created; post-ingestion resolution is scoped to them
+        self.touched_entity_ids: Set[str] = set()
         
         # Configure LLMs with timeouts
+        # Client-side retries are off: 429s and transient errors are retried by the adaptive schedulers below
         self.llm = OpenAI(
             model=settings.OPENAI_MODEL, 
             temperature=0, 
-            request_timeout=60.0
+            request_timeout=60.0,
+            max_retries=0
         )
         self.embed_model = OpenAIEmbedding(
-            model_name=settings.EMBEDDING_MODEL
+            model_name=settings.EMBEDDING_MODEL,
+            embed_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_retries=0
+        )
+        # Optimization: AIMD concurrency control, starting at INGESTION_CONCURRENCY
+        self.extraction_scheduler = AdaptiveScheduler(
+            "extraction",
+            initial_limit=settings.INGESTION_CONCURRENCY,
+            max_limit=settings.INGESTION_MAX_CONCURRENCY
+        )
+        self.embedding_scheduler = AdaptiveScheduler(
+            "embedding",
+            initial_limit=settings.INGESTION_CONCURRENCY,
+            max_limit=settings.INGESTION_MAX_CONCURRENCY
+        )
+        # Optimization: Deduplicated, batched embeddings with an on-disk cache
+        self.embedding_service = EmbeddingService(
+            self.embed_model,
+            cache=get_embedding_cache(
+                settings.EMBEDDING_CACHE_DIR, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS
+            ) if settings.EMBEDDING_CACHE_ENABLED else None,
+            scheduler=self.embedding_scheduler,
+            max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS
         )
         # Optimization: Configurable Chunking
         LlamaSettings.node_parser = SentenceSplitter(
             chunk_size=settings.CHUNK_SIZE,
             chunk_overlap=settings.CHUNK_OVERLAP
         )
+        # Optimization: CPU-bound parsing runs in a process pool, separate from the network stages
+        self.parse_stage = ParseStage(
+            workers=settings.INGESTION_PARSE_WORKERS,
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP
+        )
+        # Optimization: Persistent manifest skips hashing unchanged files
+        self.manifest = FileManifest(
+            settings.MANIFEST_PATH,
+            hash_workers=settings.HASH_WORKERS
+        )
+        # Optimization: Hashes already confirmed in Neo4j (worker processes are long-lived)
+        self._known_hashes: Set[str] = set()
+        self._known_hashes_loaded_at = time.monotonic()
+        # Optimization: Unchanged chunks reuse their previous extraction
+        self.extraction_cache = build_extraction_cache(
+            backend=settings.EXTRACTION_CACHE_BACKEND,
+            sqlite_path=settings.EXTRACTION_CACHE_PATH,
+            redis_url=settings.EXTRACTION_CACHE_REDIS_URL,
+            max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES
+        )
+        # Optimization: Per-chunk checkpoints so a retried batch resumes instead of restarting
+        self.journal = IngestionJournal(settings.INGESTION_JOURNAL_PATH) if settings.INGESTION_JOURNAL_ENABLED else None
+        # Optimization: CPU-only pre-filter in front of the extractor
+        self.prefilter = build_prefilter(
+            backend=settings.PREFILTER_BACKEND,
+            threshold=settings.PREFILTER_THRESHOLD,
+            entity_types=settings.ALLOWED_ENTITY_TYPES,
+            relation_types=settings.ALLOWED_RELATION_TYPES,
+            spacy_model=settings.PREFILTER_SPACY_MODEL
+        )
+        # Optimization: Boilerplate chunks reuse the triples of a near-duplicate
+        self.dedup_index = NearDuplicateIndex(
+            threshold=settings.NEAR_DUP_THRESHOLD,
+            num_perm=settings.NEAR_DUP_NUM_PERM,
+            shingle_size=settings.NEAR_DUP_SHINGLE_SIZE,
+            max_entries=settings.NEAR_DUP_MAX_ENTRIES
+        ) if settings.NEAR_DUP_ENABLED else None
 
-    def _compute_file_hash(self, file_path: str) -> str:
-        """Calculates SHA256 hash of a file to detect changes."""
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
-
-    def _get_processed_hashes(self) -> Set[str]:
-        """Fetch list of already ingested file hashes from Neo4j."""
-        query = "MATCH (d:Document) RETURN d.file_hash as hash"
-        results = self.db_manager.run_cypher(query)
-        return {r['hash'] for r in results if r.get('hash')}
+    def _get_processed_hashes(self, candidate_hashes: List[str]) -> Set[str]:
+        """
+        Returns the subset of candidate hashes that are already ingested.
+        Optimization: Only the candidates are sent to Neo4j, in UNWIND batches
+        backed by the Document.file_hash uniqueness constraint.
+        """
+        # Drop the local cache periodically so deletions (e.g. reset_db) are noticed
+        if time.monotonic() - self._known_hashes_loaded_at > settings.KNOWN_HASH_CACHE_TTL:
+            self._known_hashes.clear()
+            self._known_hashes_loaded_at = time.monotonic()
+
+        unknown = list({h for h in candidate_hashes if h not in self._known_hashes})
+        batch_size = settings.HASH_CHECK_BATCH_SIZE
+        for start in range(0, len(unknown), batch_size):
+            results = self.db_manager.run_cypher(
+                KNOWN_HASHES_QUERY, {"hashes": unknown[start:start + batch_size]}, access="read"
+            )
+            self._known_hashes.update(r['hash'] for r in results)
+
+        return {h for h in candidate_hashes if h in self._known_hashes}
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
     
     async def process_directory_async(self, input_dir: str) -> dict:
+        try:
+            return await self._process_directory(input_dir)
+        finally:
+            # The pipeline outlives the run (one per Celery worker process); its pool must not
+            self.parse_stage.close()
+
+    async def _process_directory(self, input_dir: str) -> dict:
+        self.stage_seconds.clear()
+        self.touched_entity_ids = set()
+        # Optimization: Stage Split
+        # An extract-only machine consumes what parse-only machines spooled.
+        if settings.INGESTION_STAGES == "extract":
+            return await self.process_spool_async(settings.INGESTION_SPOOL_DIR)
+
         if not os.path.exists(input_dir):
             raise IngestionError(f"Directory {input_dir} not found.")
 
         logger.info("starting_smart_ingestion", directory=input_dir)
         
         # 1. Delta Load Logic
-        processed_hashes = self._get_processed_hashes()
+        # Hashing runs in a thread pool, off the event loop
+        with self._stage("scan"):
+            scan = await asyncio.to_thread(self.manifest.scan, input_dir)
+        scan_stats = {"hashed": scan.hashed, "from_manifest": scan.from_manifest}
+
+        processed_hashes = self._get_processed_hashes([fh for _, fh in scan.files])
         logger.info("found_existing_records", count=len(processed_hashes))
 
         # Filter files
         files_to_process = []
         skipped_count = 0
-        
-        for root, _, files in os.walk(input_dir):
-            for file in files:
-                if file.startswith("."): continue # Skip hidden
-                file_path = os.path.join(root, file)
-                file_hash = self._compute_file_hash(file_path)
-                
-                if file_hash in processed_hashes:
-                    skipped_count += 1
-                else:
-                    files_to_process.append((file_path, file_hash))
+
+        for file_path, file_hash in scan.files:
+            if file_hash in processed_hashes:
+                skipped_count += 1
+            else:
+                files_to_process.append((file_path, file_hash))
 
         if not files_to_process:
             logger.info("no_new_files_detected")
-            return {"status": "skipped", "processed": 0, "skipped": skipped_count}
+            return {"status": "skipped", "processed": 0, "skipped": skipped_count, **scan_stats}
 
         logger.info("processing_new_files", count=len(files_to_process))
 
+        if settings.INGESTION_STAGES == "parse":
+            spooled = await self._spool_files(files_to_process)
+            return {"status": "spooled", "processed": spooled, "skipped": skipped_count, **scan_stats}
+
+        result = await self._ingest_stream(self._parse_files(files_to_process))
+        return {"processed": len(files_to_process), "skipped": skipped_count, **result, **scan_stats}
+
+    async def process_spool_async(self, spool_dir: str) -> dict:
+        """Extract-only entrypoint: indexes files another machine already parsed."""
+        self.stage_seconds.clear()
+        self.touched_entity_ids = set()
+        entries = await asyncio.to_thread(list_spool, spool_dir)
+        if not entries:
+            logger.info("spool_empty", spool_dir=spool_dir)
+            return {"status": "skipped", "processed": 0, "skipped": 0}
+
+        logger.info("processing_spooled_files", count=len(entries))
+        claimed: List[Tuple[str, str]] = []  # (entry, claimed path)
+
+        async def _read():
+            for path in entries:
+                taken = await asyncio.to_thread(claim_spool, path)
+                if taken is None:
+                    continue  # another extract-only machine is ingesting it
+                claimed.append((path, taken))
+                yield await asyncio.to_thread(read_spool, taken)
+
+        try:
+            result = await self._ingest_stream(_read())
+        except BaseException:
+            for path, taken in claimed:
+                release_spool(taken, path)
+            raise
+        # Entries are only dropped once their chunks are committed
+        for _, taken in claimed:
+            os.remove(taken)
+        return {"processed": len(claimed), "skipped": len(entries) - len(claimed), **result}
+
+    async def _parse_files(self, files_to_process: List[Tuple[str, str]]):
+        """
+        Yields (file_path, file_hash, nodes) in order while keeping up to one
+        parse job per parse worker running ahead of the consumer.
+        """
+        lookahead = max(1, self.parse_stage.workers)
+        pending: deque = deque()
+
+        async def _parse(file_path: str, file_hash: str) -> List[BaseNode]:
+            with self._stage("parse"):
+                return await self.parse_stage.parse(file_path, file_hash)
+
+        try:
+            for file_path, file_hash in files_to_process:
+                pending.append((file_path, file_hash, asyncio.ensure_future(_parse(file_path, file_hash))))
+                if len(pending) >= lookahead:
+                    f_path, f_hash, job = pending.popleft()
+                    yield f_path, f_hash, await job
+            while pending:
+                f_path, f_hash, job = pending.popleft()
+                yield f_path, f_hash, await job
+        finally:
+            for _, _, job in pending:
+                job.cancel()
+
+    async def _spool_files(self, files_to_process: List[Tuple[str, str]]) -> int:
+        """Parse-only entrypoint: writes parsed chunks for an extract-only machine."""
+        spool_dir = settings.INGESTION_SPOOL_DIR
+        todo = [
+            (fp, fh) for fp, fh in files_to_process
+            if not os.path.exists(spool_path(spool_dir, fh))  # already waiting for extraction
+        ]
+        count = 0
+        async for file_path, file_hash, nodes in self._parse_files(todo):
+            if nodes:
+                await asyncio.to_thread(write_spool, spool_dir, file_path, file_hash, nodes)
+                count += 1
+        logger.info("files_spooled", count=count, spool_dir=spool_dir)
+        return count
+
+    async def _ingest_stream(self, parsed_files) -> dict:
+        """
+        Indexing stage: consumes (file_path, file_hash, nodes) from the parse
+        stage and extracts, embeds and writes them.
+        """
         # 2. Setup Ontology-Guided Extractor
         # This forces the LLM to only look for specific things, saving tokens and improving graph quality.
-        kg_extractor = SimpleLLMPathExtractor(
-            llm=LlamaSettings.llm,
-            extract_prompt_kwargs={
-                "allowed_entity_types": settings.ALLOWED_ENTITY_TYPES,
-                "allowed_relation_types": settings.ALLOWED_RELATION_TYPES
-            },
-            num_workers=4,
+        # Cached per chunk content + ontology + model + prompt version.
+        kg_extractor = CachedPathExtractor(
+            llm=self.llm,
+            allowed_entity_types=settings.ALLOWED_ENTITY_TYPES,
+            allowed_relation_types=settings.ALLOWED_RELATION_TYPES,
+            model_name=settings.OPENAI_MODEL,
+            cache=self.extraction_cache,
+            scheduler=self.extraction_scheduler,
+            dedup=self.dedup_index,
+            checkpoint=self._checkpoint_extraction if self.journal else None,
             max_paths_per_chunk=10
         )
 
         store = self.db_manager.get_store()
+        # Optimization: Write-behind bulk writer instead of per-call store upserts
+        writer = BulkGraphWriter(
+            self.db_manager,
+            batch_size=settings.GRAPH_WRITE_BATCH_SIZE,
+            flush_interval=settings.GRAPH_WRITE_FLUSH_INTERVAL,
+            max_retries=settings.GRAPH_WRITE_MAX_RETRIES,
+            on_flush=self._checkpoint_flush if self.journal else None
+        )
+
+        # 3. Process Batch (streaming)
+        # Optimization: Files are parsed one at a time and handed to the indexing
+        # stage in windows of INGESTION_WINDOW_SIZE chunks through a bounded queue,
+        # so memory stays flat and the first writes land while parsing continues.
+        stats = defaultdict(int)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGESTION_QUEUE_SIZE)
+        workers = max(1, settings.INGESTION_INDEX_WORKERS)
 
-        # 3. Process Batch
+        async def produce():
+            async for file_path, file_hash, nodes in parsed_files:
+                plan = await self._plan_file(file_path, file_hash, nodes, stats)
+                if plan is None:
+                    continue
+                plan.file_name = nodes[0].metadata.get('file_name')
+                windows = [
+                    plan.new_nodes[i:i + settings.INGESTION_WINDOW_SIZE]
+                    for i in range(0, len(plan.new_nodes), settings.INGESTION_WINDOW_SIZE)
+                ] or [[]]
+                plan.pending = len(windows)
+                plan.chunk_ids = [n.id_ for n in plan.new_nodes]
+                plan.new_nodes = []  # windows own the nodes from here on
+                if self.journal:
+                    await asyncio.to_thread(self.journal.advance, PARSED, plan.chunk_ids, plan.file_hash)
+                for window in windows:
+                    await queue.put((plan, window))
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def consume():
+            while (item := await queue.get()) is not None:
+                plan, window = item
+                await self._index_nodes(window, kg_extractor, store, writer, stats) # <--- APPLIED SCHEMA HERE
+                stats["chunks_extracted"] += len(window)
+                plan.pending -= 1
+                if plan.pending == 0 and not plan.is_update:
+                    # Every chunk of the file is buffered: link them so the Document
+                    # (the "already ingested" marker) appears only for complete files
+                    with self._stage("write"):
+                        await asyncio.to_thread(writer.write, links=self._link_chunks_to_documents([plan]))
+                elif plan.pending == 0:
+                    with self._stage("write"):
+                        # The swap below must see the new chunks
+                        await asyncio.to_thread(writer.flush)
+                        # Swap the modified document over to its new version atomically
+                        await asyncio.to_thread(
+                            self._apply_document_update, plan.file_path, plan.file_hash, plan.removed
+                        )
+                    if self.journal:
+                        await asyncio.to_thread(self.journal.complete_files, [plan.file_hash])
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(workers)]
         try:
-            # Load only new files
-            paths = [fp for fp, _ in files_to_process]
-            reader = SimpleDirectoryReader(input_files=paths, filename_as_id=True)
-            documents = reader.load_data()
-
-            # Inject Metadata (Hash) into Document objects
-            # We map filename to hash for injection
-            hash_map = {fp: fh for fp, fh in files_to_process}
-            
-            for doc in documents:
-                f_path = doc.metadata.get('file_path')
-                if f_path and f_path in hash_map:
-                    doc.metadata['file_hash'] = hash_map[f_path]
-                    # Also explicitly tag the document type
-                    doc.metadata['entity_type'] = 'Document'
-
-            logger.info("extracting_graph_with_schema")
+            await asyncio.gather(*tasks)
+            with self._stage("write"):
+                await asyncio.to_thread(writer.flush)
             
-            # Use run_in_executor to keep the main loop free
-            await asyncio.to_thread(
-                PropertyGraphIndex.from_documents,
-                documents,
-                property_graph_store=store,
-                kg_extractors=[kg_extractor], # <--- APPLIED SCHEMA HERE
-                show_progress=True
+            cache_stats = self.extraction_cache.stats() if self.extraction_cache else {}
+            if self.dedup_index:
+                cache_stats.update(self.dedup_index.stats())
+            logger.info("extraction_cache_stats", **cache_stats)
+            logger.info(
+                "provider_scheduler_stats",
+                extraction=self.extraction_scheduler.metrics(),
+                embedding=self.embedding_scheduler.metrics()
             )
-            
-            # 4. Post-Process: Link Source Documents
-            # The PropertyGraphIndex creates chunks, but we want a clean Document Node too.
-            # We run a quick Cypher to ensure the 'Document' node exists and is linked.
-            self._link_chunks_to_documents()
+            logger.info("embedding_service_stats", **self.embedding_service.stats)
 
-            return {"status": "success", "processed": len(files_to_process), "skipped": skipped_count}
+            logger.info("graph_writer_stats", **writer.stats)
+
+            stage_seconds = {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()}
+            logger.info("ingestion_stage_seconds", **stage_seconds)
+
+            return {"status": "success", **stats, **cache_stats, "stage_seconds": stage_seconds}
 
         except Exception as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Cancels the parse stage's look-ahead jobs instead of leaving them to the GC
+            await parsed_files.aclose()
             logger.error("ingestion_failed", error=str(e), exc_info=True)
             raise IngestionError(f"Smart processing failed: {str(e)}")
 
-    def _link_chunks_to_documents(self):
+    async def _plan_file(self, file_path: str, file_hash: str, nodes: List[BaseNode],
+                         stats: dict) -> Optional[FilePlan]:
+        """
+        Decides which of a parsed file's chunks need extraction.
+        Optimization: Update Mode
+        A modified file keeps its unchanged chunks; only the edit is extracted.
+        """
+        if not nodes:
+            return None
+
+        stored = None
+        if settings.INGESTION_UPDATE_MODE:
+            previous = await asyncio.to_thread(self._get_previous_chunk_hashes, [file_path])
+            stored = previous.get(file_path)
+
+        if stored is None:
+            return FilePlan(file_path, file_hash, new_nodes=nodes)
+
+        current = {n.metadata['chunk_hash'] for n in nodes}
+        plan = FilePlan(
+            file_path,
+            file_hash,
+            new_nodes=[n for n in nodes if n.metadata['chunk_hash'] not in stored],
+            removed=sorted(stored - current),
+            is_update=True
+        )
+        stats["updated"] += 1
+        stats["chunks_kept"] += len(current & stored)
+        stats["chunks_removed"] += len(plan.removed)
+        logger.info(
+            "document_diffed",
+            file_path=file_path,
+            chunks_new=len(plan.new_nodes),
+            chunks_removed=len(plan.removed)
+        )
+        return plan
+
+    async def _index_nodes(self, nodes: List[BaseNode], kg_extractor: CachedPathExtractor, store,
+                           writer: BulkGraphWriter, stats: dict):
+        """
+        Pre-filter -> extract -> embed -> persist, mirroring PropertyGraphIndex._insert_nodes.
+        Optimization: Provider calls run on this event loop under the adaptive
+        schedulers; rows are handed to the bulk writer, which flushes in batches.
+        """
+        # Optimization: Resume
+        # After a crash, chunks already committed are skipped and chunks already
+        # extracted reuse their journaled triples instead of calling the LLM again
+        resumed: List[BaseNode] = []
+        if self.journal and nodes:
+            ids = [n.id_ for n in nodes]
+            written = await asyncio.to_thread(self.journal.written, ids)
+            prior = await asyncio.to_thread(self.journal.extracted, ids)
+            nodes = [n for n in nodes if n.id_ not in written]
+            resumed = [CachedPathExtractor.attach_triples(n, prior[n.id_]) for n in nodes if n.id_ in prior]
+            nodes = [n for n in nodes if n.id_ not in prior]
+            stats["resumed_written"] += len(written)
+            stats["resumed_extracted"] += len(resumed)
+
+        if not nodes and not resumed:
+            return
+
+        # Optimization: Chunks with nothing the ontology can use skip the LLM
+        # (they are still embedded and written for vector retrieval)
+        to_extract, skipped = nodes, []
+        with self._stage("extract"):
+            if self.prefilter and nodes:
+                to_extract, skipped = await asyncio.to_thread(self.prefilter.split, nodes)
+            if to_extract:
+                to_extract = await kg_extractor.acall(to_extract)
+        stats["prefilter_skipped"] += len(skipped)
+        stats["prefilter_extracted"] += len(to_extract)
+        stats["chunks_empty"] += sum(1 for n in to_extract if not n.metadata.get(KG_NODES_KEY))
+        nodes = list(to_extract) + resumed + skipped
+
+        kg_nodes = []
+        kg_rels = []
+        for node in nodes:
+            for kg_node in node.metadata.pop(KG_NODES_KEY, []):
+                kg_node.properties[TRIPLET_SOURCE_KEY] = node.id_
+                kg_nodes.append(kg_node)
+            for kg_rel in node.metadata.pop(KG_RELATIONS_KEY, []):
+                kg_rel.properties[TRIPLET_SOURCE_KEY] = node.id_
+                kg_rels.append(kg_rel)
+
+        # Entities already in the graph are not re-embedded; their chunks still get a MENTIONS edge
+        mentions: List[Tuple[str, str]] = []
+        if kg_nodes:
+            existing = await asyncio.to_thread(store.get, ids=list({n.id for n in kg_nodes}))
+            existing_ids = {n.id for n in existing}
+            known = [n for n in kg_nodes if n.id in existing_ids or writer.has_entity(n.id)]
+            mentions = [(n.properties[TRIPLET_SOURCE_KEY], n.id) for n in known]
+            kg_nodes = [n for n in kg_nodes if n.id not in existing_ids and not writer.has_entity(n.id)]
+            self.touched_entity_ids.update(n.id for n in kg_nodes)
+        stats["entities_created"] += len(kg_nodes)
+
+        # One deduplicated, cache-backed request set for chunks and entities together
+        with self._stage("embed"):
+            embeddings = await self.embedding_service.aembed(
+                [n.get_content(metadata_mode=MetadataMode.EMBED) for n in nodes] + [str(n) for n in kg_nodes]
+            )
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        for kg_node, embedding in zip(kg_nodes, embeddings[len(nodes):]):
+            kg_node.embedding = embedding
+
+        if self.journal:
+            await asyncio.to_thread(self._checkpoint_embedded, nodes)
+
+        # Nodes are buffered ahead of relations; the writer flushes them in that order
+        with self._stage("write"):
+            await asyncio.to_thread(
+                writer.write, chunks=nodes, entities=kg_nodes, relations=kg_rels, mentions=mentions
+            )
+
+    def _checkpoint_extraction(self, node: BaseNode, triples: List[Triple]):
+        self.journal.record_extracted(node.id_, node.metadata.get('file_hash', ''), triples)
+
+    def _checkpoint_embedded(self, nodes: List[BaseNode]):
+        by_file: Dict[str, List[str]] = defaultdict(list)
+        for node in nodes:
+            by_file[node.metadata.get('file_hash', '')].append(node.id_)
+        for file_hash, chunk_ids in by_file.items():
+            self.journal.advance(EMBEDDED, chunk_ids, file_hash)
+
+    def _checkpoint_flush(self, chunk_ids: List[str], linked_file_hashes: List[str]):
+        """Runs after each committed graph flush."""
+        self.journal.mark_written(chunk_ids)
+        # A linked Document means the whole file is in the graph
+        self.journal.complete_files(linked_file_hashes)
+
+    def _get_previous_chunk_hashes(self, paths: List[str]) -> Dict[str, Set[str]]:
+        """Chunk hashes stored for files that were ingested before under the same path."""
+        results = self.db_manager.run_cypher(PREVIOUS_CHUNK_HASHES_QUERY, {"paths": paths}, access="read")
+        # The old version is about to be replaced; stop treating its hash as ingested
+        self._known_hashes.difference_update(r['file_hash'] for r in results)
+        previous: Dict[str, Set[str]] = defaultdict(set)
+        for r in results:
+            previous[r['path']].update(r['chunk_hashes'])
+        return dict(previous)
+
+    def _apply_document_update(self, file_path: str, file_hash: str, removed: List[str]):
+        """
+        In one transaction: drop chunks that disappeared from the file together with
+        the relations only they produced and entities nothing else mentions, then
+        move the Document and its surviving chunks to the new hash. A Document from
+        before update mode is adopted first and all of its chunks are replaced.
+        """
+        params = {"file_path": file_path, "file_hash": file_hash, "removed": removed}
+        self.db_manager.run_write_transaction([
+            (UPDATE_ADOPT_LEGACY_QUERY, params),
+            (UPDATE_REMOVE_RELATIONS_QUERY, params),
+            (UPDATE_REMOVE_CHUNKS_QUERY, params),
+            (UPDATE_RELINK_QUERY, params),
+        ])
+        logger.info("document_updated", file_path=file_path, chunks_removed=len(removed))
+
+    def _link_chunks_to_documents(self, plans: List[FilePlan]) -> List[dict]:
         """
         Optimization: Explicitly link chunks back to a parent 'Document' node 
         for better citation/filtering.
+        Scoped to the files of the current batch: one row per file hash with its
+        chunk ids, flushed by the writer in the same transaction as (or after) the
+        chunks, instead of re-linking every chunk in the graph after each run.
         """
-        logger.info("linking_metadata_nodes")
-        # Cypher to ensure (:Document) nodes exist based on properties stored in Chunks
-        query = """
-        MATCH (c:Chunk)
-        WHERE c.file_hash IS NOT NULL
-        MERGE (d:Document {file_hash: c.file_hash})
-        ON CREATE SET 
-            d.file_name = c.file_name, 
-            d.created_at = timestamp()
-        MERGE (c)-[:BELONGS_TO]->(d)
-        """
-        self.db_manager.run_cypher(query)
\ No newline at end of file
+        return [
+            {
+                "file_hash": plan.file_hash,
+                "file_path": plan.file_path,
+                "file_name": plan.file_name,
+                "chunk_ids": plan.chunk_ids,
+            }
+            for plan in plans
+        ]
@@ -0,0 +1,169 @@
+import os
+import json
+import asyncio
+import socket
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, Document, MetadataMode, TextNode
+
+from knowledge_engine.core.logging import logger
+
+# One splitter per (chunk_size, chunk_overlap) per process
+_PARSERS: Dict[Tuple[int, int], SentenceSplitter] = {}
+
+
+def _get_parser(chunk_size: int, chunk_overlap: int) -> SentenceSplitter:
+    key = (chunk_size, chunk_overlap)
+    if key not in _PARSERS:
+        _PARSERS[key] = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return _PARSERS[key]
+
+
+def chunk_documents(documents: List[Document], node_parser: SentenceSplitter) -> List[BaseNode]:
+    """
+    Splits documents into chunks with content-derived identity.
+    The chunk id is stable for the same text in the same file, so re-runs
+    upsert instead of duplicating.
+    """
+    nodes = node_parser.get_nodes_from_documents(documents)
+    for node in nodes:
+        text = node.get_content(metadata_mode=MetadataMode.NONE)
+        chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        f_path = node.metadata.get('file_path', '')
+        node.id_ = hashlib.sha256(f"{f_path}|{chunk_hash}".encode("utf-8")).hexdigest()
+        node.metadata['chunk_hash'] = chunk_hash
+        # Bookkeeping keys should not influence prompts or embeddings
+        for key in ('chunk_hash', 'file_hash'):
+            if key not in node.excluded_llm_metadata_keys:
+                node.excluded_llm_metadata_keys.append(key)
+            if key not in node.excluded_embed_metadata_keys:
+                node.excluded_embed_metadata_keys.append(key)
+    return nodes
+
+
+def parse_file(file_path: str, file_hash: str, chunk_size: int, chunk_overlap: int) -> List[BaseNode]:
+    """
+    Parses and chunks a single file. CPU-bound (PDF/DOCX decoding, sentence
+    splitting); module-level so it can run in a worker process.
+    """
+    reader = SimpleDirectoryReader(input_files=[file_path], filename_as_id=True)
+    documents = reader.load_data()
+
+    # Inject Metadata (Hash) into Document objects
+    for doc in documents:
+        doc.metadata['file_path'] = file_path
+        doc.metadata['file_hash'] = file_hash
+        # Also explicitly tag the document type
+        doc.metadata['entity_type'] = 'Document'
+
+    return chunk_documents(documents, _get_parser(chunk_size, chunk_overlap))
+
+
+def _in_daemon_process() -> bool:
+    """Daemonic processes cannot have children: stdlib ones, or billiard ones (Celery prefork)."""
+    if multiprocessing.current_process().daemon:
+        return True
+    try:
+        import billiard
+    except ImportError:
+        return False
+    return bool(billiard.current_process().daemon)
+
+
+class ParseStage:
+    """
+    Runs parse_file in a process pool sized to the available cores, so parsing
+    uses every core while the event loop drives the network-bound stages.
+    Falls back to a thread when processes cannot be forked (e.g. inside a
+    daemonic Celery prefork child).
+    """
+
+    def __init__(self, workers: int, chunk_size: int, chunk_overlap: int):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._use_processes = self.workers > 1 and not _in_daemon_process()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._use_processes and self._pool is None:
+            try:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            except (OSError, AssertionError) as e:
+                logger.warning("parse_pool_unavailable", error=str(e))
+                self._use_processes = False
+        return self._pool
+
+    async def parse(self, file_path: str, file_hash: str) -> List[BaseNode]:
+        args = (file_path, file_hash, self.chunk_size, self.chunk_overlap)
+        pool = self._get_pool()
+        if pool is None:
+            return await asyncio.to_thread(parse_file, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, parse_file, *args)
+
+    def close(self):
+        """Stops the pool; the next parse starts a new one."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# --- Hand-off between machines running only one stage ---
+
+def spool_path(spool_dir: str, file_hash: str) -> str:
+    return os.path.join(spool_dir, f"{file_hash}.json")
+
+
+def write_spool(spool_dir: str, file_path: str, file_hash: str, nodes: List[BaseNode]) -> str:
+    """Writes a parsed file atomically so a consumer never sees a partial entry."""
+    os.makedirs(spool_dir, exist_ok=True)
+    target = spool_path(spool_dir, file_hash)
+    tmp = target + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "file_path": file_path,
+            "file_hash": file_hash,
+            "nodes": [node.to_dict() for node in nodes],
+        }, f)
+    os.replace(tmp, target)
+    return target
+
+
+def read_spool(path: str) -> Tuple[str, str, List[BaseNode]]:
+    with open(path, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    nodes = [TextNode.from_dict(n) for n in entry["nodes"]]
+    return entry["file_path"], entry["file_hash"], nodes
+
+
+def claim_spool(path: str) -> Optional[str]:
+    """
+    Takes an entry for this process by renaming it out of list_spool's view:
+    the rename is atomic, so two extract-only machines never both ingest it.
+    Returns the claimed path, or None if another consumer got there first.
+    """
+    claimed = f"{path[:-len('.json')]}.{socket.gethostname()}-{os.getpid()}.claimed"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def release_spool(claimed: str, path: str):
+    """Hands a claimed entry back, for the next run to retry."""
+    os.replace(claimed, path)
+
+
+def list_spool(spool_dir: str) -> List[str]:
+    if not os.path.isdir(spool_dir):
+        return []
+    return sorted(
+        os.path.join(spool_dir, name) for name in os.listdir(spool_dir) if name.endswith(".json")
+    )
@@ -0,0 +1,168 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from knowledge_engine.core.logging import logger
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'\-]*|\d+")
+_NAME_RE = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b")
+_TOC_LINE_RE = re.compile(r"(\.{3,}|\s{4,}|…)\s*\d+\s*$")
+
+# Capitalised words that are not names on their own
+_COMMON_CAPS = {
+    "The", "This", "That", "These", "Those", "A", "An", "In", "On", "At", "For", "Of", "To",
+    "If", "It", "We", "You", "Our", "Your", "All", "Any", "No", "Page", "Section", "Chapter",
+    "Table", "Contents", "Figure", "Appendix", "Note", "See",
+}
+
+# Words that tend to surround entities of each allowed type. Types not listed
+# fall back to their own name.
+_TYPE_CUES = {
+    "Person": ["mr", "mrs", "ms", "dr", "ceo", "cto", "manager", "director", "engineer",
+               "employee", "lead", "head", "officer", "analyst"],
+    "Organization": ["inc", "ltd", "llc", "corp", "company", "department", "team", "agency",
+                     "university", "division", "group", "vendor", "partner"],
+    "Project": ["project", "initiative", "program", "programme", "launch", "rollout", "migration"],
+    "Location": ["office", "city", "country", "street", "region", "site", "building", "campus"],
+    "Topic": ["topic", "policy", "strategy", "research", "subject", "area"],
+    "Document": ["report", "memo", "document", "contract", "agreement", "specification"],
+}
+
+# spaCy NER labels -> ontology types they can produce
+_SPACY_LABELS = {
+    "PERSON": "Person",
+    "ORG": "Organization",
+    "NORP": "Organization",
+    "GPE": "Location",
+    "LOC": "Location",
+    "FAC": "Location",
+    "PRODUCT": "Project",
+    "EVENT": "Project",
+    "WORK_OF_ART": "Document",
+    "LAW": "Document",
+}
+
+
+class ChunkScorer:
+    """Scores chunk texts for extraction-worthiness in [0, 1]. CPU-only."""
+
+    name = "base"
+
+    def score_many(self, texts: Sequence[str]) -> List[float]:
+        raise NotImplementedError
+
+
+class LexicalScorer(ChunkScorer):
+    """
+    Cheap lexical signals: how much of the text is prose, how many name-like
+    spans it has, and how many cue words tied to the allowed entity and
+    relation types appear. Tables of contents, page furniture and number
+    tables score near zero.
+    """
+
+    name = "lexical"
+
+    def __init__(self, entity_types: Sequence[str], relation_types: Sequence[str], min_words: int = 6):
+        self.min_words = min_words
+        cues = set()
+        for entity_type in entity_types:
+            cues.update(_TYPE_CUES.get(entity_type, [entity_type.lower()]))
+        for relation_type in relation_types:
+            # MANAGES -> "manag", REPORTS_TO -> "repor": prefix match covers inflections
+            cues.update(part.lower()[:5] for part in relation_type.split("_") if len(part) > 2)
+        self._cues = cues
+        self._prefixes = tuple(c for c in cues if len(c) == 5)
+
+    def _is_cue(self, word: str) -> bool:
+        return word in self._cues or word.startswith(self._prefixes)
+
+    def score(self, text: str) -> float:
+        words = _WORD_RE.findall(text)
+        if len(words) < self.min_words:
+            return 0.0
+
+        alpha_ratio = sum(1 for w in words if not w.isdigit()) / len(words)
+
+        lines = [line for line in text.splitlines() if line.strip()]
+        toc_ratio = sum(1 for line in lines if _TOC_LINE_RE.search(line)) / len(lines) if lines else 0.0
+
+        names = [n for n in _NAME_RE.findall(text) if n not in _COMMON_CAPS]
+        cue_hits = sum(1 for w in words if self._is_cue(w.lower()))
+
+        evidence = min(1.0, 0.25 * len(set(names)) + 0.15 * cue_hits)
+        return alpha_ratio * evidence * (1.0 - toc_ratio)
+
+    def score_many(self, texts: Sequence[str]) -> List[float]:
+        return [self.score(t) for t in texts]
+
+
+class SpacyNERScorer(ChunkScorer):
+    """
+    Counts named entities whose spaCy label maps onto an allowed entity type.
+    Uses the same spaCy model Presidio loads for PII analysis.
+    """
+
+    name = "spacy"
+
+    def __init__(self, entity_types: Sequence[str], model: str = "en_core_web_lg", batch_size: int = 64):
+        import spacy  # optional: only needed for this scorer
+
+        # Only the NER component is needed
+        self.nlp = spacy.load(model, exclude=["parser", "lemmatizer", "textcat"])
+        self.batch_size = batch_size
+        allowed = set(entity_types)
+        self.labels = {label for label, entity_type in _SPACY_LABELS.items() if entity_type in allowed}
+
+    def score_many(self, texts: Sequence[str]) -> List[float]:
+        scores = []
+        for doc in self.nlp.pipe(texts, batch_size=self.batch_size):
+            hits = {ent.text for ent in doc.ents if ent.label_ in self.labels}
+            scores.append(min(1.0, len(hits) / 2.0))
+        return scores
+
+
+class ChunkPreFilter:
+    """
+    Routes chunks that are unlikely to yield triples from the ontology past
+    the LLM extractor. A chunk is skipped only if every scorer rates it below
+    the threshold. Skipped chunks are still written and embedded, so vector
+    retrieval keeps seeing them.
+    """
+
+    def __init__(self, scorers: List[ChunkScorer], threshold: float):
+        self.scorers = scorers
+        self.threshold = threshold
+
+    def split(self, nodes: Sequence[BaseNode]) -> Tuple[List[BaseNode], List[BaseNode]]:
+        """Returns (worth extracting, skipped)."""
+        texts = [n.get_content(metadata_mode=MetadataMode.NONE) for n in nodes]
+        best = [0.0] * len(texts)
+        for scorer in self.scorers:
+            for i, score in enumerate(scorer.score_many(texts)):
+                best[i] = max(best[i], score)
+
+        keep, skip = [], []
+        for node, score in zip(nodes, best):
+            (keep if score >= self.threshold else skip).append(node)
+        return keep, skip
+
+
+def build_prefilter(backend: str, threshold: float, entity_types: Sequence[str],
+                    relation_types: Sequence[str], spacy_model: str) -> Optional[ChunkPreFilter]:
+    """
+    Backend: "lexical", "spacy" (spaCy NER + lexical), or "none".
+    Falls back to lexical when the spaCy model is not installed.
+    """
+    if backend == "none":
+        return None
+
+    scorers: List[ChunkScorer] = [LexicalScorer(entity_types, relation_types)]
+    if backend == "spacy":
+        try:
+            scorers.insert(0, SpacyNERScorer(entity_types, model=spacy_model))
+        except (ImportError, OSError) as e:
+            logger.warning("spacy_prefilter_unavailable", model=spacy_model, error=str(e))
+
+    logger.info("prefilter_enabled", scorers=[s.name for s in scorers], threshold=threshold)
+    return ChunkPreFilter(scorers, threshold)
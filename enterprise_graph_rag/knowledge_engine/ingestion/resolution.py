@@ -0,0 +1,523 @@
+import os
+import re
+import json
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_engine.core.logging import logger
+from knowledge_engine.core.queries import register_query
+from knowledge_engine.ingestion.writer import (
+    BASE_ENTITY_LABEL, BASE_NODE_LABEL, ENTITY_LABEL, cypher_name, normalize_entity_name
+)
+
+# Labels every entity carries; the remaining one is its ontology type
+_BASE_LABELS = {BASE_NODE_LABEL, BASE_ENTITY_LABEL, ENTITY_LABEL}
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+_ROMAN_RE = re.compile(r"(?=[mdclxvi])m{0,3}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})")
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+    "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+# Hashed character trigram space for string similarity
+_NGRAM_DIM = 1024
+
+FETCH_QUERY = register_query("resolution.fetch_all", f"""
+MATCH (e:{BASE_ENTITY_LABEL})
+RETURN e.id AS id, e.name AS name, labels(e) AS labels, COUNT {{ (e)--() }} AS degree
+""")
+
+NEIGHBOURS_QUERY = register_query("resolution.neighbours", f"""
+UNWIND $prefixes AS prefix
+MATCH (e:{BASE_ENTITY_LABEL})
+WHERE e.normalized_name STARTS WITH prefix
+RETURN DISTINCT e.id AS id, e.name AS name, labels(e) AS labels, COUNT {{ (e)--() }} AS degree
+""")
+
+EMBEDDING_QUERY = register_query("resolution.embeddings", f"""
+UNWIND $ids AS id
+MATCH (e:{BASE_NODE_LABEL} {{id: id}})
+RETURN e.id AS id, e.embedding AS embedding
+""")
+
+# Runs inside the merge transaction: the SET write-locks the duplicates, so no
+# relationship of a type missed here can be added before they are deleted
+REL_TYPES_QUERY = register_query("resolution.relationship_types", f"""
+UNWIND $ids AS id
+MATCH (d:{BASE_NODE_LABEL} {{id: id}})
+SET d.resolution_lock = true
+WITH d
+MATCH (d)-[r]-()
+RETURN DISTINCT type(r) AS type
+""")
+
+# Relationship types cannot be parameters: one statement per type. Properties
+# are read before the old relationship is deleted; links between members of
+# the same cluster would become self-loops and are dropped. When the canonical
+# entity already has the relationship, the duplicate's source chunks are added
+# to it, so update mode keeps it while any of those chunks remain.
+MOVE_OUTGOING_TMPL = register_query("resolution.move_outgoing", f"""
+UNWIND $rows AS row
+MATCH (c:{BASE_NODE_LABEL} {{id: row.canonical}})
+MATCH (d:{BASE_NODE_LABEL} {{id: row.duplicate}})-[r:{{type}}]->(t)
+WITH c, t, r, properties(r) AS props
+DELETE r
+WITH c, t, props WHERE t <> c
+MERGE (c)-[n:{{type}}]->(t)
+ON CREATE SET n = props
+ON MATCH SET n.source_chunk_ids = reduce(
+    ids = [s IN coalesce(n.source_chunk_ids, [n.triplet_source_id]) WHERE s IS NOT NULL],
+    s IN [s IN coalesce(props.source_chunk_ids, [props.triplet_source_id]) WHERE s IS NOT NULL] |
+    CASE WHEN s IN ids THEN ids ELSE ids + s END
+)
+""")
+
+MOVE_INCOMING_TMPL = register_query("resolution.move_incoming", f"""
+UNWIND $rows AS row
+MATCH (c:{BASE_NODE_LABEL} {{id: row.canonical}})
+MATCH (s)-[r:{{type}}]->(d:{BASE_NODE_LABEL} {{id: row.duplicate}})
+WITH c, s, r, properties(r) AS props
+DELETE r
+WITH c, s, props WHERE s <> c
+MERGE (s)-[n:{{type}}]->(c)
+ON CREATE SET n = props
+ON MATCH SET n.source_chunk_ids = reduce(
+    ids = [s IN coalesce(n.source_chunk_ids, [n.triplet_source_id]) WHERE s IS NOT NULL],
+    s IN [s IN coalesce(props.source_chunk_ids, [props.triplet_source_id]) WHERE s IS NOT NULL] |
+    CASE WHEN s IN ids THEN ids ELSE ids + s END
+)
+""")
+
+DELETE_DUPLICATES_QUERY = register_query("resolution.delete_duplicates", f"""
+UNWIND $rows AS row
+MATCH (c:{BASE_NODE_LABEL} {{id: row.canonical}})
+MATCH (d:{BASE_NODE_LABEL} {{id: row.duplicate}})
+SET c.aliases = coalesce(c.aliases, []) + d.name
+DETACH DELETE d
+""")
+
+
+def soundex(text: str) -> str:
+    """American Soundex of the letters in text ('' if it has none)."""
+    letters = [ch for ch in text.lower() if "a" <= ch <= "z"]
+    if not letters:
+        return ""
+    code = [letters[0].upper()]
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != previous:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        if ch not in "hw":  # h/w do not separate equal codes
+            previous = digit
+    return "".join(code).ljust(4, "0")
+
+
+def comparable_name(name: str) -> str:
+    """normalize_entity_name plus punctuation and whitespace folding, for scoring only."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", (name or "").lower())).strip()
+
+
+def name_qualifiers(comparable: str) -> Tuple[Tuple[int, ...], str]:
+    """
+    The numbers in a comparable name and its roman-numeral suffix, if any.
+    Names that differ in these ("Policy 2022" / "Policy 2023", "Phase I" /
+    "Phase II") name different things however similar they look.
+    """
+    tokens = comparable.split()
+    suffix = tokens[-1] if len(tokens) > 1 and _ROMAN_RE.fullmatch(tokens[-1]) else ""
+    return tuple(int(d) for d in _DIGITS_RE.findall(comparable)), suffix
+
+
+class NgramIndex:
+    """
+    Hashed character trigrams of every name in CSR form. Dense vectors are
+    only materialised per block, so a million names never need a
+    million-row dense matrix.
+    """
+
+    def __init__(self, names: List[str]):
+        lengths = np.zeros(len(names), dtype=np.int64)
+        cols: List[int] = []
+        for i, name in enumerate(names):
+            padded = f"  {name} " if name else ""
+            grams = [zlib.crc32(padded[k:k + 3].encode("utf-8")) % _NGRAM_DIM for k in range(len(padded) - 2)]
+            cols.extend(grams)
+            lengths[i] = len(grams)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.cols = np.asarray(cols, dtype=np.int32)
+
+    def dense(self, members: np.ndarray) -> np.ndarray:
+        """L2-normalized trigram count vectors for the given rows."""
+        starts = self.indptr[members]
+        lengths = self.indptr[members + 1] - starts
+        rows = np.repeat(np.arange(len(members)), lengths)
+        # Positions of every member's trigrams in self.cols
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        vectors = np.zeros((len(members), _NGRAM_DIM), dtype=np.float32)
+        np.add.at(vectors, (rows, self.cols[np.repeat(starts, lengths) + offsets]), 1.0)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+@dataclass
+class EntityTable:
+    """Columnar view of the entities being resolved."""
+    ids: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    degrees: List[int] = field(default_factory=list)
+
+    def add(self, record: dict):
+        self.add_row(record["id"], record.get("name"), record.get("labels"), record.get("degree"))
+
+    def add_row(self, entity_id: str, name: Optional[str], labels: Optional[List[str]], degree: Optional[int]):
+        self.ids.append(entity_id)
+        self.names.append(name or "")
+        types = sorted(set(labels or []) - _BASE_LABELS)
+        self.labels.append(types[0] if types else ENTITY_LABEL)
+        self.degrees.append(int(degree or 0))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = np.arange(size)
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+class EntityResolver:
+    """
+    APOC-free fuzzy entity resolution.
+
+    1. Blocking: entities of the same type are only compared within a block
+       sharing a normalized-name prefix or a Soundex key.
+    2. Scoring: hashed trigram vectors give every in-block pair a string
+       similarity in one matrix product (sorted-neighbourhood windows for
+       oversized blocks). Pairs whose names differ in a number or a roman-
+       numeral suffix never match. Pairs with the same comparable name
+       match; every other pair above candidate_threshold matches only if
+       their stored embeddings agree (embedding_threshold). Embeddings are
+       fetched just for those pairs.
+    3. Clustering: union-find over the matches. The best-connected entity of
+       a cluster survives; clusters over max_cluster_size are reported, not
+       merged (usually a bad blocking key or a generic name).
+    4. Merging: batched write transactions, one UNWIND statement per
+       relationship type and direction, then the duplicates are deleted and
+       their names kept on the survivor as `aliases`.
+
+    Every run writes a JSON report of what was (or, in dry-run, would be) merged.
+    """
+
+    def __init__(self, db_manager, prefix_length: int = 4, candidate_threshold: float = 0.75, embedding_threshold: float = 0.9,
+                 max_block_size: int = 1000, window: int = 20, max_cluster_size: int = 50,
+                 batch_size: int = 500, fetch_size: int = 50_000, report_dir: Optional[str] = None):
+        self.db = db_manager
+        self.prefix_length = prefix_length
+        self.candidate_threshold = candidate_threshold
+        self.embedding_threshold = embedding_threshold
+        self.max_block_size = max_block_size
+        self.window = window
+        self.max_cluster_size = max_cluster_size
+        self.batch_size = batch_size
+        self.fetch_size = fetch_size
+        self.report_dir = report_dir
+
+    # --- loading ---
+
+    def fetch_all(self) -> EntityTable:
+        """
+        Every entity, streamed as tuples straight into the columnar table: one
+        query, fetch_size records per round trip, no per-row dicts.
+        """
+        table = EntityTable()
+        for row in self.db.iter_cypher(FETCH_QUERY, fetch_size=self.fetch_size, row_format="tuple", access="read"):
+            table.add_row(*row)
+        return table
+
+    def fetch_neighbours(self, entity_ids: Iterable[str]) -> Tuple[EntityTable, np.ndarray]:
+        """
+        The given entities plus every entity sharing their name prefix (index-
+        backed STARTS WITH on normalized_name). Returns the table and a mask of
+        the given entities.
+        """
+        ids = set(entity_ids)
+        # Entity ids are their names (EntityNode.id)
+        prefixes = sorted({normalize_entity_name(i)[:self.prefix_length] for i in ids} - {""})
+        table = EntityTable()
+        seen = set()
+        for start in range(0, len(prefixes), self.batch_size):
+            for record in self.db.run_cypher(
+                NEIGHBOURS_QUERY, {"prefixes": prefixes[start:start + self.batch_size]}, access="read"
+            ):
+                if record["id"] not in seen:
+                    seen.add(record["id"])
+                    table.add(record)
+        touched = np.fromiter((i in ids for i in table.ids), dtype=bool, count=len(table))
+        return table, touched
+
+    def _embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        vectors = {}
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            for record in self.db.run_cypher(EMBEDDING_QUERY, {"ids": batch}, access="read"):
+                if record.get("embedding"):
+                    vector = np.asarray(record["embedding"], dtype=np.float32)
+                    vectors[record["id"]] = vector / max(float(np.linalg.norm(vector)), 1e-9)
+        return vectors
+
+    # --- planning ---
+
+    def blocks(self, table: EntityTable, comparable: List[str]) -> List[np.ndarray]:
+        """
+        Index groups of same-type entities sharing a normalized_name prefix
+        (the key fetch_neighbours can look up) or a Soundex code.
+        """
+        keyed: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for i, (label, raw, name) in enumerate(zip(table.labels, table.names, comparable)):
+            if not name:
+                continue
+            keyed[(label, "p:" + normalize_entity_name(raw)[:self.prefix_length])].append(i)
+            phonetic = soundex(name)
+            if phonetic:
+                keyed[(label, "s:" + phonetic)].append(i)
+        return [np.asarray(members) for members in keyed.values() if len(members) > 1]
+
+    def candidate_pairs(self, blocks: List[np.ndarray], ngrams: NgramIndex,
+                        comparable: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(left, right, string similarity) for in-block pairs above candidate_threshold."""
+        lefts, rights, sims = [], [], []
+        for members in blocks:
+            if len(members) <= self.max_block_size:
+                block = ngrams.dense(members)
+                scores = block @ block.T
+                a, b = np.nonzero(np.triu(scores >= self.candidate_threshold, k=1))
+                lefts.append(members[a])
+                rights.append(members[b])
+                sims.append(scores[a, b])
+                continue
+
+            # Sorted neighbourhood: compare each name with the next `window` names,
+            # a slice of the block at a time
+            order = members[np.argsort([comparable[i] for i in members], kind="stable")]
+            for start in range(0, len(order) - 1, self.max_block_size):
+                segment = order[start:start + self.max_block_size + self.window]
+                vectors = ngrams.dense(segment)
+                for offset in range(1, min(self.window, len(segment) - 1) + 1):
+                    # Left ends inside this slice; the next slice starts after it
+                    left = np.arange(min(self.max_block_size, len(segment) - offset))
+                    scores = np.einsum("ij,ij->i", vectors[left], vectors[left + offset])
+                    keep = scores >= self.candidate_threshold
+                    lefts.append(segment[left[keep]])
+                    rights.append(segment[left[keep] + offset])
+                    sims.append(scores[keep])
+        if not lefts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float32)
+
+        left = np.concatenate(lefts).astype(np.int64)
+        right = np.concatenate(rights).astype(np.int64)
+        sim = np.concatenate(sims).astype(np.float32)
+        # A pair can share several blocks
+        lo, hi = np.minimum(left, right), np.maximum(left, right)
+        _, unique = np.unique(lo * (len(comparable) + 1) + hi, return_index=True)
+        return lo[unique], hi[unique], np.minimum(sim[unique], 1.0)
+
+    def plan(self, table: EntityTable, touched: Optional[np.ndarray] = None) -> dict:
+        """Pure planning step: which entities merge into which. No writes."""
+        timings = {}
+        start = time.perf_counter()
+        comparable = [comparable_name(n) for n in table.names]
+        blocks = self.blocks(table, comparable)
+        ngrams = NgramIndex(comparable)
+        timings["blocking"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        left, right, string_sim = self.candidate_pairs(blocks, ngrams, comparable)
+        if touched is not None:
+            # Incremental: only pairs involving a new entity
+            keep = touched[left] | touched[right]
+            left, right, string_sim = left[keep], right[keep], string_sim[keep]
+        # Similar-looking names with different numbers are different entities
+        qualifiers = {int(i): name_qualifiers(comparable[i]) for i in np.unique(np.concatenate([left, right]))}
+        compatible = np.fromiter((qualifiers[int(a)] == qualifiers[int(b)] for a, b in zip(left, right)),
+                                 dtype=bool, count=len(left))
+        rejected_pairs = int(len(left) - np.count_nonzero(compatible))
+        left, right, string_sim = left[compatible], right[compatible], string_sim[compatible]
+
+        score = string_sim.copy()
+        embedding_sim = np.full(len(left), np.nan, dtype=np.float32)
+        # Only the same name merges on strings alone; a merge cannot be undone
+        accepted = np.fromiter((comparable[a] == comparable[b] for a, b in zip(left, right)),
+                               dtype=bool, count=len(left))
+
+        uncertain = np.nonzero(~accepted)[0]
+        if len(uncertain):
+            ids = sorted({table.ids[i] for i in np.concatenate([left[uncertain], right[uncertain]])})
+            embedded = self._embeddings(ids)
+            dims = {len(v) for v in embedded.values()}
+            if len(dims) == 1:
+                # Row 0 is a zero vector for entities without an embedding
+                rows = {entity_id: k + 1 for k, entity_id in enumerate(embedded)}
+                matrix = np.vstack([np.zeros((1, dims.pop()), dtype=np.float32), *embedded.values()])
+                a = np.fromiter((rows.get(table.ids[i], 0) for i in left[uncertain]), dtype=np.int64)
+                b = np.fromiter((rows.get(table.ids[i], 0) for i in right[uncertain]), dtype=np.int64)
+                has = (a > 0) & (b > 0)
+                cosine = np.einsum("ij,ij->i", matrix[a], matrix[b])
+                embedding_sim[uncertain[has]] = cosine[has]
+                agree = has & (cosine >= self.embedding_threshold)
+                accepted[uncertain[agree]] = True
+                score[uncertain[agree]] = (string_sim[uncertain[agree]] + cosine[agree]) / 2
+        timings["scoring"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        uf = _UnionFind(len(table))
+        for a, b in zip(left[accepted], right[accepted]):
+            uf.union(int(a), int(b))
+        members: Dict[int, List[int]] = defaultdict(list)
+        for i in np.unique(np.concatenate([left[accepted], right[accepted]])):
+            members[uf.find(int(i))].append(int(i))
+        pair_score = {
+            (int(a), int(b)): float(s) for a, b, s in zip(left[accepted], right[accepted], score[accepted])
+        }
+
+        clusters, oversized = [], []
+        for group in members.values():
+            # Existing entities survive new ones, then the best connected;
+            # ties go to the shorter, then smaller id
+            group.sort(key=lambda i: (
+                bool(touched[i]) if touched is not None else False,
+                -table.degrees[i], len(table.ids[i]), table.ids[i],
+            ))
+            canonical, duplicates = group[0], group[1:]
+            entry = {
+                "canonical": {"id": table.ids[canonical], "name": table.names[canonical],
+                              "type": table.labels[canonical]},
+                "duplicates": [
+                    {"id": table.ids[d], "name": table.names[d],
+                     "score": round(pair_score.get((min(canonical, d), max(canonical, d)), 0.0), 4)}
+                    for d in duplicates
+                ],
+            }
+            (oversized if len(group) > self.max_cluster_size else clusters).append(entry)
+        timings["clustering"] = time.perf_counter() - start
+
+        return {
+            "entities": len(table),
+            "blocks": len(blocks),
+            "candidate_pairs": int(len(left)) + rejected_pairs,
+            "qualifier_rejected_pairs": rejected_pairs,
+            "embedding_checked_pairs": int(np.count_nonzero(~np.isnan(embedding_sim))),
+            "matched_pairs": int(np.count_nonzero(accepted)),
+            "clusters": clusters,
+            "oversized_clusters": oversized,
+            "merged_entities": sum(len(c["duplicates"]) for c in clusters),
+            "seconds": {k: round(v, 3) for k, v in timings.items()},
+        }
+
+    # --- merging ---
+
+    def apply(self, clusters: List[dict]) -> int:
+        """Merges clusters in write transactions of about batch_size duplicates."""
+        merged = 0
+        batch: List[dict] = []
+        for cluster in clusters:
+            # A cluster never spans two transactions
+            batch.extend({"canonical": cluster["canonical"]["id"], "duplicate": d["id"]}
+                         for d in cluster["duplicates"])
+            if len(batch) >= self.batch_size:
+                merged += self._merge_batch(batch)
+                batch = []
+        if batch:
+            merged += self._merge_batch(batch)
+        return merged
+
+    def _merge_batch(self, rows: List[dict]) -> int:
+        ids = sorted({r["duplicate"] for r in rows})
+
+        # Types are read in the merge transaction: one it does not see would be
+        # dropped by the DETACH DELETE instead of re-pointed
+        def plan(read):
+            types = [r["type"] for r in read(REL_TYPES_QUERY, {"ids": ids})]
+            statements = []
+            for template in (MOVE_OUTGOING_TMPL, MOVE_INCOMING_TMPL):
+                for rel_type in sorted(types):
+                    statements.append((template.substitute(type=cypher_name(rel_type)), {"rows": rows}))
+            statements.append((DELETE_DUPLICATES_QUERY, {"rows": rows}))
+            return statements
+
+        self.db.run_planned_write_transaction(plan)
+        return len(rows)
+
+    # --- entrypoints ---
+
+    def resolve_all(self, dry_run: bool = False) -> dict:
+        return self._run("full", self.fetch_all(), None, dry_run)
+
+    def resolve_ids(self, entity_ids: Iterable[str], dry_run: bool = False) -> dict:
+        table, touched = self.fetch_neighbours(entity_ids)
+        return self._run("incremental", table, touched, dry_run)
+
+    def _run(self, mode: str, table: EntityTable, touched: Optional[np.ndarray], dry_run: bool) -> dict:
+        report = {
+            "mode": mode,
+            "dry_run": dry_run,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "thresholds": {
+                "candidate": self.candidate_threshold,
+                "embedding": self.embedding_threshold,
+            },
+        }
+        if len(table) < 2:
+            report.update({"entities": len(table), "clusters": [], "merged_entities": 0})
+        else:
+            report.update(self.plan(table, touched))
+            if not dry_run and report["clusters"]:
+                start = time.perf_counter()
+                self.apply(report["clusters"])
+                report["seconds"]["merging"] = round(time.perf_counter() - start, 3)
+
+        report["report_path"] = self._write_report(report)
+        logger.info(
+            "entity_resolution_complete",
+            mode=mode,
+            dry_run=dry_run,
+            entities=report["entities"],
+            merged=report["merged_entities"],
+            oversized=len(report.get("oversized_clusters", [])),
+            report=report["report_path"],
+        )
+        return report
+
+    def _write_report(self, report: dict) -> Optional[str]:
+        if not self.report_dir or not (report["clusters"] or report.get("oversized_clusters")):
+            return None
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(
+            self.report_dir,
+            f"entity-resolution-{report['mode']}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json",
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
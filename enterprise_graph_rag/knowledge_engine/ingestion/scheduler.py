@@ -0,0 +1,253 @@
+import time
+import asyncio
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from openai import APIConnectionError
+from prometheus_client import Counter, Gauge
+
+from knowledge_engine.core.logging import logger
+
+T = TypeVar("T")
+
+# Live metrics, labelled by scheduler name ("extraction", "embedding")
+IN_FLIGHT = Gauge("ingestion_scheduler_in_flight", "Requests currently running", ["scheduler"])
+QUEUE_DEPTH = Gauge("ingestion_scheduler_queue_depth", "Requests waiting for a slot", ["scheduler"])
+CONCURRENCY_LIMIT = Gauge("ingestion_scheduler_limit", "Current AIMD concurrency limit", ["scheduler"])
+TOKENS_PER_MINUTE = Gauge("ingestion_scheduler_tokens_per_minute", "Approximate tokens over the last minute", ["scheduler"])
+THROTTLED = Counter("ingestion_scheduler_throttled_total", "Requests rejected with HTTP 429", ["scheduler"])
+TRANSIENT = Counter(
+    "ingestion_scheduler_transient_errors_total", "Requests retried after a 408/409/5xx, timeout or lost connection",
+    ["scheduler"],
+)
+
+# APITimeoutError is an APIConnectionError; the SDK's own retries are off
+_TRANSIENT_EXCEPTIONS = (APIConnectionError, ConnectionError, TimeoutError)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return _status_code(exc) == 429
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Failures worth retrying that say nothing about load: 408, 409, 5xx, timeouts, lost connections."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in (408, 409) or status >= 500
+    return isinstance(exc, _TRANSIENT_EXCEPTIONS)
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for throughput metrics."""
+    return len(text) // 4
+
+
+class AdaptiveScheduler:
+    """
+    AIMD concurrency limiter for provider calls.
+
+    Every success adds 1/limit to the limit (about +1 per window of successful
+    requests); every 429 multiplies it by backoff_factor and pauses dispatch for
+    the Retry-After period before the request is retried. Transient failures
+    (see is_transient) are retried after an exponential backoff of their own,
+    without touching the limit: they are not a sign of overload.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_factor: float = 0.5,
+        max_retries: int = 6,
+        default_backoff: float = 1.0,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff_factor = backoff_factor
+        self.max_retries = max_retries
+        self.default_backoff = default_backoff
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiting = 0
+        self._cooldown_until = 0.0
+        self._tokens: deque = deque()  # (monotonic timestamp, tokens)
+        self.completed = 0
+        self.throttled = 0
+        self.transient_errors = 0
+
+        # Bound lazily: the pipeline may run each batch on a fresh event loop
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        CONCURRENCY_LIMIT.labels(self.name).set(self._limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+            self._in_flight = 0
+            self._waiting = 0
+        return self._cond
+
+    def tokens_per_minute(self) -> int:
+        cutoff = time.monotonic() - 60.0
+        while self._tokens and self._tokens[0][0] < cutoff:
+            self._tokens.popleft()
+        return sum(t for _, t in self._tokens)
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "limit": self.limit,
+            "tokens_per_minute": self.tokens_per_minute(),
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "transient_errors": self.transient_errors,
+        }
+
+    def _publish(self):
+        IN_FLIGHT.labels(self.name).set(self._in_flight)
+        QUEUE_DEPTH.labels(self.name).set(self._waiting)
+        CONCURRENCY_LIMIT.labels(self.name).set(self._limit)
+
+    async def _acquire(self):
+        cond = self._condition()
+        async with cond:
+            self._waiting += 1
+            self._publish()
+            try:
+                while True:
+                    pause = self._cooldown_until - time.monotonic()
+                    if pause > 0:
+                        try:
+                            await asyncio.wait_for(cond.wait(), pause)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    if self._in_flight < self.limit:
+                        break
+                    await cond.wait()
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+            self._publish()
+
+    async def _release(self, succeeded: bool, throttled_for: Optional[float] = None, tokens: int = 0):
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            if succeeded:
+                # Additive increase
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                self.completed += 1
+                if tokens:
+                    self._tokens.append((time.monotonic(), tokens))
+                    TOKENS_PER_MINUTE.labels(self.name).set(self.tokens_per_minute())
+            elif throttled_for is not None:
+                # Multiplicative decrease + global pause
+                self._limit = max(self.min_limit, self._limit * self.backoff_factor)
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + throttled_for)
+                self.throttled += 1
+                THROTTLED.labels(self.name).inc()
+            self._publish()
+            cond.notify_all()
+
+    async def run(self, fn: Callable[[], Awaitable[T]], tokens: int = 0,
+                  token_counter: Optional[Callable[[Any], int]] = None) -> T:
+        """
+        Runs fn() under the concurrency limit, retrying it on 429 responses
+        and transient failures, up to max_retries times.
+        Token usage is either known up front (tokens) or derived from the result.
+        """
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                # Frees the slot like any other outcome, waking the tasks waiting for it;
+                # shielded so a second cancel cannot leak the slot
+                await asyncio.shield(self._release(succeeded=False))
+                raise
+            except Exception as e:
+                if is_transient(e):
+                    # Backs off outside the slot; the limit and other requests are unaffected
+                    await self._release(succeeded=False)
+                    self.transient_errors += 1
+                    TRANSIENT.labels(self.name).inc()
+                    if attempt >= self.max_retries:
+                        raise
+                    pause = self.default_backoff * (2 ** attempt)
+                    logger.warning(
+                        "provider_transient_error",
+                        scheduler=self.name,
+                        error=type(e).__name__,
+                        status=_status_code(e),
+                        retry_in=round(pause, 2),
+                        attempt=attempt + 1,
+                    )
+                    attempt += 1
+                    await asyncio.sleep(pause)
+                    continue
+                if not is_rate_limited(e):
+                    await self._release(succeeded=False)
+                    raise
+                pause = retry_after_seconds(e)
+                if pause is None:
+                    pause = self.default_backoff * (2 ** attempt)
+                await self._release(succeeded=False, throttled_for=pause)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(
+                    "provider_rate_limited",
+                    scheduler=self.name,
+                    retry_in=round(pause, 2),
+                    attempt=attempt + 1,
+                    limit=self.limit,
+                )
+                attempt += 1
+                continue
+
+            used = tokens + (token_counter(result) if token_counter else 0)
+            await self._release(succeeded=True, tokens=used)
+            return result
@@ -0,0 +1,299 @@
+import time
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from llama_index.core.graph_stores.types import EntityNode, Relation, TRIPLET_SOURCE_KEY
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+from knowledge_engine.core.logging import logger
+from knowledge_engine.core.queries import register_query
+
+# Same labels Neo4jPropertyGraphStore writes, so retrieval keeps working.
+# `Entity` is added for the maintenance queries (cleaner) that match on it.
+BASE_NODE_LABEL = "__Node__"
+BASE_ENTITY_LABEL = "__Entity__"
+ENTITY_LABEL = "Entity"
+
+Statement = Tuple[str, Dict]
+
+
+def cypher_name(name: str) -> str:
+    """
+    Quotes a label / relationship type for interpolation into Cypher.
+    Labels cannot be parameters, so every dynamic name goes through here.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("Empty label or relationship type")
+    return "`" + name.replace("`", "``") + "`"
+
+
+def normalize_entity_name(name: str) -> str:
+    """
+    Entity resolution key, stored as `normalized_name`. Must stay equal to
+    the Cypher toLower(trim(name)) the schema migration backfills with.
+    """
+    return (name or "").strip().lower()
+
+
+def _clean(properties: dict) -> dict:
+    # Null values would delete properties on SET +=
+    return {k: v for k, v in properties.items() if v is not None}
+
+
+CHUNK_QUERY = register_query("writer.chunks", f"""
+UNWIND $rows AS row
+MERGE (c:{BASE_NODE_LABEL} {{id: row.id}})
+SET c += row.properties
+SET c.text = row.text, c:Chunk
+WITH c, row WHERE row.embedding IS NOT NULL
+CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+RETURN count(*) AS written
+""")
+
+ENTITY_QUERY_TMPL = register_query("writer.entities", f"""
+UNWIND $rows AS row
+MERGE (e:{BASE_NODE_LABEL} {{id: row.id}})
+SET e += row.properties
+SET e.name = row.name, e.normalized_name = row.normalized_name, e:{BASE_ENTITY_LABEL}:{ENTITY_LABEL}:{{label}}
+WITH e, row
+CALL {{
+    WITH e, row
+    WITH e, row WHERE row.embedding IS NOT NULL
+    CALL db.create.setNodeVectorProperty(e, 'embedding', row.embedding)
+    RETURN count(*) AS embedded
+}}
+WITH e, row WHERE row.source_id IS NOT NULL
+MERGE (c:{BASE_NODE_LABEL} {{id: row.source_id}})
+MERGE (e)<-[:MENTIONS]-(c)
+RETURN count(*) AS written
+""")
+
+# Chunk -> entity links for entities that are already in the graph or buffered:
+# every chunk mentioning an entity gets the edge, not just the one that created it,
+# so update mode only drops an entity once no chunk mentions it any more.
+MENTIONS_QUERY = register_query("writer.mentions", f"""
+UNWIND $rows AS row
+MATCH (e:{BASE_NODE_LABEL} {{id: row.entity_id}})
+MERGE (c:{BASE_NODE_LABEL} {{id: row.source_id}})
+MERGE (e)<-[:MENTIONS]-(c)
+RETURN count(*) AS written
+""")
+
+# source_chunk_ids lists every chunk that produced the relation; update mode
+# deletes it only when all of them are gone
+RELATION_QUERY_TMPL = register_query("writer.relations", f"""
+UNWIND $rows AS row
+MERGE (source:{BASE_NODE_LABEL} {{id: row.source_id}})
+ON CREATE SET source:Chunk
+MERGE (target:{BASE_NODE_LABEL} {{id: row.target_id}})
+ON CREATE SET target:Chunk
+MERGE (source)-[r:{{type}}]->(target)
+ON CREATE SET r += row.properties
+SET r.source_chunk_ids = CASE
+    WHEN row.source_chunk IS NULL OR row.source_chunk IN coalesce(r.source_chunk_ids, []) THEN r.source_chunk_ids
+    ELSE coalesce(r.source_chunk_ids, []) + row.source_chunk
+END
+RETURN count(*) AS written
+""")
+
+# One row per Document: its MERGE is backed by the file_hash uniqueness
+# constraint and each chunk MATCH by the __Node__ id constraint, so the cost
+# is proportional to the rows written, not to the size of the graph.
+LINK_QUERY = register_query("writer.document_links", f"""
+UNWIND $rows AS row
+MERGE (d:Document {{file_hash: row.file_hash}})
+ON CREATE SET
+    d.file_name = row.file_name,
+    d.file_path = row.file_path,
+    d.created_at = timestamp()
+WITH d, row
+UNWIND row.chunk_ids AS chunk_id
+MATCH (c:{BASE_NODE_LABEL} {{id: chunk_id}})
+MERGE (c)-[:BELONGS_TO]->(d)
+RETURN count(*) AS written
+""")
+
+
+class BulkGraphWriter:
+    """
+    Write-behind buffer in front of Neo4j.
+
+    Chunks, entities, chunk->entity mentions, relations and chunk->Document
+    links are buffered and
+    flushed as a handful of parameterized UNWIND statements in one explicit
+    write transaction, instead of one round trip per upsert call. Entities
+    and relations are grouped by label / type so no APOC procedures are needed.
+
+    A flush happens when batch_size rows are buffered, when the oldest row
+    has waited flush_interval seconds (checked on every write), or on flush().
+    Transient failures (deadlocks, leader switches, lost connections) are
+    retried with exponential backoff; the statements are idempotent MERGEs.
+    """
+
+    def __init__(self, db_manager, batch_size: int = 2000, flush_interval: float = 2.0,
+                 max_retries: int = 5,
+                 on_flush: Optional[Callable[[List[str], List[str]], None]] = None):
+        """on_flush(chunk_ids, linked_file_hashes) runs after each committed flush."""
+        self.db_manager = db_manager
+        self.on_flush = on_flush
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+
+        self._chunks: List[dict] = []
+        self._entities: Dict[str, List[dict]] = defaultdict(list)
+        self._mentions: List[dict] = []
+        self._relations: Dict[str, List[dict]] = defaultdict(list)
+        self._links: List[dict] = []
+        self._entity_ids = set()
+        self._size = 0
+        self._oldest: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self.stats = defaultdict(int)
+
+    # --- buffering ---
+
+    def write(self, chunks: Iterable[BaseNode] = (), entities: Iterable[EntityNode] = (),
+              relations: Iterable[Relation] = (), links: Iterable[dict] = (),
+              mentions: Iterable[Tuple[str, str]] = ()) -> bool:
+        """
+        Buffers rows; returns True if this call triggered a flush.
+        links are {file_hash, file_path, file_name, chunk_ids} rows; mentions are
+        (chunk_id, entity_id) pairs for entities not passed as entities. Rows from
+        one call always land in the same transaction.
+        """
+        with self._lock:
+            for node in chunks:
+                self._chunks.append({
+                    "id": node.id_,
+                    "text": node.get_content(metadata_mode=MetadataMode.NONE),
+                    "properties": _clean(node_to_metadata_dict(node, remove_text=True)),
+                    "embedding": node.embedding,
+                })
+                self._size += 1
+            for entity in entities:
+                properties = _clean(dict(entity.properties))
+                self._entities[entity.label].append({
+                    "id": entity.id,
+                    "name": entity.name,
+                    "normalized_name": normalize_entity_name(entity.name),
+                    "properties": properties,
+                    "embedding": entity.embedding,
+                    "source_id": properties.get(TRIPLET_SOURCE_KEY),
+                })
+                self._entity_ids.add(entity.id)
+                self._size += 1
+            for chunk_id, entity_id in mentions:
+                self._mentions.append({"source_id": chunk_id, "entity_id": entity_id})
+                self._size += 1
+            for relation in relations:
+                properties = _clean(dict(relation.properties))
+                self._relations[relation.label].append({
+                    "source_id": relation.source_id,
+                    "target_id": relation.target_id,
+                    "properties": properties,
+                    "source_chunk": properties.get(TRIPLET_SOURCE_KEY),
+                })
+                self._size += 1
+            for link in links:
+                self._links.append(link)
+                self._size += 1
+
+            if self._size and self._oldest is None:
+                self._oldest = time.monotonic()
+            due = self._size >= self.batch_size or (
+                self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            )
+
+        if due:
+            self.flush()
+        return due
+
+    def has_entity(self, entity_id: str) -> bool:
+        """True if the entity is buffered but not flushed yet."""
+        with self._lock:
+            return entity_id in self._entity_ids
+
+    @property
+    def pending(self) -> int:
+        return self._size
+
+    # --- flushing ---
+
+    def _take(self) -> Tuple[List[Statement], Dict[str, int], List[str], List[str]]:
+        """Swaps the buffers out and turns them into ordered statements."""
+        with self._lock:
+            chunks, self._chunks = self._chunks, []
+            entities, self._entities = self._entities, defaultdict(list)
+            mentions, self._mentions = self._mentions, []
+            relations, self._relations = self._relations, defaultdict(list)
+            links, self._links = self._links, []
+            self._entity_ids = set()
+            self._size = 0
+            self._oldest = None
+
+        statements: List[Statement] = []
+
+        def _batched(query: str, rows: List[dict]):
+            for i in range(0, len(rows), self.batch_size):
+                statements.append((query, {"rows": rows[i:i + self.batch_size]}))
+
+        # Nodes before the relationships that point at them
+        _batched(CHUNK_QUERY, chunks)
+        for label, rows in entities.items():
+            _batched(ENTITY_QUERY_TMPL.substitute(label=cypher_name(label)), rows)
+        _batched(MENTIONS_QUERY, mentions)
+        for rel_type, rows in relations.items():
+            _batched(RELATION_QUERY_TMPL.substitute(type=cypher_name(rel_type)), rows)
+        _batched(LINK_QUERY, links)
+
+        counts = {
+            "nodes": len(chunks) + sum(len(r) for r in entities.values()),
+            "relations": sum(len(r) for r in relations.values()),
+            "links": sum(len(link["chunk_ids"]) for link in links),
+            "mentions": len(mentions),
+        }
+        return statements, counts, [c["id"] for c in chunks], [link["file_hash"] for link in links]
+
+    def flush(self):
+        """Writes everything buffered so far in one transaction."""
+        # Serialized so relations never land before the nodes of an earlier batch
+        with self._flush_lock:
+            statements, counts, chunk_ids, file_hashes = self._take()
+            if not statements:
+                return
+
+            start = time.perf_counter()
+            for attempt in Retrying(
+                retry=retry_if_exception_type((TransientError, ServiceUnavailable, SessionExpired)),
+                stop=stop_after_attempt(self.max_retries),
+                wait=wait_exponential(multiplier=0.2, max=5),
+                reraise=True,
+            ):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        self.stats["retries"] += 1
+                        logger.warning("graph_flush_retry", attempt=attempt.retry_state.attempt_number)
+                    self.db_manager.run_write_transaction(statements)
+
+            self.stats["flushes"] += 1
+            for key, value in counts.items():
+                self.stats[key] += value
+            if self.on_flush:
+                self.on_flush(chunk_ids, file_hashes)
+            logger.debug(
+                "graph_flush_complete",
+                statements=len(statements),
+                duration_ms=round((time.perf_counter() - start) * 1000, 1)
+            )
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,96 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core import PropertyGraphIndex
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.llms.openai import OpenAI
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.logging import logger
+from knowledge_engine.ingestion.embeddings import build_query_embed_model
+
+
+class RetrievalEngine:
+    """
+    The query-side index over the graph store: LLM and embedding clients,
+    the PropertyGraphIndex and its hybrid retrievers, built once and reused
+    so every query keeps the clients' pooled HTTP connections.
+    """
+
+    def __init__(self, store):
+        self.llm = OpenAI(model=settings.OPENAI_MODEL, temperature=0)
+        self.embed_model = build_query_embed_model(OpenAIEmbedding(model_name=settings.EMBEDDING_MODEL))
+        self.index = PropertyGraphIndex.from_existing(
+            property_graph_store=store,
+            llm=self.llm,
+            embed_model=self.embed_model,
+        )
+        self._retrievers: Dict[int, BaseRetriever] = {}
+        self._lock = threading.Lock()
+
+    def retriever(self, similarity_top_k: int = 5) -> BaseRetriever:
+        """Hybrid (vector + graph traversal) retriever, one per top-k."""
+        with self._lock:
+            if similarity_top_k not in self._retrievers:
+                self._retrievers[similarity_top_k] = self.index.as_retriever(
+                    include_text=True,
+                    vector_store_query_mode="hybrid",
+                    similarity_top_k=similarity_top_k,
+                )
+            return self._retrievers[similarity_top_k]
+
+    def retrieve(self, query: str, similarity_top_k: int = 5) -> List[NodeWithScore]:
+        return self.retriever(similarity_top_k).retrieve(query)
+
+
+_engine: Optional[RetrievalEngine] = None
+_engine_key: Optional[Tuple] = None
+_engine_lock = threading.Lock()
+
+
+def _engine_key_for(db, store) -> Tuple:
+    # Anything the index bakes in: models, vector size, the store and its schema
+    return (
+        settings.OPENAI_MODEL,
+        settings.EMBEDDING_MODEL,
+        settings.EMBEDDING_DIMENSIONS,
+        settings.EMBEDDING_CACHE_ENABLED,
+        settings.QUERY_EMBEDDING_CACHE_SIZE,
+        id(store),
+        db.schema_generation,
+    )
+
+
+def get_retrieval_engine() -> RetrievalEngine:
+    """
+    Optimization: Cached Retrieval Engine
+    Process-wide engine, rebuilt only when its key changes: a different
+    model or embedding config, a new store, or a migration applied by this
+    process (GraphDatabaseManager.schema_generation).
+    """
+    global _engine, _engine_key
+    db = GraphDatabaseManager.get_instance()
+    store = db.get_store()
+    key = _engine_key_for(db, store)
+    if _engine is not None and _engine_key == key:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None or _engine_key != key:
+            if _engine is not None:
+                logger.info("retrieval_engine_invalidated", model=settings.OPENAI_MODEL,
+                            embedding_model=settings.EMBEDDING_MODEL)
+            _engine = RetrievalEngine(store)
+            _engine_key = key
+        return _engine
+
+
+def invalidate_retrieval_engine():
+    """Forces the next get_retrieval_engine() to rebuild (e.g. after changing settings at runtime)."""
+    global _engine, _engine_key
+    with _engine_lock:
+        _engine = None
+        _engine_key = None
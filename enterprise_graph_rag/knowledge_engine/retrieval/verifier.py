@@ -1,24 +1,23 @@
 import logging
-from llama_index.core import PropertyGraphIndex
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
 
-from knowledge_engine.core.config import settings
 from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.queries import register_query
+from knowledge_engine.retrieval.engine import get_retrieval_engine
 
 logger = logging.getLogger(__name__)
 
+RELATED_TRIPLES_QUERY = register_query("verifier.related_triples", """
+MATCH (n)-[r]->(m)
+WHERE toLower(n.name) CONTAINS toLower($keyword) 
+   OR toLower(m.name) CONTAINS toLower($keyword)
+RETURN n.name, type(r), m.name LIMIT 5
+""")
+
 class GraphVerifier:
     def __init__(self):
         self.db_manager = GraphDatabaseManager.get_instance()
-        self.graph_store = self.db_manager.get_store()
-        
-        # Re-attach to existing index
-        self.index = PropertyGraphIndex.from_existing(
-            property_graph_store=self.graph_store,
-            llm=OpenAI(model=settings.OPENAI_MODEL),
-            embed_model=OpenAIEmbedding(model_name=settings.EMBEDDING_MODEL),
-        )
+        # Shared with the agent's search tool
+        self.engine = get_retrieval_engine()
 
     def verify_retrieval(self, query: str):
         """
@@ -28,12 +27,7 @@ class GraphVerifier:
         print(f"\n--- Verifying Query: '{query}' ---")
         
         # 1. Standard Retrieval (What the LLM sees)
-        retriever = self.index.as_retriever(
-            include_text=True,
-            vector_store_query_mode="hybrid",
-            similarity_top_k=2
-        )
-        nodes = retriever.retrieve(query)
+        nodes = self.engine.retrieve(query, similarity_top_k=2)
         
         print(f"\n[Hybrid Search Results]: Found {len(nodes)} context nodes.")
         for i, node in enumerate(nodes):
@@ -43,19 +37,12 @@ class GraphVerifier:
         # We manually check if specific entities from the query exist in relationships
         print("\n[Database Inspection]: checking for related triples...")
         
-        cypher_query = """
-        MATCH (n)-[r]->(m)
-        WHERE toLower(n.name) CONTAINS toLower($keyword) 
-           OR toLower(m.name) CONTAINS toLower($keyword)
-        RETURN n.name, type(r), m.name LIMIT 5
-        """
-        
         # Extract a simple keyword from query for validation (naive approach for testbed)
         # In a real app, we'd use entity extraction on the query first.
         keywords = query.replace("?", "").split()
         keyword = keywords[-1] if keywords else "" # Pick last word as heuristic
         
-        results = self.db_manager.run_cypher(cypher_query, {"keyword": keyword})
+        results = self.db_manager.run_cypher(RELATED_TRIPLES_QUERY, {"keyword": keyword}, access="read")
         
         if results:
             print(f"✅ Found graph paths relating to '{keyword}':")
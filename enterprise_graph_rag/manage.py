@@ -19,33 +19,50 @@ def ingest(directory: str = "./data/raw"):
     """Run the ASYNC ingestion pipeline."""
     logger.info("cli_command_received", command="ingest", target=directory)
     
-    async def _run():
-        pipeline = IngestionPipeline()
-        return await pipeline.process_directory_async(directory)
-
     try:
-        result = asyncio.run(_run())
+        pipeline = IngestionPipeline()
+        result = asyncio.run(pipeline.process_directory_async(directory))
         typer.echo(f"✅ Ingestion Complete: {result}")
         
-        # Optimization: Auto-run cleanup after ingestion
+        # Optimization: Auto-run cleanup after ingestion, scoped to the entities it created
         cleaner = GraphCleaner()
-        cleaner.run_all()
+        cleaner.run_incremental(pipeline.touched_entity_ids)
         typer.echo(f"✨ Graph Cleanup Complete")
         
     except Exception as e:
         logger.critical("ingestion_fatal_error", error=str(e))
         sys.exit(1)
 
+def _echo_progress(operation: str, done: int, total: int):
+    typer.echo(f"   {operation}: {done}/{total}")
+
 @app.command()
-def clean():
-    """Manually run entity resolution and cleanup."""
+def clean(dry_run: bool = False):
+    """Full-graph entity resolution and cleanup (maintenance; ingestion resolves incrementally)."""
     try:
         cleaner = GraphCleaner()
-        cleaner.run_all()
-        typer.echo("✅ Graph optimized.")
+        counts = cleaner.run_all(dry_run=dry_run, progress=_echo_progress)
+        if dry_run:
+            typer.echo(f"Would change: {counts}")
+        else:
+            typer.echo(f"✅ Graph optimized: {counts}")
     except Exception as e:
         logger.error("cleanup_failed", error=str(e))
 
+@app.command()
+def resolve(dry_run: bool = False):
+    """Full fuzzy entity resolution with an audit report (--dry-run plans without merging)."""
+    try:
+        report = GraphCleaner().deduplicate_entities(dry_run=dry_run)
+        verb = "Would merge" if dry_run else "Merged"
+        typer.echo(f"✅ {verb} {report['merged_entities']} entities in {len(report['clusters'])} clusters")
+        if report.get("oversized_clusters"):
+            typer.echo(f"⚠️  {len(report['oversized_clusters'])} oversized clusters left for review")
+        if report.get("report_path"):
+            typer.echo(f"Report: {report['report_path']}")
+    except Exception as e:
+        logger.error("resolution_failed", error=str(e))
+
 @app.command()
 def verify(query: str):
     """Run a verification query."""
@@ -57,15 +74,28 @@ def verify(query: str):
         logger.error("verification_error", error=str(e))
 
 @app.command()
-def reset_db(confirm: bool = False):
-    """Wipe database."""
-    if not confirm:
+def migrate():
+    """Apply pending schema migrations (constraints, indexes) and report them."""
+    db = GraphDatabaseManager.get_instance()
+    db.ensure_ready()  # connecting applies pending steps
+    for step in db.migration_report:
+        typer.echo(f"[{step['status']:>7}] {step['version']:03d} {step['name']}")
+        for query in step['backs']:
+            typer.echo(f"          index-backed: {query}")
+        if step.get('error'):
+            typer.echo(f"          error: {step['error']}")
+
+@app.command()
+def reset_db(confirm: bool = False, dry_run: bool = False):
+    """Wipe database in batches (--dry-run only counts what would be deleted)."""
+    if not confirm and not dry_run:
         typer.echo("❌ Pass --confirm to delete.")
         return
-    db = GraphDatabaseManager.get_instance()
-    db.run_cypher("MATCH (n) DETACH DELETE n")
-    logger.warning("database_cleared")
-    typer.echo("✅ Database wiped.")
+    counts = GraphCleaner().wipe(dry_run=dry_run, progress=_echo_progress)
+    if dry_run:
+        typer.echo(f"Would delete {counts['relationships']} relationships and {counts['nodes']} nodes.")
+    else:
+        typer.echo("✅ Database wiped.")
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
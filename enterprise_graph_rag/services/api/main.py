@@ -8,7 +8,7 @@ from services.api.routers import chat, ingest
 from services.api.middleware import RequestLogMiddleware
 from services.api.security import get_api_key
 from knowledge_engine.core.logging import configure_logging, logger
-from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.database import AsyncGraphDatabaseManager, GraphDatabaseManager
 from services.api.routers import chat, ingest, ws 
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -21,7 +21,16 @@ async def lifespan(app: FastAPI):
     # --- STARTUP ---
     configure_logging()
     logger.info("api_startup")
-    GraphDatabaseManager.get_instance()
+    # Connecting and migrating happen off the startup path; the first query waits if needed
+    db = GraphDatabaseManager.get_instance()
+
+    async def warm_up():
+        try:
+            await asyncio.to_thread(db.ensure_ready)
+        except Exception as e:
+            logger.warning("neo4j_warmup_failed", error=str(e))
+
+    warmup_task = asyncio.create_task(warm_up())
     
     # Handle SIGTERM (Docker Stop) for graceful cleanup
     loop = asyncio.get_running_loop()
@@ -41,10 +50,12 @@ async def lifespan(app: FastAPI):
     
     # --- SHUTDOWN ---
     logger.info("api_shutdown_commencing")
+    warmup_task.cancel()
     
-    # Close DB Driver
+    # Close DB Drivers
     try:
         GraphDatabaseManager.get_instance().close()
+        await AsyncGraphDatabaseManager.get_instance().close()
         logger.info("neo4j_connection_closed")
     except Exception:
         pass
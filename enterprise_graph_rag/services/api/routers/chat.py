@@ -30,7 +30,9 @@ async def stream_chat(request: ChatRequest, user: UserIdentity = Security(authen
             "messages": [HumanMessage(content=request.message)], 
             "retry_count": 0
         }
-        config = {"configurable": {"thread_id": request.thread_id, "user_identity": user }}
+        config = {"configurable": {
+            "thread_id": request.thread_id, "user_identity": user, "graph_bookmarks": request.bookmarks
+        }}
 
         async def event_generator():
             # Use the optimized 'astream_events' from Phase 2
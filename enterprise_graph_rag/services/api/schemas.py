@@ -4,6 +4,8 @@ from typing import List, Optional
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = Field(default_factory=lambda: "default_thread")
+    # Graph bookmarks from a finished ingestion task: searches wait until those writes are visible
+    bookmarks: List[str] = Field(default_factory=list)
 
 class IngestResponse(BaseModel):
     task_id: str
@@ -31,5 +31,14 @@ celery_app.conf.update(
     # Optimization: Global Rate Limit for ingestion (avoid 429s)
     task_annotations={
         "process_document_task": {"rate_limit": "10/m"} 
+    },
+    # Optimization: Coalesced Cleanup
+    # Run by `celery beat`; ticks that wait longer than an interval expire instead of piling up
+    beat_schedule={
+        "graph-maintenance": {
+            "task": "graph_maintenance_task",
+            "schedule": settings.CLEANUP_INTERVAL_SECONDS,
+            "options": {"expires": settings.CLEANUP_INTERVAL_SECONDS},
+        }
     }
-)
\ No newline at end of file
+)
@@ -1,10 +1,13 @@
+import os
 import json
 import redis
 from celery.signals import worker_process_init
 from services.worker.app import celery_app
 from knowledge_engine.ingestion.loader import IngestionPipeline
-from knowledge_engine.ingestion.cleaner import GraphCleaner
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
 from knowledge_engine.core.logging import configure_logging, logger
+from services.worker.maintenance import CleanupCoalescer
 
 pipeline = None
 redis_client = None
@@ -17,14 +20,20 @@ def init_worker(**kwargs):
     # Separate Redis connection for Pub/Sub
     redis_client = redis.from_url(celery_app.conf.broker_url)
 
-def publish_progress(task_id: str, status: str, percent: int, msg: str):
+def get_coalescer() -> CleanupCoalescer:
+    global redis_client
+    if not redis_client: redis_client = redis.from_url(celery_app.conf.broker_url)
+    return CleanupCoalescer(redis_client, lock_timeout=settings.CLEANUP_LOCK_TIMEOUT)
+
+def publish_progress(task_id: str, status: str, percent: int, msg: str, **extra):
     """Helper to publish real-time updates."""
     if redis_client:
         payload = json.dumps({
             "task_id": task_id,
             "status": status,
             "percent": percent,
-            "message": msg
+            "message": msg,
+            **extra
         })
         # Publish to channel: task_updates:{task_id}
         redis_client.publish(f"task_updates:{task_id}", payload)
@@ -55,16 +64,25 @@ def process_document_task(self, file_path: str, original_filename: str):
         result = loop.run_until_complete(pipeline.process_directory_async(directory))
         
         # Notify Cleanup
-        publish_progress(task_id, "cleaning", 80, "Optimizing Graph structure...")
-        cleaner = GraphCleaner()
-        cleaner.run_all()
+        publish_progress(task_id, "cleaning", 80, "Scheduling graph cleanup...")
+        # Resolution of this upload's new entities is coalesced into graph_maintenance_task
+        get_coalescer().request(pipeline.touched_entity_ids)
         
+        # Bookmarks of this upload's writes: a chat request passing them back reads them
+        # even from a read replica that has not caught up yet (NEO4J_ROUTING_ENABLED)
+        bookmarks = GraphDatabaseManager.get_instance().last_bookmarks()
+
         # Notify Done
-        publish_progress(task_id, "completed", 100, "Ingestion finished successfully.")
+        publish_progress(task_id, "completed", 100, "Ingestion finished successfully.", bookmarks=bookmarks)
         
-        return {"status": "success", "meta": result}
+        return {"status": "success", "meta": result, "bookmarks": bookmarks}
         
     except Exception as e:
         publish_progress(task_id, "failed", 0, f"Error: {str(e)}")
         logger.error("task_failed", error=str(e))
-        raise self.retry(exc=e, countdown=10)
\ No newline at end of file
+        raise self.retry(exc=e, countdown=10)
+
+@celery_app.task(name="graph_maintenance_task")
+def graph_maintenance_task():
+    """Beat-scheduled: one cleanup pass for everything ingested since the last one."""
+    return get_coalescer().run()
@@ -0,0 +1,243 @@
+"""
+End-to-end ingestion throughput: drives IngestionPipeline over a synthetic
+corpus against the fake OpenAI-compatible server (tests/fakes.py) and an
+in-memory graph stand-in, or a real Neo4j with --neo4j (use a scratch
+database: the synthetic entities are not cleaned up).
+
+Reports docs/sec, chunks/sec, provider calls, peak RSS and busy seconds per
+pipeline stage, and saves the run as JSON keyed by commit so two commits can
+be compared with --baseline.
+
+    python tests/bench/bench_ingest.py --docs 200 --latency 0.05
+    python tests/bench/bench_ingest.py --docs 200 --latency 0.05 --baseline data/bench/ingest-<sha>.json
+"""
+import os
+import sys
+import shutil
+import asyncio
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+from unittest import mock
+
+import structlog
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+from fakes import FakeOpenAIServer
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+
+FIRST = ["Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy"]
+LAST = ["Smith", "Jones", "Garcia", "Miller", "Davis", "Lopez", "Wilson", "Taylor", "Clark", "Lewis"]
+ORGS = ["Acme Corp", "Globex", "Initech", "Umbrella Group", "Stark Industries", "Wayne Enterprises"]
+PROJECTS = ["Project Apollo", "Project Gemini", "Project Orion", "Project Atlas", "Project Hermes"]
+CITIES = ["Berlin", "London", "Toronto", "Singapore", "Austin", "Madrid"]
+SENTENCES = [
+    "{person} manages {project} for {org}.",
+    "{person} reports to {other} at the {city} office.",
+    "{other} works on {project} together with {person}.",
+    "{org} is located at the {city} campus.",
+    "The {project} review mentioned {org} and its {city} team.",
+]
+BOILERPLATE = (
+    "This document is confidential and intended solely for the addressee. If you received it "
+    "in error please notify the sender and delete it. Unauthorised copying or distribution is "
+    "strictly forbidden. {org} accepts no liability for any damage caused by this communication."
+)
+TOC = "\n".join(f"{i}. Section {i} {'.' * 20} {i * 3}" for i in range(1, 15))
+
+
+def write_corpus(target: str, docs: int, paragraphs: int, boilerplate: float, seed: int) -> int:
+    """Deterministic documents with ontology-shaped prose, shared disclaimers and TOC pages."""
+    rng = random.Random(seed)
+    total_bytes = 0
+    for d in range(docs):
+        parts = [TOC] if d % 10 == 0 else []
+        for _ in range(paragraphs):
+            parts.append(" ".join(
+                rng.choice(SENTENCES).format(
+                    person=f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                    other=f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                    org=rng.choice(ORGS),
+                    project=rng.choice(PROJECTS),
+                    city=rng.choice(CITIES),
+                )
+                for _ in range(rng.randint(4, 8))
+            ) + f" (ref {d}-{len(parts)})")
+        if rng.random() < boilerplate:
+            parts.append(BOILERPLATE.format(org=rng.choice(ORGS)))
+        text = "\n\n".join(parts)
+        with open(os.path.join(target, f"doc_{d:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        total_bytes += len(text.encode("utf-8"))
+    return total_bytes
+
+
+class InMemoryStore:
+    def get(self, ids=None, **kwargs):
+        return []
+
+
+class InMemoryGraph:
+    """Stands in for GraphDatabaseManager: nothing is ingested yet, every write commits."""
+
+    def __init__(self):
+        self.transactions = 0
+        self.rows = 0
+
+    def get_store(self):
+        return InMemoryStore()
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        return []
+
+    def run_write_transaction(self, statements):
+        self.transactions += 1
+        self.rows += sum(len(params.get("rows", ())) for _, params in statements)
+
+
+def peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="bench-ingest-")
+    corpus = os.path.join(work_dir, "corpus")
+    os.makedirs(corpus)
+    corpus_bytes = write_corpus(corpus, args.docs, args.paragraphs, args.boilerplate, args.seed)
+
+    # Every local store starts cold, inside the work dir
+    settings.MANIFEST_PATH = os.path.join(work_dir, "manifest.db")
+    settings.EXTRACTION_CACHE_PATH = os.path.join(work_dir, "extraction_cache.db")
+    settings.EMBEDDING_CACHE_DIR = os.path.join(work_dir, "embedding_cache")
+    settings.INGESTION_JOURNAL_PATH = os.path.join(work_dir, "journal.db")
+    settings.INGESTION_SPOOL_DIR = os.path.join(work_dir, "spool")
+    settings.INGESTION_STAGES = "all"
+    settings.EMBEDDING_DIMENSIONS = args.dims
+
+    graph = None if args.neo4j else InMemoryGraph()
+    with contextlib.ExitStack() as stack:
+        server = stack.enter_context(FakeOpenAIServer(
+            latency=args.latency, rate_limit_every=args.rate_limit_every, dimensions=args.dims
+        ))
+        if graph is not None:
+            stack.enter_context(mock.patch.object(GraphDatabaseManager, "get_instance", return_value=graph))
+        from knowledge_engine.ingestion.loader import IngestionPipeline
+
+        pipeline = IngestionPipeline()
+        for model in (pipeline.llm, pipeline.embed_model):
+            model.api_base = server.url
+            model.api_key = "bench-key"
+
+        start = time.perf_counter()
+        try:
+            result = asyncio.run(pipeline.process_directory_async(corpus))
+        finally:
+            elapsed = time.perf_counter() - start
+            pipeline.parse_stage.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    chunks = result.get("chunks_extracted", 0)
+    report = {
+        "seconds": round(elapsed, 3),
+        "docs": args.docs,
+        "chunks": chunks,
+        "corpus_mb": round(corpus_bytes / 1e6, 2),
+        "docs_per_sec": round(args.docs / elapsed, 2),
+        "chunks_per_sec": round(chunks / elapsed, 2),
+        "llm_calls": server.completions,
+        "embedding_inputs": server.embedding_inputs,
+        "provider_requests": server.requests,
+        "provider_throttled": server.throttled,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_rss_children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "stage_seconds": result.get("stage_seconds", {}),
+        "pipeline": {k: v for k, v in result.items() if k != "stage_seconds"},
+    }
+    if graph is not None:
+        report["graph"] = {"transactions": graph.transactions, "rows": graph.rows}
+    return report
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Relative change per headline metric (positive = more than the baseline)."""
+    keys = ["docs_per_sec", "chunks_per_sec", "llm_calls", "embedding_inputs", "peak_rss_mb"]
+    keys += [f"stage_seconds.{k}" for k in current["stage_seconds"]]
+
+    def lookup(results: dict, key: str):
+        value = results
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+    changes = {}
+    for key in keys:
+        new, old = lookup(current, key), lookup(baseline, key)
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes[key] = f"{(new - old) / old:+.1%}"
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=12, help="paragraphs per document")
+    parser.add_argument("--boilerplate", type=float, default=0.3, help="share of docs with a shared disclaimer")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake provider seconds per request")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with a 429")
+    parser.add_argument("--dims", type=int, default=16, help="embedding dimensions")
+    parser.add_argument("--neo4j", action="store_true", help="write to the configured Neo4j instead of memory")
+    parser.add_argument("--output", help="JSON path (default: data/bench/ingest-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep pipeline info logs (on stderr)")
+    args = parser.parse_args()
+
+    # Per-window info logs would skew the numbers and bury the report
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.INFO if args.verbose else logging.WARNING),
+        logger_factory=structlog.PrintLoggerFactory(sys.stderr),
+    )
+
+    commit = git_commit()
+    run = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": vars(args),
+        "results": run_benchmark(args),
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        run["baseline"] = {"commit": baseline.get("commit"),
+                           "changes": compare(run["results"], baseline["results"])}
+
+    output = args.output or os.path.join(ROOT, "data", "bench", f"ingest-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(json.dumps(run, indent=2))
+    print(f"saved to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+# Settings require a key at import time; unit tests never reach OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# Shared fakes (tests/fakes.py) import as a top-level module
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+
+class ConnectionTracker:
+    """Records every sqlite3 connection opened, to check none is left open."""
+
+    def __init__(self):
+        self.opened = []
+
+    def assert_all_closed(self):
+        assert self.opened
+        for conn in self.opened:
+            with pytest.raises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+
+@pytest.fixture
+def sqlite_connections(monkeypatch):
+    tracker = ConnectionTracker()
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        tracker.opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracking_connect)
+    return tracker
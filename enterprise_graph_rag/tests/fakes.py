@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the external services used by ingestion tests and benchmarks.
+Nothing here talks to the network beyond 127.0.0.1.
+"""
+import re
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_TEXT_RE = re.compile(r"Text: (.*)\nTriplets:\s*$", re.S)
+_NAME_RE = re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)?\b")
+
+
+def fake_triples(text: str) -> str:
+    """Deterministic '(subject, predicate, object)' lines derived from capitalised words."""
+    names = list(dict.fromkeys(_NAME_RE.findall(text)))
+    lines = [f"({a}, MENTIONS, {b})" for a, b in zip(names, names[1:])]
+    return "\n".join(lines[:10])
+
+
+def fake_embedding(text: str, dimensions: int = 16) -> list:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255.0 for b in digest[:dimensions]]
+
+
+class FakeOpenAIServer:
+    """
+    OpenAI-compatible HTTP server (chat completions + embeddings) with
+    injectable latency, 429 and 500 responses.
+
+    rate_limit_every=N rejects every Nth request with HTTP 429 and a
+    Retry-After header of retry_after seconds; server_error_every=N fails
+    every Nth request with HTTP 500.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0,
+                 retry_after: float = 0.05, dimensions: int = 16, server_error_every: int = 0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.server_error_every = server_error_every
+        self.retry_after = retry_after
+        self.dimensions = dimensions
+
+        self.requests = 0
+        self.completions = 0
+        self.embedding_inputs = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if server.rate_limit_every and number % server.rate_limit_every == 0:
+                        with server._lock:
+                            server.throttled += 1
+                        self._send(
+                            429,
+                            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {"Retry-After": str(server.retry_after)},
+                        )
+                    elif server.server_error_every and number % server.server_error_every == 0:
+                        with server._lock:
+                            server.server_errors += 1
+                        self._send(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+                    elif self.path.endswith("/chat/completions"):
+                        self._send(200, server._completion(request))
+                    elif self.path.endswith("/embeddings"):
+                        self._send(200, server._embeddings(request))
+                    else:
+                        self._send(404, {"error": {"message": "not found"}})
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _completion(self, request: dict) -> dict:
+        prompt = request["messages"][-1]["content"]
+        match = _TEXT_RE.search(prompt)
+        content = fake_triples(match.group(1) if match else prompt)
+        with self._lock:
+            self.completions += 1
+            self.prompts.append(prompt)
+        return {
+            "id": f"chatcmpl-{self.completions}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    def _embeddings(self, request: dict) -> dict:
+        inputs = request["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        with self._lock:
+            self.embedding_inputs += len(inputs)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(str(t), self.dimensions)}
+                     for i, t in enumerate(inputs)],
+            "model": request.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeRedis:
+    """In-process subset of redis-py used by the worker: strings, sets, MULTI pipelines and locks."""
+
+    def __init__(self):
+        self.data = {}
+        self.locks = set()
+
+    def set(self, key, value):
+        self.data[key] = str(value).encode("utf-8")
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(m.encode("utf-8") for m in members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    def lock(self, name, timeout=None, blocking=True):
+        return _FakeLock(self, name)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+class _FakeLock:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def acquire(self):
+        if self.name in self.client.locks:
+            return False
+        self.client.locks.add(self.name)
+        return True
+
+    def release(self):
+        self.client.locks.discard(self.name)
@@ -0,0 +1,102 @@
+import time
+import asyncio
+from unittest import mock
+
+from governance.auth.models import UserIdentity
+from agent_service.tools.retrieval import HybridSearchTool
+from knowledge_engine.core.database import AsyncGraphDatabase, AsyncGraphDatabaseManager
+
+LATENCY = 0.05
+REQUESTS = 20
+
+
+class StubAsyncDriver:
+    """Async driver stand-in: every query takes LATENCY seconds on the server."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.sessions = []
+
+    def session(self, **config):
+        self.sessions.append(config)
+        return StubSession(self)
+
+    async def close(self):
+        pass
+
+
+class StubSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.reads = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute_read(self, work):
+        self.reads += 1
+        return await work(StubTransaction(self.driver))
+
+
+class StubTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def run(self, query, params):
+        self.driver.in_flight += 1
+        self.driver.max_in_flight = max(self.driver.max_in_flight, self.driver.in_flight)
+        await asyncio.sleep(LATENCY)
+        self.driver.in_flight -= 1
+        return StubResult(params)
+
+
+class StubResult:
+    def __init__(self, params):
+        self.params = params
+
+    async def data(self):
+        return [{"entity": self.params["query"], "source": "policy.pdf", "text": ""}]
+
+
+class BlockingGraph:
+    """The previous path: the sync driver called straight from the coroutine."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def execute_read(self, query, params=None, bookmarks=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(LATENCY)
+        self.in_flight -= 1
+        return [{"entity": params["query"], "source": "policy.pdf", "text": ""}]
+
+
+async def chat_load(tool):
+    config = {"configurable": {"user_identity": UserIdentity(user_id="u1", email="u1@example.com")}}
+    return await asyncio.gather(*(tool._arun(f"Project {i}", config=config) for i in range(REQUESTS)))
+
+
+def test_concurrent_chat_requests_do_not_serialize_on_graph_queries(monkeypatch):
+    monkeypatch.setattr(AsyncGraphDatabaseManager, "_instance", None)
+    driver = StubAsyncDriver()
+    tool = HybridSearchTool()
+
+    with mock.patch.object(AsyncGraphDatabase, "driver", return_value=driver):
+        answers = asyncio.run(chat_load(tool))
+
+    assert answers[3] == "Entity: Project 3 (Source: policy.pdf)"
+    # Every request's query was on the server at the same time
+    assert driver.max_in_flight == REQUESTS
+    assert all(config["fetch_size"] > 0 for config in driver.sessions)
+
+    # Same load on the blocking path: the loop runs one graph query at a time
+    blocking = BlockingGraph()
+    with mock.patch.object(AsyncGraphDatabaseManager, "get_instance", return_value=blocking):
+        asyncio.run(chat_load(tool))
+    assert blocking.max_in_flight == 1
@@ -0,0 +1,25 @@
+import argparse
+
+from knowledge_engine.core.config import settings
+from bench.bench_ingest import compare, run_benchmark
+
+
+def test_ingest_benchmark_reports_throughput_and_stage_times(monkeypatch):
+    # run_benchmark points the local stores at its own work dir; restore them afterwards
+    for name in ("MANIFEST_PATH", "EXTRACTION_CACHE_PATH", "EMBEDDING_CACHE_DIR", "INGESTION_JOURNAL_PATH",
+                 "INGESTION_SPOOL_DIR", "INGESTION_STAGES", "EMBEDDING_DIMENSIONS"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    monkeypatch.setattr(settings, "INGESTION_PARSE_WORKERS", 1)
+
+    args = argparse.Namespace(docs=4, paragraphs=3, boilerplate=0.5, seed=1, latency=0.0,
+                              rate_limit_every=0, dims=16, neo4j=False)
+    report = run_benchmark(args)
+
+    assert report["pipeline"]["status"] == "success"
+    assert report["chunks"] > 0 and report["chunks_per_sec"] > 0
+    assert 0 < report["llm_calls"] <= report["chunks"]
+    assert report["graph"]["rows"] > 0
+    assert set(report["stage_seconds"]) >= {"scan", "parse", "extract", "embed", "write"}
+    assert report["peak_rss_mb"] > 0
+
+    assert compare(report, report)["docs_per_sec"] == "+0.0%"
@@ -0,0 +1,101 @@
+import re
+
+from llama_index.core.graph_stores.types import EntityNode
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.ingestion.cleaner import GraphCleaner
+from knowledge_engine.ingestion.writer import BulkGraphWriter
+from test_graph_writer import RecordingDB
+
+
+def test_incremental_resolution_skips_the_graph_without_new_entities():
+    cleaner = object.__new__(GraphCleaner)  # skip connecting
+    cleaner.db = None  # any query would fail
+    assert cleaner.resolve_entities([])["merged_entities"] == 0
+
+
+def test_writer_stores_the_normalized_name():
+    db = RecordingDB()
+    writer = BulkGraphWriter(db, batch_size=100, flush_interval=60)
+    writer.write(entities=[EntityNode(name="  Alice SMITH ", label="Person")])
+    writer.flush()
+
+    (query, params), = db.transactions[0]
+    assert "e.normalized_name = row.normalized_name" in query
+    assert params["rows"][0]["normalized_name"] == "alice smith"
+
+
+class CountingDB:
+    """Deletes in LIMIT batches from a fixed number of matches per query kind."""
+
+    def __init__(self, remaining):
+        self.remaining = dict(remaining)
+        self.queries = []
+
+    def _kind(self, query):
+        if "[r]" in query:
+            return "relationships"
+        return "orphans" if "n:Entity" in query else "nodes"
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        self.queries.append((query, params))
+        kind = self._kind(query)
+        if "LIMIT $batch_size" not in query:
+            return [{"total": self.remaining[kind]}]
+        deleted = min(params["batch_size"], self.remaining[kind])
+        self.remaining[kind] -= deleted
+        return [{"deleted": deleted}]
+
+
+def make_cleaner(db):
+    cleaner = object.__new__(GraphCleaner)
+    cleaner.db = db
+    return cleaner
+
+
+def test_orphans_are_deleted_in_bounded_batches_with_progress(monkeypatch):
+    monkeypatch.setattr(settings, "CLEANUP_BATCH_SIZE", 4)
+    db = CountingDB({"orphans": 10})
+    progress = []
+
+    assert make_cleaner(db).remove_orphans(progress=lambda *p: progress.append(p)) == 10
+    assert db.remaining["orphans"] == 0
+    assert progress == [("orphans", 4, 10), ("orphans", 8, 10), ("orphans", 10, 10)]
+
+
+def test_dry_run_only_counts(monkeypatch):
+    monkeypatch.setattr(settings, "CLEANUP_BATCH_SIZE", 4)
+    db = CountingDB({"relationships": 7, "nodes": 5})
+
+    assert make_cleaner(db).wipe(dry_run=True) == {"relationships": 7, "nodes": 5}
+    assert db.remaining == {"relationships": 7, "nodes": 5}
+    assert all("DELETE" not in query for query, _ in db.queries)
+
+
+def test_wipe_drops_relationships_first_and_keeps_migrations(monkeypatch):
+    monkeypatch.setattr(settings, "CLEANUP_BATCH_SIZE", 5)
+    db = CountingDB({"relationships": 12, "nodes": 5})
+
+    assert make_cleaner(db).wipe() == {"relationships": 12, "nodes": 5}
+    deletes = [query for query, _ in db.queries if "DELETE" in query]
+    assert [db._kind(q) for q in deletes] == ["relationships"] * 3 + ["nodes"] * 2
+    assert all("NOT n:__SchemaMigration" in q for q in deletes[3:])
+
+
+def test_noise_cleanup_keeps_entities_the_writer_stores(monkeypatch):
+    writes = RecordingDB()
+    writer = BulkGraphWriter(writes, batch_size=100, flush_interval=60)
+    # Default label 'entity', as CachedPathExtractor.attach_triples builds them
+    writer.write(entities=[EntityNode(name="Alice")])
+    writer.flush()
+    (entity_query, _), = writes.transactions[0]
+    labels = {"__Node__"}  # MERGE (e:__Node__ ...)
+    labels |= {label.strip("`") for label in re.search(r", e:(\S+)", entity_query).group(1).split(":")}
+
+    db = CountingDB({"nodes": 0})
+    make_cleaner(db).remove_noise_nodes(dry_run=True)
+    (noise_query, _), = db.queries
+    excluded = re.findall(r"NOT n:`([^`]+)`", noise_query)
+
+    assert "entity" in labels
+    assert labels & set(excluded), f"noise cleanup would delete {sorted(labels)}"
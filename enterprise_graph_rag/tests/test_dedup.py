@@ -0,0 +1,113 @@
+import re
+
+import pytest
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import TextNode
+from llama_index.core.graph_stores.types import KG_NODES_KEY, KG_RELATIONS_KEY
+
+from knowledge_engine.ingestion.dedup import NearDuplicateIndex
+from knowledge_engine.ingestion.extractor import CachedPathExtractor
+from test_extraction_cache import CountingLLM, ENTITIES, RELATIONS
+
+DISCLAIMER = (
+    "This document is confidential and intended solely for the use of the individual or entity "
+    "to whom it is addressed. If you have received this document in error please notify the "
+    "sender immediately and delete it from your system. Any unauthorised copying, disclosure or "
+    "distribution of the material in this document is strictly forbidden. Acme Corporation "
+    "accepts no liability for any damage caused by this communication. Questions go to Alice, "
+    "who manages Project Apollo. Version {}."
+)
+
+CONTRACT = (
+    "This services agreement is made between Acme Corporation and {}. The supplier shall deliver "
+    "the services described in schedule one with reasonable skill and care, in accordance with "
+    "good industry practice and all applicable laws. Either party may terminate this agreement "
+    "with ninety days written notice. Fees are payable within thirty days of a valid invoice and "
+    "are exclusive of value added tax. Neither party shall be liable for indirect losses. Each "
+    "party shall keep the other party's confidential information secret and use it only to "
+    "perform this agreement. The supplier shall maintain adequate insurance for the duration of "
+    "the agreement and provide evidence of it on request. Any dispute shall first be referred to "
+    "the contract managers, then to senior management, and only then to the courts of England. "
+    "This agreement is the entire agreement between the parties and supersedes any earlier "
+    "arrangement relating to its subject matter. No variation is effective unless it is in "
+    "writing and signed by both parties."
+)
+
+
+class CounterpartyLLM(CustomLLM):
+    """Extracts who Acme signed with, the one thing that differs between contracts."""
+    calls: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        self.calls += 1
+        counterparty = re.search(r"between Acme Corporation and (\w+)", prompt).group(1)
+        return CompletionResponse(text=f"(Acme Corporation, SIGNED_WITH, {counterparty})")
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        yield self.complete(prompt)
+
+
+def test_near_duplicates_match_and_unrelated_text_does_not():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.match_or_add("a", index.signature(DISCLAIMER.format("2023-01"))) is None
+    assert index.match_or_add("b", index.signature(DISCLAIMER.format("2024-07"))) == "a"
+
+    other = "Alice Smith manages Project Apollo from the Berlin office and reports to Bob Jones."
+    assert index.match_or_add("c", index.signature(other)) is None
+    assert index.signature("   ") is None
+    assert index.stats()["near_duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_chunks_reuse_triples_without_llm_calls():
+    llm = CountingLLM()
+    index = NearDuplicateIndex(threshold=0.8)
+    extractor = CachedPathExtractor(
+        llm=llm,
+        allowed_entity_types=ENTITIES,
+        allowed_relation_types=RELATIONS,
+        model_name="fake",
+        dedup=index,
+    )
+
+    first = await extractor.acall([TextNode(text=DISCLAIMER.format(1))])
+    # near-duplicates, plus two identical chunks extracted concurrently
+    rest = await extractor.acall(
+        [TextNode(text=DISCLAIMER.format(v)) for v in (2, 3)]
+        + [TextNode(text="Alice manages Project Apollo.") for _ in range(2)]
+    )
+
+    assert llm.calls == 2
+    assert all(n.metadata[KG_NODES_KEY] for n in list(first) + list(rest))
+    stats = index.stats()
+    assert stats["dedup_llm_calls_avoided"] == 3
+    assert stats["dedup_tokens_avoided"] > 0
+
+
+@pytest.mark.asyncio
+async def test_reused_triples_must_name_what_the_chunk_mentions():
+    llm = CounterpartyLLM()
+    index = NearDuplicateIndex(threshold=0.8)
+    extractor = CachedPathExtractor(
+        llm=llm,
+        allowed_entity_types=["Organization"],
+        allowed_relation_types=["SIGNED_WITH"],
+        model_name="fake",
+        dedup=index,
+    )
+
+    await extractor.acall([TextNode(text=CONTRACT.format("Globex"))])
+    (second,) = await extractor.acall([TextNode(text=CONTRACT.format("Initech"))])
+
+    # Globex's triple is not Initech's: the chunk is extracted, not given the other contract's facts
+    assert llm.calls == 2
+    assert [r.target_id for r in second.metadata[KG_RELATIONS_KEY]] == ["Initech"]
+    assert index.stats()["near_duplicates"] == 1
+    assert index.stats()["dedup_llm_calls_avoided"] == 0
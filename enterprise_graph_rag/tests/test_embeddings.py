@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.ingestion.embeddings import (
+    CachedEmbedding, EmbeddingCache, EmbeddingService, QueryEmbeddingCache, build_query_embed_model, plan_batches,
+)
+
+
+class CountingEmbedding(MockEmbedding):
+    """Deterministic vectors; records every text sent to the 'provider'."""
+    sent: list = []
+    batches: int = 0
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.random(self.embed_dim).tolist()
+
+    def _get_text_embeddings(self, texts):
+        self.sent.extend(texts)
+        self.batches += 1
+        return [self._vector(t) for t in texts]
+
+    async def _aget_text_embeddings(self, texts):
+        return self._get_text_embeddings(texts)
+
+    def _get_query_embedding(self, query):
+        return self._get_text_embeddings([query])[0]
+
+
+def test_cache_persists_and_serves_views(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "text-embedding-3-small", dimensions=4)
+    cache.put_many(["a", "b"], [[1, 2, 3, 4], [5, 6, 7, 8]])
+    cache.put_many(["a"], [[9, 9, 9, 9]])  # append-only: first write wins
+
+    reopened = EmbeddingCache(str(tmp_path), "text-embedding-3-small", dimensions=4)
+    a, b, missing = reopened.get_many(["a", "b", "c"])
+
+    assert missing is None
+    assert a.tolist() == [1, 2, 3, 4] and b.tolist() == [5, 6, 7, 8]
+    assert isinstance(a.base, np.memmap) or isinstance(a, np.memmap)  # a view, not a copy
+    assert len(reopened) == 2
+
+
+def test_append_after_a_torn_write_stays_aligned(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "mock", dimensions=4)
+    cache.put_many(["a"], [[1, 2, 3, 4]])
+    # A writer killed halfway through a row and an index record
+    with open(cache._matrix_path, "ab") as f:
+        f.write(np.float32([7, 7]).tobytes())
+    with open(cache._index_path, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reopened = EmbeddingCache(str(tmp_path), "mock", dimensions=4)
+    reopened.put_many(["b", "c"], [[5, 6, 7, 8], [9, 10, 11, 12]])
+
+    fresh = EmbeddingCache(str(tmp_path), "mock", dimensions=4)
+    assert [v.tolist() for v in fresh.get_many(["a", "b", "c"])] == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]]
+
+
+@pytest.mark.asyncio
+async def test_service_dedupes_and_skips_cached_texts(tmp_path):
+    model = CountingEmbedding(embed_dim=8, embed_batch_size=3)
+    cache = EmbeddingCache(str(tmp_path), "mock", dimensions=8)
+    service = EmbeddingService(model, cache)
+
+    first = await service.aembed(["x", "y", "x", "z", "w", "y"])
+    assert sorted(model.sent) == ["w", "x", "y", "z"]  # duplicates collapsed
+    assert model.batches == 2  # 4 unique texts, batches of 3
+    assert first[0] == first[2] and first[1] == first[5]
+
+    model.sent.clear()
+    again = await service.aembed(["x", "y", "new"])
+    assert model.sent == ["new"]
+    assert np.allclose(again[:2], first[:2])  # stored as float32
+    assert service.stats["cache_hits"] == 2
+
+    # query paths share the same cache
+    model.sent.clear()
+    query_model = CachedEmbedding(service)
+    assert np.allclose(query_model.get_query_embedding("z"), first[3])
+    assert model.sent == []
+
+
+def test_queries_stay_in_a_bounded_memory_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "QUERY_EMBEDDING_CACHE_SIZE", 2)
+    model = CountingEmbedding(embed_dim=8)
+    model.sent.clear()
+    query_model = build_query_embed_model(model)
+
+    for query in ("who manages apollo", "where is zurich", "who manages apollo", "what is apollo"):
+        query_model.get_query_embedding(query)
+
+    assert model.sent == ["who manages apollo", "where is zurich", "what is apollo"]
+    cache = query_model._service.cache
+    assert isinstance(cache, QueryEmbeddingCache) and len(cache) == 2
+    # LRU: the repeated query survived, the older one did not
+    assert cache.get_many(["where is zurich", "who manages apollo"])[0] is None
+    assert list(tmp_path.iterdir()) == []  # nothing written to the shared on-disk cache
+
+
+def test_batches_respect_input_and_token_limits():
+    texts = ["a" * 400] * 5  # ~100 tokens each
+    assert [len(b) for b in plan_batches(texts, max_size=10, max_tokens=250)] == [2, 2, 1]
+    assert [len(b) for b in plan_batches(texts, max_size=2)] == [2, 2, 1]
@@ -0,0 +1,129 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import TextNode
+from llama_index.core.graph_stores.types import KG_RELATIONS_KEY
+
+from knowledge_engine.ingestion.extraction_cache import SQLiteExtractionCache, extraction_cache_key
+from knowledge_engine.ingestion.extractor import CachedPathExtractor
+
+ENTITIES = ["Person", "Project"]
+RELATIONS = ["MANAGES"]
+
+class CountingLLM(CustomLLM):
+    """Deterministic stand-in for the extraction model."""
+    calls: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        self.calls += 1
+        return CompletionResponse(text="(Alice, MANAGES, Project Apollo)")
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        yield self.complete(prompt)
+
+def test_key_depends_on_ontology_model_and_prompt():
+    base = extraction_cache_key("text", "gpt-4o", ENTITIES, RELATIONS, "v1")
+    assert base == extraction_cache_key("text", "gpt-4o", list(reversed(ENTITIES)), RELATIONS, "v1")
+    assert base != extraction_cache_key("text", "gpt-4o-mini", ENTITIES, RELATIONS, "v1")
+    assert base != extraction_cache_key("text", "gpt-4o", ENTITIES + ["Topic"], RELATIONS, "v1")
+    assert base != extraction_cache_key("text", "gpt-4o", ENTITIES, RELATIONS, "v2")
+    assert base != extraction_cache_key("other", "gpt-4o", ENTITIES, RELATIONS, "v1")
+
+def test_sqlite_cache_counters_and_eviction(tmp_path):
+    cache = SQLiteExtractionCache(str(tmp_path / "cache.db"), max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", [("Alice", "MANAGES", "Apollo")])
+    cache.put("b", [])
+    assert cache.get("a") == [("Alice", "MANAGES", "Apollo")]
+
+    # 'b' is now least recently used and gets evicted
+    cache.put("c", [])
+    assert cache.get("b") is None
+    assert cache.get("c") == []
+    assert cache.stats() == {"cache_hits": 2, "cache_misses": 2}
+
+def test_sqlite_cache_counts_rows_only_every_few_puts(tmp_path, sqlite_connections):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteExtractionCache(path, max_entries=300)
+    assert cache.evict_every == 3
+
+    def rows():
+        with closing(sqlite3.connect(path)) as conn:
+            return conn.execute("SELECT count(*) FROM extractions").fetchone()[0]
+
+    for i in range(302):
+        cache.put(f"k{i}", [])
+    assert rows() == 302  # over the limit until the next counting put
+    cache.put("k302", [])
+    assert rows() == 300
+    assert cache.get("k0") is None and cache.get("k302") == []
+
+    sqlite_connections.assert_all_closed()
+
+
+@pytest.mark.asyncio
+async def test_extractor_skips_llm_on_cache_hit(tmp_path):
+    llm = CountingLLM()
+    cache = SQLiteExtractionCache(str(tmp_path / "cache.db"))
+    extractor = CachedPathExtractor(
+        llm=llm,
+        allowed_entity_types=ENTITIES,
+        allowed_relation_types=RELATIONS,
+        model_name="fake",
+        cache=cache,
+    )
+
+    first = await extractor.acall([TextNode(text="Alice manages Project Apollo.")])
+    # Same content in a different file: served from the cache
+    second = await extractor.acall([TextNode(text="Alice manages Project Apollo.", metadata={"file_name": "b.txt"})])
+
+    assert llm.calls == 1
+    assert len(first[0].metadata[KG_RELATIONS_KEY]) == 1
+    assert len(second[0].metadata[KG_RELATIONS_KEY]) == 1
+    assert cache.stats() == {"cache_hits": 1, "cache_misses": 1}
+
+class FlakyLLM(CountingLLM):
+    """Answers with a malformed triple first, then with a valid one."""
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        self.calls += 1
+        if self.calls == 1:
+            return CompletionResponse(text="(Alice, MANAGES Project Apollo")
+        return CompletionResponse(text="(Alice, MANAGES, Project Apollo)")
+
+@pytest.mark.asyncio
+async def test_unparsable_answer_is_not_cached_or_reused(tmp_path):
+    from knowledge_engine.ingestion.dedup import NearDuplicateIndex
+
+    llm = FlakyLLM()
+    cache = SQLiteExtractionCache(str(tmp_path / "cache.db"))
+    dedup = NearDuplicateIndex(threshold=0.8)
+    extractor = CachedPathExtractor(
+        llm=llm,
+        allowed_entity_types=ENTITIES,
+        allowed_relation_types=RELATIONS,
+        model_name="fake",
+        cache=cache,
+        dedup=dedup,
+    )
+    node = TextNode(text="Alice manages Project Apollo from the Berlin office.")
+    key = extractor.cache_key(node)
+
+    (failed,) = await extractor.acall([node.model_copy()])
+    assert failed.metadata[KG_RELATIONS_KEY] == []
+    assert cache.get(key) is None and dedup.result(key) is None
+
+    (retried,) = await extractor.acall([node.model_copy()])
+    assert llm.calls == 2
+    assert len(retried.metadata[KG_RELATIONS_KEY]) == 1
+    assert cache.get(key) is not None
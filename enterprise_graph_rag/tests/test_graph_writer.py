@@ -0,0 +1,91 @@
+import pytest
+from neo4j.exceptions import TransientError
+from llama_index.core.graph_stores.types import EntityNode, Relation
+from llama_index.core.schema import TextNode
+
+from knowledge_engine.ingestion.writer import ENTITY_QUERY_TMPL, BulkGraphWriter, cypher_name
+
+
+class RecordingDB:
+    def __init__(self, fail_times=0):
+        self.transactions = []
+        self.fail_times = fail_times
+
+    def run_write_transaction(self, statements):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise TransientError("deadlock detected")
+        self.transactions.append(statements)
+
+
+def _rows(db):
+    return [(query, len(params["rows"])) for tx in db.transactions for query, params in tx]
+
+
+def test_flush_groups_rows_into_unwind_statements():
+    db = RecordingDB()
+    writer = BulkGraphWriter(db, batch_size=1000, flush_interval=60)
+
+    chunks = [TextNode(id_=f"c{i}", text=f"chunk {i}", embedding=[0.1, 0.2]) for i in range(10)]
+    people = [EntityNode(name=f"Person {i}", label="Person", properties={"triplet_source_id": "c0"}) for i in range(5)]
+    projects = [EntityNode(name=f"Project {i}", label="Project") for i in range(3)]
+    rels = [Relation(label="WORKS_ON", source_id=p.id, target_id=projects[0].id) for p in people]
+
+    assert writer.write(chunks=chunks, entities=people + projects, relations=rels) is False
+    assert db.transactions == []  # buffered, not written
+    assert writer.has_entity("Person 1")
+
+    writer.flush()
+
+    assert len(db.transactions) == 1
+    statements = _rows(db)
+    # one statement per kind / label / type, nodes before relations
+    assert [n for _, n in statements] == [10, 5, 3, 5]
+    assert ":`Person`" in statements[1][0] and ":`Project`" in statements[2][0]
+    assert "[r:`WORKS_ON`]" in statements[3][0]
+    assert all("apoc" not in q for q, _ in statements)
+    assert writer.stats["nodes"] == 18 and writer.stats["relations"] == 5
+    assert writer.pending == 0
+
+
+def test_flush_triggers_on_batch_size_and_retries_transient_errors():
+    db = RecordingDB(fail_times=2)
+    writer = BulkGraphWriter(db, batch_size=4, flush_interval=60, max_retries=3)
+
+    flushed = writer.write(chunks=[TextNode(id_=f"c{i}", text="x") for i in range(4)])
+
+    assert flushed is True
+    assert len(db.transactions) == 1
+    assert writer.stats["retries"] == 2
+
+
+def test_cypher_name_quotes_untrusted_labels():
+    assert cypher_name("WORKS_ON") == "`WORKS_ON`"
+    assert cypher_name("bad` DETACH DELETE n //") == "`bad`` DETACH DELETE n //`"
+    with pytest.raises(ValueError):
+        cypher_name("  ")
+
+
+def test_document_links_flush_with_their_chunks():
+    db = RecordingDB()
+    writer = BulkGraphWriter(db, batch_size=1000, flush_interval=60)
+    chunks = [TextNode(id_=f"c{i}", text=f"chunk {i}") for i in range(3)]
+
+    writer.write(chunks=chunks)
+    writer.write(links=[{"file_hash": "h1", "file_path": "/a.txt", "file_name": "a.txt",
+                         "chunk_ids": [c.id_ for c in chunks]}])
+    writer.flush()
+
+    [tx] = db.transactions
+    link_query, params = tx[-1]
+    assert "UNWIND $rows" in link_query and "Document {file_hash: row.file_hash}" in link_query
+    assert "MATCH (c:Chunk)" not in link_query  # no corpus-wide scan
+    assert params["rows"][0]["chunk_ids"] == ["c0", "c1", "c2"]
+    assert writer.stats["links"] == 3
+
+
+def test_entity_statement_runs_on_the_pinned_server():
+    # Scoped subqueries, CALL (e, row) { ... }, need Neo4j 5.23; docker-compose pins 5.18
+    query = ENTITY_QUERY_TMPL.substitute(label="`Person`")
+    assert "CALL (" not in query
+    assert "CALL {\n    WITH e, row\n" in query
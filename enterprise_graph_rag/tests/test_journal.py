@@ -0,0 +1,139 @@
+import asyncio
+from collections import Counter
+from unittest import mock
+
+from llama_index.core import MockEmbedding
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.ingestion.journal import PARSED, IngestionJournal
+
+
+class SlowLLM(CustomLLM):
+    """Async extraction stand-in; a call counts only once it has returned."""
+    delay: float = 0.02
+    completed: list = []
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        raise NotImplementedError
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        await asyncio.sleep(self.delay)
+        self.completed.append(prompt)
+        return CompletionResponse(text="(Alice, MANAGES, Project Apollo)")
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        raise NotImplementedError
+
+
+class FakeStore:
+    def get(self, ids=None, **kwargs):
+        return []
+
+
+class FakeGraph:
+    """Graph stand-in: nothing is ingested yet, every write commits."""
+
+    def __init__(self):
+        self.commits = 0
+
+    def get_store(self):
+        return FakeStore()
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        return []
+
+    def run_write_transaction(self, statements):
+        self.commits += 1
+
+
+def test_journal_stages_only_move_forward(tmp_path, sqlite_connections):
+    journal = IngestionJournal(str(tmp_path / "journal.db"))
+    journal.advance(PARSED, ["a", "b"], "f1")
+    journal.record_extracted("a", "f1", [("Alice", "MANAGES", "Apollo")])
+    journal.advance(PARSED, ["a"], "f1")
+
+    assert journal.extracted(["a", "b"]) == {"a": [("Alice", "MANAGES", "Apollo")]}
+    journal.mark_written(["a"])
+    assert journal.written(["a", "b"]) == {"a"}
+    assert journal.stage_counts("f1") == {"parsed": 1, "extracted": 0, "embedded": 0, "written": 1}
+
+    journal.complete_files(["f1"])
+    assert journal.stage_counts() == {"parsed": 0, "extracted": 0, "embedded": 0, "written": 0}
+    # record_extracted runs once per extracted chunk: nothing may be left open
+    sqlite_connections.assert_all_closed()
+
+
+def test_killed_batch_resumes_without_repeating_extractions(tmp_path, monkeypatch):
+    for name, value in {
+        "MANIFEST_PATH": str(tmp_path / "manifest.db"),
+        "INGESTION_JOURNAL_PATH": str(tmp_path / "journal.db"),
+        "EXTRACTION_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_ENABLED": False,
+        "PREFILTER_BACKEND": "none",
+        "NEAR_DUP_ENABLED": False,
+        "INGESTION_PARSE_WORKERS": 1,
+        "INGESTION_WINDOW_SIZE": 4,
+        "GRAPH_WRITE_BATCH_SIZE": 8,
+        "CHUNK_SIZE": 128,
+        "CHUNK_OVERLAP": 0,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    for f in range(3):
+        (corpus / f"doc{f}.txt").write_text(" ".join(
+            f"Report {f}-{i}: Alice Smith manages Project Apollo {f}-{i} from the Berlin office."
+            for i in range(60)
+        ))
+
+    graph = FakeGraph()
+    llm = SlowLLM(completed=[])
+
+    def pipeline():
+        from knowledge_engine.ingestion.loader import IngestionPipeline
+        p = IngestionPipeline()
+        p.llm = llm
+        p.embedding_service.embed_model = MockEmbedding(embed_dim=16)
+        return p
+
+    async def run_until_killed():
+        task = asyncio.create_task(pipeline().process_directory_async(str(corpus)))
+        # Let part of the batch commit, then kill the worker mid-batch
+        while graph.commits < 1 or len(llm.completed) < 12:
+            assert not task.done()
+            await asyncio.sleep(0.005)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    with mock.patch.object(GraphDatabaseManager, "get_instance", return_value=graph):
+        asyncio.run(run_until_killed())
+        killed_after = len(llm.completed)
+        journal = IngestionJournal(settings.INGESTION_JOURNAL_PATH)
+        counts = journal.stage_counts()
+        assert counts["written"] > 0
+        assert counts["parsed"] > 0  # not everything got extracted before the kill
+
+        result = asyncio.run(pipeline().process_directory_async(str(corpus)))
+
+    assert result["status"] == "success"
+    assert result["resumed_written"] + result["resumed_extracted"] >= killed_after
+    # Every chunk was extracted exactly once across both runs
+    repeats = [prompt for prompt, n in Counter(llm.completed).items() if n > 1]
+    assert not repeats
+    assert len(llm.completed) == result["chunks_extracted"]
+    # Completed files leave nothing behind in the journal
+    assert sum(journal.stage_counts().values()) == 0
@@ -0,0 +1,70 @@
+from knowledge_engine.core.config import settings
+from knowledge_engine.ingestion import loader
+from knowledge_engine.ingestion.loader import KNOWN_HASHES_QUERY, IngestionPipeline
+
+
+class RecordingDB:
+    """Holds the ingested Document hashes; records every lookup."""
+
+    def __init__(self, ingested):
+        self.ingested = set(ingested)
+        self.queries = []
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        self.queries.append((query, sorted(params["hashes"]), access))
+        return [{"hash": h} for h in params["hashes"] if h in self.ingested]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pipeline(db, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(loader.time, "monotonic", clock)
+    pipeline = object.__new__(IngestionPipeline)  # no clients, caches or pools
+    pipeline.db_manager = db
+    pipeline._known_hashes = set()
+    pipeline._known_hashes_loaded_at = clock()
+    return pipeline, clock
+
+
+def test_candidates_are_checked_in_batches(monkeypatch):
+    monkeypatch.setattr(settings, "HASH_CHECK_BATCH_SIZE", 3)
+    db = RecordingDB(["h1", "h4", "h7"])
+    pipeline, _ = _pipeline(db, monkeypatch)
+
+    candidates = [f"h{i}" for i in range(8)] + ["h1"]  # duplicates are sent once
+    assert pipeline._get_processed_hashes(candidates) == {"h1", "h4", "h7"}
+
+    assert len(db.queries) == 3
+    assert all(query is KNOWN_HASHES_QUERY and access == "read" for query, _, access in db.queries)
+    assert sorted(h for _, batch, _ in db.queries for h in batch) == [f"h{i}" for i in range(8)]
+    assert max(len(batch) for _, batch, _ in db.queries) == 3
+
+
+def test_confirmed_hashes_are_cached_until_the_ttl_expires(monkeypatch):
+    monkeypatch.setattr(settings, "KNOWN_HASH_CACHE_TTL", 300)
+    db = RecordingDB(["h1", "h2"])
+    pipeline, clock = _pipeline(db, monkeypatch)
+
+    assert pipeline._get_processed_hashes(["h1", "h2"]) == {"h1", "h2"}
+    assert len(db.queries) == 1
+
+    # Within the TTL: confirmed hashes cost no query; only the new candidate is sent
+    clock.now += 299
+    assert pipeline._get_processed_hashes(["h1", "h2", "h3"]) == {"h1", "h2"}
+    assert db.queries[-1][1] == ["h3"]
+    assert pipeline._get_processed_hashes(["h1", "h2"]) == {"h1", "h2"}
+    assert len(db.queries) == 2
+
+    # After expiry a deletion (e.g. reset_db) is noticed
+    db.ingested.discard("h2")
+    clock.now += 2
+    assert pipeline._get_processed_hashes(["h1", "h2"]) == {"h1"}
+    assert db.queries[-1][1] == ["h1", "h2"]
+    assert len(db.queries) == 3
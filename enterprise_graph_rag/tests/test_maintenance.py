@@ -0,0 +1,57 @@
+import pytest
+
+from fakes import FakeRedis
+from services.worker.maintenance import LOCK_KEY, CleanupCoalescer
+
+
+class FakeCleaner:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.resolved = []
+
+    def resolve_entities(self, entity_ids):
+        if self.fail:
+            raise RuntimeError("neo4j unavailable")
+        self.resolved.append(set(entity_ids))
+        return {"merged_entities": 1}
+
+    def remove_orphans(self):
+        return 2
+
+    def remove_noise_nodes(self):
+        raise AssertionError("noise cleanup is not part of the scheduled pass")
+
+
+def test_requests_coalesce_into_one_pass():
+    coalescer = CleanupCoalescer(FakeRedis(), lock_timeout=60)
+    for ids in (["Alice"], ["Bob", "Alice"], []):
+        coalescer.request(ids)
+    cleaner = FakeCleaner()
+
+    result = coalescer.run(lambda: cleaner)
+    assert result == {"status": "success", "entities": 2, "merged_entities": 1, "orphans": 2}
+    assert cleaner.resolved == [{"Alice", "Bob"}]
+    # Nothing ingested since: the next tick does not touch the graph
+    assert coalescer.run(lambda: pytest.fail("cleaner created")) == {"status": "clean"}
+
+
+def test_a_running_cleanup_blocks_the_rest_of_the_fleet():
+    redis_client = FakeRedis()
+    coalescer = CleanupCoalescer(redis_client, lock_timeout=60)
+    coalescer.request(["Alice"])
+    redis_client.locks.add(LOCK_KEY)
+
+    assert coalescer.run(lambda: pytest.fail("cleaner created")) == {"status": "locked"}
+    redis_client.locks.clear()
+    assert coalescer.run(FakeCleaner)["status"] == "success"
+
+
+def test_failed_pass_hands_its_work_to_the_next_one():
+    coalescer = CleanupCoalescer(FakeRedis(), lock_timeout=60)
+    coalescer.request(["Alice"])
+
+    with pytest.raises(RuntimeError):
+        coalescer.run(lambda: FakeCleaner(fail=True))
+    cleaner = FakeCleaner()
+    assert coalescer.run(lambda: cleaner)["status"] == "success"
+    assert cleaner.resolved == [{"Alice"}]
@@ -0,0 +1,67 @@
+import os
+import hashlib
+import pytest
+from knowledge_engine.ingestion.manifest import FileManifest, compute_file_hash
+
+@pytest.fixture
+def corpus(tmp_path):
+    data = tmp_path / "raw"
+    (data / "nested").mkdir(parents=True)
+    (data / "a.txt").write_text("Alice manages Project Apollo.")
+    (data / "nested" / "b.txt").write_text("Bob works on Project Gemini.")
+    (data / ".hidden").write_text("ignored")
+    return data
+
+def test_hash_matches_sha256(tmp_path):
+    path = tmp_path / "big.bin"
+    payload = os.urandom(3 * 1024 * 1024 + 17)
+    path.write_bytes(payload)
+    assert compute_file_hash(str(path), buffer_size=64 * 1024) == hashlib.sha256(payload).hexdigest()
+
+def test_unchanged_files_served_from_manifest(tmp_path, corpus):
+    manifest = FileManifest(str(tmp_path / "manifest.db"), hash_workers=2)
+
+    first = manifest.scan(str(corpus))
+    assert first.hashed == 2
+    assert first.from_manifest == 0
+
+    # Second scan: stat is unchanged, nothing is read again
+    second = manifest.scan(str(corpus))
+    assert second.hashed == 0
+    assert second.from_manifest == 2
+    assert sorted(first.files) == sorted(second.files)
+
+def test_modified_file_is_rehashed(tmp_path, corpus):
+    manifest = FileManifest(str(tmp_path / "manifest.db"))
+    manifest.scan(str(corpus))
+
+    target = corpus / "a.txt"
+    target.write_text("Alice now manages Project Artemis.")
+    os.utime(target, ns=(0, os.stat(target).st_mtime_ns + 1_000_000))
+
+    scan = manifest.scan(str(corpus))
+    assert scan.hashed == 1
+    assert scan.from_manifest == 1
+    assert dict(scan.files)[str(target)] == compute_file_hash(str(target))
+
+def test_deleted_files_are_pruned_from_the_manifest(tmp_path, corpus):
+    manifest = FileManifest(str(tmp_path / "manifest.db"))
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "c.txt").write_text("Carol leads Project Hermes.")
+    manifest.scan(str(corpus))
+    manifest.scan(str(other))
+
+    (corpus / "nested" / "b.txt").unlink()
+    scan = manifest.scan(str(corpus))
+    assert scan.pruned == 1 and scan.from_manifest == 1
+
+    # Rows of other directories are kept
+    assert manifest.scan(str(other)).from_manifest == 1
+    assert manifest.scan(str(corpus)).pruned == 0
+
+def test_connections_are_closed(tmp_path, corpus, sqlite_connections):
+    manifest = FileManifest(str(tmp_path / "manifest.db"))
+    manifest.scan(str(corpus))
+
+    sqlite_connections.assert_all_closed()
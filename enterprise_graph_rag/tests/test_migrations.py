@@ -0,0 +1,66 @@
+from knowledge_engine.core.database import GraphDatabaseManager, build_migrations
+
+
+class FakeNeo4j:
+    """Just enough of run_cypher to hold __SchemaMigration nodes."""
+
+    def __init__(self, fail_on=None):
+        self.migrations = {}
+        self.statements = []
+        self.fail_on = fail_on
+
+    def run_cypher(self, query, params=None):
+        if "RETURN m.version" in query:
+            return [{"version": v, "checksum": c} for v, c in self.migrations.items()]
+        if "MERGE (m:__SchemaMigration" in query:
+            self.migrations[params["version"]] = params["checksum"]
+            return []
+        if self.fail_on and self.fail_on in query:
+            raise RuntimeError("constraint blocked by duplicate data")
+        self.statements.append(query)
+        return []
+
+
+def _manager(fake):
+    manager = object.__new__(GraphDatabaseManager)  # skip connecting
+    manager.run_cypher = fake.run_cypher
+    return manager
+
+
+def test_migrations_apply_once_and_report_backed_queries():
+    fake = FakeNeo4j()
+    manager = _manager(fake)
+
+    first = manager.migrate()
+    assert {step["status"] for step in first} == {"new"}
+    assert any("entity_name_index" in s for s in fake.statements)
+    assert any("`vector.dimensions`: 1536" in s for s in fake.statements)
+    assert any("HybridSearchTool" in q for step in first for q in step["backs"])
+
+    executed = len(fake.statements)
+    second = manager.migrate()
+    assert {step["status"] for step in second} == {"applied"}
+    assert len(fake.statements) == executed  # nothing re-run
+
+
+def test_failed_step_is_retried_and_changed_step_is_flagged():
+    fake = FakeNeo4j(fail_on="document_file_hash_unique")
+    manager = _manager(fake)
+
+    report = manager.migrate()
+    assert report[0]["status"] == "failed" and 1 not in fake.migrations
+    assert all(step["status"] == "new" for step in report[1:])
+
+    fake.fail_on = None
+    assert manager.migrate()[0]["status"] == "new"
+
+    changed = manager.migrate(build_migrations(embedding_dimensions=3072))
+    statuses = {step["name"]: step["status"] for step in changed}
+    assert statuses["vector_indexes"] == "changed"
+    assert statuses["entity_normalized_name"] == "applied"
+
+
+def test_statements_avoid_scoped_subqueries():
+    # CALL (x) { ... } needs Neo4j 5.23; docker-compose pins 5.18
+    statements = [s for m in build_migrations(embedding_dimensions=1536) for s in m.statements]
+    assert not [s for s in statements if "CALL (" in s]
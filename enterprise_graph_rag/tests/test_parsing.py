@@ -0,0 +1,72 @@
+import pytest
+
+from knowledge_engine.ingestion.parsing import ParseStage, list_spool, read_spool, write_spool
+
+
+@pytest.mark.asyncio
+async def test_process_pool_parse_matches_in_process(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text(" ".join(f"Alice met Bob about Project Apollo {i}." for i in range(300)))
+
+    pooled = ParseStage(workers=2, chunk_size=128, chunk_overlap=16)
+    inline = ParseStage(workers=1, chunk_size=128, chunk_overlap=16)
+    try:
+        a = await pooled.parse(str(doc), "hash-1")
+        b = await inline.parse(str(doc), "hash-1")
+    finally:
+        pooled.close()
+
+    assert len(a) > 1
+    assert [n.id_ for n in a] == [n.id_ for n in b]
+    assert all(n.metadata["file_hash"] == "hash-1" for n in a)
+
+
+@pytest.mark.asyncio
+async def test_spool_round_trip(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("Alice manages Project Apollo. " * 50)
+    nodes = await ParseStage(workers=1, chunk_size=64, chunk_overlap=8).parse(str(doc), "hash-2")
+
+    spool_dir = tmp_path / "spool"
+    write_spool(str(spool_dir), str(doc), "hash-2", nodes)
+    [entry] = list_spool(str(spool_dir))
+    file_path, file_hash, restored = read_spool(entry)
+
+    assert (file_path, file_hash) == (str(doc), "hash-2")
+    assert [n.id_ for n in restored] == [n.id_ for n in nodes]
+    assert [n.text for n in restored] == [n.text for n in nodes]
+    assert "chunk_hash" in restored[0].excluded_llm_metadata_keys
+
+
+def test_billiard_daemon_parses_in_a_thread(monkeypatch):
+    import billiard
+
+    monkeypatch.setattr(billiard, "current_process", lambda: type("Child", (), {"daemon": True})())
+    assert ParseStage(workers=4, chunk_size=128, chunk_overlap=16)._get_pool() is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_shuts_down_the_parse_pool(tmp_path, monkeypatch):
+    from knowledge_engine.core.config import settings
+    from knowledge_engine.core.database import GraphDatabaseManager
+    from knowledge_engine.ingestion.loader import IngestionPipeline
+
+    monkeypatch.setattr(settings, "MANIFEST_PATH", str(tmp_path / "manifest.db"))
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_BACKEND", "none")
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "INGESTION_JOURNAL_ENABLED", False)
+    monkeypatch.setattr(settings, "INGESTION_STAGES", "parse")
+    monkeypatch.setattr(settings, "INGESTION_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setattr(settings, "INGESTION_PARSE_WORKERS", 2)
+    monkeypatch.setattr(GraphDatabaseManager, "get_instance", classmethod(
+        lambda cls: type("NoGraph", (), {"run_cypher": lambda self, *a, **k: []})()
+    ))
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "doc.txt").write_text("Alice manages Project Apollo. " * 50)
+
+    pipeline = IngestionPipeline()
+    result = await pipeline.process_directory_async(str(corpus))
+
+    assert result["status"] == "spooled" and result["processed"] == 1
+    assert pipeline.parse_stage._pool is None
@@ -0,0 +1,40 @@
+from llama_index.core.schema import TextNode
+
+from knowledge_engine.ingestion.prefilter import LexicalScorer, build_prefilter
+
+ENTITIES = ["Person", "Organization", "Project", "Location"]
+RELATIONS = ["MANAGES", "REPORTS_TO", "LOCATED_AT"]
+
+TOC = "\n".join([
+    "Table of Contents",
+    "1. Introduction ........................ 3",
+    "2. Scope ............................... 5",
+    "3. Definitions ......................... 9",
+    "4. Responsibilities .................... 12",
+])
+PAGE_FURNITURE = "Page 12 of 40  |  Rev 3  |  2024-01-01  |  1 2 3 4 5 6 7 8"
+PROSE = "Alice Smith manages Project Apollo from the Berlin office and reports to Bob Jones, the CTO of Acme Corp."
+
+
+def test_lexical_scorer_separates_boilerplate_from_prose():
+    scorer = LexicalScorer(ENTITIES, RELATIONS)
+    assert scorer.score(TOC) < 0.1
+    assert scorer.score(PAGE_FURNITURE) < 0.2
+    assert scorer.score("Short.") == 0.0
+    assert scorer.score(PROSE) > 0.8
+
+
+def test_prefilter_routes_low_scoring_chunks_past_the_llm():
+    prefilter = build_prefilter("lexical", 0.2, ENTITIES, RELATIONS, spacy_model="unused")
+    nodes = [TextNode(text=TOC), TextNode(text=PROSE), TextNode(text=PAGE_FURNITURE)]
+
+    keep, skip = prefilter.split(nodes)
+
+    assert [n.text for n in keep] == [PROSE]
+    assert len(skip) == 2
+    assert build_prefilter("none", 0.2, ENTITIES, RELATIONS, "unused") is None
+
+
+def test_missing_spacy_model_falls_back_to_lexical():
+    prefilter = build_prefilter("spacy", 0.2, ENTITIES, RELATIONS, spacy_model="no_such_model")
+    assert [s.name for s in prefilter.scorers] == ["lexical"]
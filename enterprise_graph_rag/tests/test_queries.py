@@ -0,0 +1,107 @@
+import pytest
+from prometheus_client import REGISTRY
+from structlog.testing import capture_logs
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.queries import QUERY_REGISTRY, CypherQuery, redact_params, register_query
+
+# Importing the modules registers their queries
+import knowledge_engine.ingestion.cleaner  # noqa: F401
+import knowledge_engine.ingestion.loader  # noqa: F401
+
+SEARCH = register_query("tests.search", "MATCH (e:Entity {name: $name}) RETURN e.name AS name")
+
+
+class Record(dict):
+    def data(self):
+        return dict(self)
+
+
+class Summary:
+    profile = {
+        "operatorType": "ProduceResults", "rows": 1, "dbHits": 0,
+        "children": [{"operatorType": "NodeIndexSeek", "rows": 1, "dbHits": 2, "children": []}],
+    }
+
+
+class Result(list):
+    def consume(self):
+        return Summary()
+
+
+class Driver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self, **config):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def run(self, query, params):
+        self.queries.append(query)
+        return Result([Record(name=params["name"])])
+
+
+def make_db():
+    db = object.__new__(GraphDatabaseManager)  # skip connecting
+    db._driver = Driver()
+    db._ready = True
+    return db
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {"query": "tests.search", **labels}) or 0
+
+
+def test_registry_names_every_graph_query():
+    assert {"writer.entities", "resolution.fetch_all", "loader.known_hashes", "cleanup.noise.delete"} <= set(QUERY_REGISTRY)
+    assert register_query("tests.search", str(SEARCH)) is not None  # re-registering the same text is fine
+    with pytest.raises(ValueError):
+        register_query("tests.search", "MATCH (n) RETURN n")
+
+    template = QUERY_REGISTRY["resolution.move_outgoing"].substitute(type="`WORKS_ON`")
+    assert isinstance(template, CypherQuery) and template.name == "resolution.move_outgoing"
+    assert "[r:`WORKS_ON`]" in template
+
+
+def test_executions_are_timed_and_slow_ones_logged_redacted(monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    db = make_db()
+    before = sample("graph_query_duration_seconds_count", access="write")
+
+    with capture_logs() as logs:
+        assert db.run_cypher(SEARCH, {"name": "Alice Smith", "limit": 5}) == [{"name": "Alice Smith"}]
+
+    assert sample("graph_query_duration_seconds_count", access="write") == before + 1
+    assert sample("graph_query_rows_sum") >= 1
+    slow, = [log for log in logs if log["event"] == "slow_cypher_query"]
+    assert slow["query"] == "tests.search"
+    assert slow["params"] == {"name": "<str:11>", "limit": 5}
+    assert "Alice" not in str(logs)
+
+
+def test_sampled_executions_run_under_profile(monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_PROFILE_SAMPLE_RATE", 1.0)
+    db = make_db()
+
+    with capture_logs() as logs:
+        db.run_cypher(SEARCH, {"name": "Bob"})
+        db.run_cypher("CREATE INDEX x IF NOT EXISTS FOR (n:X) ON (n.y)", {"name": "-"})
+
+    assert db._driver.queries[0].startswith("PROFILE MATCH")
+    assert not db._driver.queries[1].startswith("PROFILE")  # ad-hoc text is never profiled
+    profile, = [log for log in logs if log["event"] == "cypher_query_profile"]
+    assert profile["db_hits"] == 2
+    assert profile["operators"][1] == "NodeIndexSeek(rows=1, db_hits=2)"
+
+
+def test_redaction_keeps_shapes_only():
+    assert redact_params({"rows": [{"id": "x"}] * 3, "meta": {"user_id": "u1", "k": 2}, "flag": True}) == {
+        "rows": "<list:3>", "meta": {"user_id": "<str:2>", "k": 2}, "flag": True,
+    }
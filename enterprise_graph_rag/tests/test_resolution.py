@@ -0,0 +1,174 @@
+import json
+
+
+from knowledge_engine.ingestion.resolution import (
+    MOVE_INCOMING_TMPL, MOVE_OUTGOING_TMPL, EntityResolver, EntityTable, name_qualifiers, soundex
+)
+
+
+def _table(*entities):
+    table = EntityTable()
+    for name, label, degree in entities:
+        table.add({"id": name, "name": name, "labels": ["__Node__", "__Entity__", "Entity", label],
+                   "degree": degree})
+    return table
+
+
+class FakeGraph:
+    """Serves entity lookups and records merge transactions."""
+
+    def __init__(self, table=None, embeddings=None):
+        self.table = table
+        self.embeddings = embeddings or {}
+        self.transactions = []
+        self.transaction_reads = []
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        if "STARTS WITH prefix" in query:
+            return [{"id": i, "name": n, "labels": ["__Entity__", label], "degree": d}
+                    for i, n, label, d in zip(self.table.ids, self.table.names, self.table.labels, self.table.degrees)
+                    if any(n.lower().startswith(p) for p in params["prefixes"])]
+        if "e.embedding AS embedding" in query:
+            return [{"id": i, "embedding": self.embeddings.get(i)} for i in params["ids"]]
+        return []
+
+    def _read_in_transaction(self, query, params=None):
+        self.transaction_reads.append(query.name)
+        if "type(r) AS type" in query:
+            return [{"type": "MENTIONS"}, {"type": "WORKS_ON"}]
+        return []
+
+    def iter_cypher(self, query, params=None, fetch_size=None, row_format="dict", access="write"):
+        assert row_format == "tuple"
+        self.fetch_size = fetch_size
+        for i, n, label, d in zip(self.table.ids, self.table.names, self.table.labels, self.table.degrees):
+            yield i, n, ["__Node__", "__Entity__", label], d
+
+    def run_write_transaction(self, statements):
+        self.transactions.append(statements)
+
+    def run_planned_write_transaction(self, plan):
+        self.transactions.append(plan(self._read_in_transaction))
+
+
+def test_soundex():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert soundex("Ashcraft") == "A261"
+    assert soundex("123") == ""
+
+
+def test_plan_merges_variants_within_a_type_only():
+    table = _table(
+        ("Alice Smith", "Person", 9),
+        ("alice smith.", "Person", 1),
+        ("ALICE  SMITH", "Person", 2),
+        ("Alan Smith", "Person", 3),
+        ("Apple", "Organization", 5),
+        ("Apple", "Project", 1),
+    )
+    plan = EntityResolver(FakeGraph(), embedding_threshold=2.0).plan(table)
+
+    assert len(plan["clusters"]) == 1
+    cluster = plan["clusters"][0]
+    assert cluster["canonical"]["id"] == "Alice Smith"  # best connected survives
+    assert {d["id"] for d in cluster["duplicates"]} == {"alice smith.", "ALICE  SMITH"}
+    assert plan["merged_entities"] == 2
+
+
+def test_uncertain_pairs_merge_only_when_embeddings_agree():
+    table = _table(("Acme Corporation", "Organization", 4), ("Acme Corporation Ltd", "Organization", 1))
+    close = {"Acme Corporation": [1.0, 0.0], "Acme Corporation Ltd": [0.99, 0.05]}
+    far = {"Acme Corporation": [1.0, 0.0], "Acme Corporation Ltd": [0.0, 1.0]}
+
+    resolver = EntityResolver(None, candidate_threshold=0.6)
+    resolver.db = FakeGraph(embeddings=far)
+    assert resolver.plan(table)["clusters"] == []
+
+    resolver.db = FakeGraph(embeddings=close)
+    plan = resolver.plan(table)
+    assert plan["embedding_checked_pairs"] == 1
+    assert plan["clusters"][0]["duplicates"][0]["id"] == "Acme Corporation Ltd"
+
+
+def test_names_differing_in_numbers_never_merge():
+    assert name_qualifiers("apollo phase ii") == ((), "ii")
+    assert name_qualifiers("data retention policy 2022") == ((2022,), "")
+    assert name_qualifiers("mix") == ((), "")  # a one-word name has no suffix
+
+    for pair in [("Data Retention Policy 2022", "Data Retention Policy 2023"),
+                 ("Apollo Phase I", "Apollo Phase II"),
+                 ("Apollo", "Apollo II")]:
+        # Embeddings that agree: the names alone must keep them apart
+        db = FakeGraph(embeddings=dict.fromkeys(pair, [1.0, 0.0]))
+        plan = EntityResolver(db, candidate_threshold=0.6).plan(_table(*[(name, "Project", 1) for name in pair]))
+        assert plan["clusters"] == [], pair
+        assert plan["qualifier_rejected_pairs"] == 1
+        assert plan["embedding_checked_pairs"] == 0
+
+
+def test_similar_names_need_agreeing_embeddings():
+    table = _table(("Data Retention Policy", "Topic", 3), ("Data Retention Policies", "Topic", 1))
+    resolver = EntityResolver(None)
+
+    resolver.db = FakeGraph(embeddings={"Data Retention Policy": [1.0, 0.0]})  # one missing
+    plan = resolver.plan(table)
+    assert plan["clusters"] == [] and plan["candidate_pairs"] == 1
+
+    resolver.db = FakeGraph(embeddings={"Data Retention Policy": [1.0, 0.0], "Data Retention Policies": [1.0, 0.1]})
+    assert resolver.plan(table)["merged_entities"] == 1
+
+
+def test_moved_relationships_keep_the_duplicates_source_chunks():
+    for template in (MOVE_OUTGOING_TMPL, MOVE_INCOMING_TMPL):
+        on_match = template.split("ON MATCH SET", 1)[1]
+        assert "n.source_chunk_ids" in on_match and "props.source_chunk_ids" in on_match
+        assert "props.triplet_source_id" in on_match  # relations written before source_chunk_ids
+
+
+def test_oversized_blocks_use_sorted_neighbourhood():
+    names = [f"Project {i:05d}" for i in range(3000)] + ["project 00042"]
+    table = _table(*[(n, "Project", 1) for n in names])
+    plan = EntityResolver(FakeGraph(), max_block_size=100, window=5,
+                          embedding_threshold=2.0).plan(table)
+    merged = {(c["canonical"]["id"], d["id"]) for c in plan["clusters"] for d in c["duplicates"]}
+    assert ("Project 00042", "project 00042") in merged
+
+
+def test_incremental_merge_keeps_existing_entity_and_writes_report(tmp_path):
+    existing = _table(("Globex", "Organization", 1), ("globex", "Organization", 7), ("Initech", "Organization", 3))
+    db = FakeGraph(existing)
+    resolver = EntityResolver(db, batch_size=10, report_dir=str(tmp_path))
+
+    report = resolver.resolve_ids(["globex"])
+
+    assert report["merged_entities"] == 1
+    # The new entity is merged into the existing one even though it has more links
+    assert report["clusters"][0]["canonical"]["id"] == "Globex"
+    (statements,) = db.transactions
+    # Relationship types come from the merge transaction itself, not a replica
+    assert db.transaction_reads == ["resolution.relationship_types"]
+    queries = [q for q, _ in statements]
+    assert sum("[r:`MENTIONS`]" in q for q in queries) == 2  # outgoing + incoming
+    assert sum("[r:`WORKS_ON`]" in q for q in queries) == 2
+    assert "DETACH DELETE d" in queries[-1]
+    assert statements[-1][1]["rows"] == [{"canonical": "Globex", "duplicate": "globex"}]
+    assert all("apoc" not in q for q in queries)
+
+    with open(report["report_path"]) as f:
+        assert json.load(f)["clusters"] == report["clusters"]
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    db = FakeGraph(_table(("Globex", "Organization", 1), ("GLOBEX", "Organization", 1)))
+    report = EntityResolver(db, report_dir=str(tmp_path)).resolve_ids(["GLOBEX"], dry_run=True)
+    assert report["merged_entities"] == 1 and report["dry_run"]
+    assert db.transactions == []
+
+
+def test_full_pass_streams_every_entity(tmp_path):
+    db = FakeGraph(_table(("Globex", "Organization", 3), ("globex", "Organization", 1), ("Initech", "Organization", 2)))
+    report = EntityResolver(db, fetch_size=2, report_dir=str(tmp_path)).resolve_all(dry_run=True)
+
+    assert db.fetch_size == 2
+    assert report["mode"] == "full" and report["merged_entities"] == 1
+    assert report["clusters"][0]["canonical"]["id"] == "Globex"
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from llama_index.core.graph_stores import SimplePropertyGraphStore
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager, build_migrations
+from knowledge_engine.retrieval import engine as engine_module
+from knowledge_engine.retrieval.engine import get_retrieval_engine, invalidate_retrieval_engine
+
+
+class StoreOnlyDB:
+    """Just what the engine reads from GraphDatabaseManager."""
+
+    def __init__(self):
+        self.store = SimplePropertyGraphStore()
+        self.schema_generation = 0
+
+    def get_store(self):
+        return self.store
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = StoreOnlyDB()
+    monkeypatch.setattr(GraphDatabaseManager, "get_instance", classmethod(lambda cls: fake))
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+    invalidate_retrieval_engine()
+    yield fake
+    invalidate_retrieval_engine()
+
+
+def test_engine_and_retrievers_are_built_once(db):
+    engine = get_retrieval_engine()
+
+    assert get_retrieval_engine() is engine
+    assert engine.retriever(5) is engine.retriever(5)
+    assert engine.retriever(2) is not engine.retriever(5)
+
+
+def test_model_config_change_rebuilds(db, monkeypatch):
+    engine = get_retrieval_engine()
+
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "gpt-4o-mini")
+    rebuilt = get_retrieval_engine()
+
+    assert rebuilt is not engine
+    assert rebuilt.llm.model == "gpt-4o-mini"
+    assert get_retrieval_engine() is rebuilt
+
+
+def test_schema_migration_or_new_store_rebuilds(db):
+    engine = get_retrieval_engine()
+
+    db.schema_generation += 1
+    after_migration = get_retrieval_engine()
+    db.store = SimplePropertyGraphStore()
+    after_new_store = get_retrieval_engine()
+
+    assert len({id(engine), id(after_migration), id(after_new_store)}) == 3
+
+
+def test_migrate_bumps_schema_generation():
+    manager = object.__new__(GraphDatabaseManager)
+    manager.run_cypher = lambda query, params=None, access="write", bookmarks=None: []
+
+    manager.migrate(build_migrations(settings.EMBEDDING_DIMENSIONS)[:2])
+
+    assert manager.schema_generation == 2
+    assert GraphDatabaseManager.schema_generation == 0
+
+
+def test_cached_setup_is_cheaper_than_rebuilding(db):
+    rebuilds = 20
+    started = time.perf_counter()
+    for _ in range(rebuilds):
+        engine_module.RetrievalEngine(db.store).retriever(5)
+    rebuild_seconds = time.perf_counter() - started
+
+    get_retrieval_engine().retriever(5)
+    started = time.perf_counter()
+    for _ in range(rebuilds):
+        get_retrieval_engine().retriever(5)
+    cached_seconds = time.perf_counter() - started
+
+    assert cached_seconds < rebuild_seconds / 5
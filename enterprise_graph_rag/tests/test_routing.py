@@ -0,0 +1,115 @@
+from unittest import mock
+
+from neo4j import READ_ACCESS, WRITE_ACCESS
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabase, GraphDatabaseManager
+
+
+class Result(list):
+    def consume(self):
+        return None
+
+
+class StandInSession:
+    """
+    Single-instance stand-in that keeps bookmarks the way the driver does: a
+    session starts from its bookmark manager's (plus explicit) bookmarks, and
+    a committed write replaces them with the new one.
+    """
+
+    def __init__(self, server, config):
+        self.server = server
+        self.config = config
+        manager = config.get("bookmark_manager")
+        explicit = config.get("bookmarks")
+        self.waits_for = set(manager.get_bookmarks() if manager else ()) | set(explicit.raw_values if explicit else ())
+        self.wrote = False
+
+    def __enter__(self):
+        self.server.sessions.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        manager = self.config.get("bookmark_manager")
+        if self.wrote and manager:
+            self.server.commits += 1
+            manager.update_bookmarks(self.waits_for, [f"FB:tx{self.server.commits}"])
+
+    def run(self, query, params=None):
+        self.wrote = self.wrote or query.lstrip().startswith(("CREATE", "MERGE", "MATCH (n) DETACH"))
+        return Result()
+
+    def execute_write(self, work):
+        self.wrote = True
+        return work(self)
+
+
+class StandInServer:
+    def __init__(self):
+        self.sessions = []
+        self.commits = 0
+
+    def session(self, **config):
+        return StandInSession(self, config)
+
+
+def manager(monkeypatch, server):
+    monkeypatch.setattr(GraphDatabaseManager, "_instance", None)
+    with mock.patch.object(GraphDatabase, "driver", return_value=server):
+        db = GraphDatabaseManager.get_instance()
+    db._ready = True  # schema is not under test
+    return db
+
+
+def test_single_instance_default_sessions_when_routing_is_off(monkeypatch):
+    monkeypatch.setattr(settings, "NEO4J_ROUTING_ENABLED", False)
+    server = StandInServer()
+    db = manager(monkeypatch, server)
+
+    db.run_cypher("MATCH (e:Entity) RETURN e", access="read", bookmarks=["FB:elsewhere"])
+    db.run_write_transaction([("MERGE (e:Entity {name: $name})", {"name": "Alice"})])
+
+    assert [s.config for s in server.sessions] == [{}, {}]
+    assert db.last_bookmarks() == []
+
+
+def test_reads_route_to_replicas_and_see_earlier_writes(monkeypatch):
+    monkeypatch.setattr(settings, "NEO4J_ROUTING_ENABLED", True)
+    server = StandInServer()
+    worker = manager(monkeypatch, server)
+
+    worker.run_write_transaction([("MERGE (e:Entity {name: $name})", {"name": "Alice"})])
+    worker.run_cypher("MATCH (e:Entity) RETURN e", access="read")
+    list(worker.iter_cypher("MATCH (e:Entity) RETURN e", access="read"))
+
+    write, read, stream = server.sessions
+    assert write.config["default_access_mode"] == WRITE_ACCESS
+    assert read.config["default_access_mode"] == stream.config["default_access_mode"] == READ_ACCESS
+    # Same process: the reads wait for the write through the shared bookmark manager
+    assert worker.last_bookmarks() == ["FB:tx1"]
+    assert read.waits_for == stream.waits_for == {"FB:tx1"}
+
+    # Another process (the API) reads with the bookmarks the ingestion task returned
+    api = manager(monkeypatch, server)
+    api.run_cypher("MATCH (e:Entity) RETURN e", access="read", bookmarks=worker.last_bookmarks())
+    assert server.sessions[-1].waits_for == {"FB:tx1"}
+    api.run_cypher("MATCH (e:Entity) RETURN e", access="read")
+    assert server.sessions[-1].waits_for == set()
+
+
+def test_planned_write_reads_in_its_own_write_transaction(monkeypatch):
+    monkeypatch.setattr(settings, "NEO4J_ROUTING_ENABLED", True)
+    server = StandInServer()
+    db = manager(monkeypatch, server)
+    seen = []
+
+    def plan(read):
+        seen.append(read("MATCH (d) RETURN d"))
+        return [("MERGE (e:Entity {name: $name})", {"name": "Alice"})]
+
+    db.run_planned_write_transaction(plan)
+
+    (session,) = server.sessions
+    assert session.config["default_access_mode"] == WRITE_ACCESS
+    assert seen == [[]] and session.wrote
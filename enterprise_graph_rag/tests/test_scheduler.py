@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.graph_stores.types import KG_RELATIONS_KEY
+from llama_index.llms.openai import OpenAI
+
+from knowledge_engine.ingestion.extractor import CachedPathExtractor
+from knowledge_engine.ingestion.scheduler import AdaptiveScheduler, retry_after_seconds
+from fakes import FakeOpenAIServer
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+        self.status_code = 429
+
+class RateLimited(Exception):
+    def __init__(self, retry_after="0.01"):
+        super().__init__("429")
+        self.status_code = 429
+        self.response = _Response({"retry-after": retry_after})
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(RateLimited("2")) == 2.0
+    assert retry_after_seconds(Exception("boom")) is None
+
+@pytest.mark.asyncio
+async def test_aimd_backs_off_and_recovers():
+    scheduler = AdaptiveScheduler("test", initial_limit=8, max_limit=8)
+    attempts = {"n": 0}
+
+    async def flaky():
+        attempts["n"] += 1
+        if attempts["n"] == 1:
+            raise RateLimited()
+        return "ok"
+
+    assert await scheduler.run(flaky) == "ok"
+    assert scheduler.throttled == 1
+    assert scheduler.limit == 4  # multiplicative decrease
+
+    async def ok():
+        return "ok"
+
+    for _ in range(40):
+        await scheduler.run(ok, tokens=10)
+    assert scheduler.limit == 8  # additive increase back to the ceiling
+    assert scheduler.metrics()["tokens_per_minute"] == 400
+
+@pytest.mark.asyncio
+async def test_non_rate_limit_errors_propagate():
+    scheduler = AdaptiveScheduler("test", initial_limit=2)
+
+    async def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await scheduler.run(broken)
+    assert scheduler.metrics()["in_flight"] == 0
+    assert scheduler.limit == 2
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_without_lowering_the_limit():
+    scheduler = AdaptiveScheduler("test", initial_limit=4, max_limit=4, max_retries=2, default_backoff=0.01)
+    failures = [TimeoutError("read timed out"), ConnectionResetError("reset by peer")]
+
+    async def flaky():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert await scheduler.run(flaky) == "ok"
+    assert scheduler.transient_errors == 2
+    assert scheduler.throttled == 0 and scheduler.limit == 4
+
+    async def down():
+        raise ConnectionResetError("reset by peer")
+
+    with pytest.raises(ConnectionResetError):
+        await scheduler.run(down)
+    assert scheduler.transient_errors == 5  # first try + max_retries
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_hands_its_slot_to_a_waiter():
+    scheduler = AdaptiveScheduler("test", initial_limit=1, max_limit=1)
+    hold = asyncio.Event()
+
+    async def slow():
+        await hold.wait()
+
+    async def quick():
+        return "done"
+
+    holder = asyncio.create_task(scheduler.run(slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(scheduler.run(quick))
+    await asyncio.sleep(0)
+    assert scheduler.metrics()["queue_depth"] == 1
+
+    holder.cancel()
+    # Nothing else releases a slot: the waiter must be woken by the cancellation
+    assert await asyncio.wait_for(waiter, timeout=1) == "done"
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_extraction_against_fake_llm_with_429s():
+    with FakeOpenAIServer(latency=0.02, rate_limit_every=5, retry_after=0.05) as server:
+        llm = OpenAI(model="gpt-4o", api_key="test", api_base=server.url, max_retries=0)
+        scheduler = AdaptiveScheduler("extraction", initial_limit=4, max_limit=6)
+        extractor = CachedPathExtractor(
+            llm=llm,
+            allowed_entity_types=["Person", "Project"],
+            allowed_relation_types=["MANAGES"],
+            model_name="gpt-4o",
+            scheduler=scheduler,
+        )
+        nodes = [TextNode(text=f"Alice Smith manages Project Apollo {i} with Bob.") for i in range(30)]
+
+        results = await extractor.acall(nodes)
+
+    assert all(len(n.metadata[KG_RELATIONS_KEY]) > 0 for n in results)
+    assert server.throttled > 0
+    assert scheduler.throttled == server.throttled
+    assert scheduler.completed == 30
+    assert server.max_in_flight <= 6
+
+
+@pytest.mark.asyncio
+async def test_extraction_against_fake_llm_with_500s():
+    with FakeOpenAIServer(server_error_every=4) as server:
+        llm = OpenAI(model="gpt-4o", api_key="test", api_base=server.url, max_retries=0)
+        scheduler = AdaptiveScheduler("extraction", initial_limit=4, max_limit=4, default_backoff=0.01)
+        extractor = CachedPathExtractor(
+            llm=llm,
+            allowed_entity_types=["Person", "Project"],
+            allowed_relation_types=["MANAGES"],
+            model_name="gpt-4o",
+            scheduler=scheduler,
+        )
+        nodes = [TextNode(text=f"Alice Smith manages Project Apollo {i} with Bob.") for i in range(20)]
+
+        results = await extractor.acall(nodes)
+
+    assert all(len(n.metadata[KG_RELATIONS_KEY]) > 0 for n in results)
+    assert server.server_errors > 0
+    assert scheduler.transient_errors == server.server_errors
+    assert scheduler.completed == 20
+    assert scheduler.throttled == 0 and scheduler.limit == 4
@@ -0,0 +1,123 @@
+from unittest import mock
+
+import pytest
+
+from knowledge_engine.core.database import (
+    AsyncGraphDatabase,
+    AsyncGraphDatabaseManager,
+    GraphDatabase,
+    GraphDatabaseManager,
+    build_migrations,
+)
+
+
+class Row(dict):
+    def data(self):
+        return dict(self)
+
+    def values(self):
+        return list(dict.values(self))
+
+
+class StubResult:
+    """Hands out records lazily, counting how many the caller pulled."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pulled = 0
+
+    def keys(self):
+        return list(self.rows[0])
+
+    def __iter__(self):
+        for row in self.rows:
+            self.pulled += 1
+            yield row
+
+
+class StubDriver:
+    """Sync driver stand-in that counts connection work."""
+
+    def __init__(self, rows=()):
+        self.verified = 0
+        self.queries = []
+        self.result = StubResult([Row(r) for r in rows])
+        self.sessions = []
+
+    def verify_connectivity(self):
+        self.verified += 1
+
+    def session(self, **config):
+        self.sessions.append(config)
+        return StubSession(self)
+
+    def execute_query(self, query, database_=None, parameters_=None):
+        self.queries.append(query.text)
+        return [Row(versions=["5.26.0"])], None, None
+
+
+class StubSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def run(self, query, params):
+        self.driver.queries.append(query)
+        return self.driver.result if query.startswith("MATCH (e)") else []
+
+
+def test_one_lazy_driver_serves_cypher_and_the_store(monkeypatch):
+    monkeypatch.setattr(GraphDatabaseManager, "_instance", None)
+    monkeypatch.setattr(AsyncGraphDatabaseManager, "_instance", None)
+    driver = StubDriver()
+
+    with mock.patch.object(GraphDatabase, "driver", return_value=driver) as sync_factory, \
+            mock.patch.object(AsyncGraphDatabase, "driver", return_value=object()) as async_factory:
+        db = GraphDatabaseManager.get_instance()
+        # Startup does no network work
+        assert driver.verified == 0 and driver.queries == []
+
+        db.run_cypher("MATCH (n) RETURN n")
+        db.run_cypher("MATCH (n) RETURN n")
+        assert driver.verified == 1
+        # Pending migrations ran once, on first use
+        assert len([q for q in driver.queries if "MERGE (m:__SchemaMigration" in q]) == len(build_migrations(1536))
+
+        store = db.get_store()
+        assert store.client is driver
+        assert db.get_store() is store
+        # No second pool, and no schema introspection or index creation by the store
+        assert sync_factory.call_count == 1 and async_factory.call_count == 1
+        assert driver.queries[-1] == "CALL dbms.components()"
+        assert sync_factory.call_args.kwargs["max_connection_pool_size"] > 0
+
+
+def test_iter_cypher_streams_rows_in_each_format(monkeypatch):
+    monkeypatch.setattr(GraphDatabaseManager, "_instance", None)
+    rows = [{"id": f"e{i}", "degree": i} for i in range(5)]
+    query = "MATCH (e) RETURN e.id AS id, e.degree AS degree"
+
+    with mock.patch.object(GraphDatabase, "driver", return_value=StubDriver(rows)):
+        db = GraphDatabaseManager.get_instance()
+        db.ensure_ready()
+        driver = db._driver
+
+        stream = db.iter_cypher(query, fetch_size=2, row_format="tuple")
+        assert next(stream) == ("e0", 0)
+        assert driver.result.pulled == 1  # nothing is buffered ahead of the caller
+        assert driver.sessions[-1]["fetch_size"] == 2
+        stream.close()
+
+        assert list(db.iter_cypher(query))[4] == {"id": "e4", "degree": 4}
+        assert list(db.iter_cypher(query, fetch_size=2, row_format="columns")) == [
+            {"id": ["e0", "e1"], "degree": [0, 1]},
+            {"id": ["e2", "e3"], "degree": [2, 3]},
+            {"id": ["e4"], "degree": [4]},
+        ]
+        with pytest.raises(ValueError):
+            next(db.iter_cypher(query, row_format="arrow"))
@@ -0,0 +1,165 @@
+import os
+import asyncio
+
+import pytest
+from llama_index.core.schema import Document
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.core.exceptions import IngestionError
+from knowledge_engine.ingestion.parsing import chunk_documents, claim_spool, list_spool, write_spool, _get_parser
+
+
+class FakeStore:
+    def get(self, ids=None, **kwargs):
+        return []
+
+
+class FakeGraph:
+    """Nothing ingested yet, every write commits."""
+
+    def get_store(self):
+        return FakeStore()
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        return []
+
+    def run_write_transaction(self, statements):
+        pass
+
+
+class Files:
+    """parse-stage stand-in: yields files of five chunks, counting how many were pulled."""
+
+    def __init__(self, count=None):
+        self.count = count
+        self.pulled = 0
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            while self.count is None or self.pulled < self.count:
+                path = f"/corpus/doc{self.pulled}.txt"
+                documents = [Document(text=f"Paragraph {i} of {path}.",
+                                      metadata={"file_path": path, "file_name": path, "file_hash": path})
+                             for i in range(5)]
+                self.pulled += 1
+                yield path, path, chunk_documents(documents, _get_parser(512, 0))
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    for name, value in {
+        "MANIFEST_PATH": str(tmp_path / "manifest.db"),
+        "EXTRACTION_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_ENABLED": False,
+        "INGESTION_JOURNAL_ENABLED": False,
+        "PREFILTER_BACKEND": "none",
+        "NEAR_DUP_ENABLED": False,
+        "INGESTION_PARSE_WORKERS": 1,
+        "INGESTION_WINDOW_SIZE": 2,
+        "INGESTION_QUEUE_SIZE": 1,
+        "INGESTION_INDEX_WORKERS": 1,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(GraphDatabaseManager, "get_instance", classmethod(lambda cls: FakeGraph()))
+
+    from knowledge_engine.ingestion.loader import IngestionPipeline
+    return IngestionPipeline()
+
+
+def test_windows_are_bounded_and_the_queue_holds_back_the_parser(pipeline):
+    files = Files(count=3)
+    gate = asyncio.Event()
+    windows = []
+
+    async def index(nodes, *args):
+        await gate.wait()
+        windows.append(len(nodes))
+
+    pipeline._index_nodes = index
+
+    async def run():
+        task = asyncio.create_task(pipeline._ingest_stream(files()))
+        for _ in range(50):
+            await asyncio.sleep(0)
+        # One window in the stage, one in the queue, one waiting to be put:
+        # the parser is not asked for a second file
+        assert files.pulled == 1 and windows == []
+        gate.set()
+        return await task
+
+    result = asyncio.run(run())
+
+    assert result["status"] == "success"
+    assert windows == [2, 2, 1] * 3
+    assert result["chunks_extracted"] == 15
+
+
+def test_failing_stage_cancels_the_producer(pipeline):
+    files = Files()  # never runs out: only cancellation stops it
+    indexed = []
+
+    async def index(nodes, *args):
+        if indexed:
+            raise RuntimeError("extraction failed")
+        indexed.append(len(nodes))
+
+    pipeline._index_nodes = index
+
+    async def run():
+        with pytest.raises(IngestionError, match="extraction failed"):
+            await pipeline._ingest_stream(files())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return files.closed
+
+    assert asyncio.run(run()) is True
+    assert indexed == [2]
+    assert files.pulled <= 2
+
+
+def _spool(spool_dir, count):
+    for i in range(count):
+        path = f"/corpus/doc{i}.txt"
+        documents = [Document(text=f"Paragraph of {path}.", metadata={"file_path": path, "file_name": path})]
+        write_spool(str(spool_dir), path, f"hash{i}", chunk_documents(documents, _get_parser(512, 0)))
+    return list_spool(str(spool_dir))
+
+
+def test_extract_only_machines_claim_spool_entries(pipeline, tmp_path, monkeypatch):
+    from knowledge_engine.ingestion import loader
+
+    entries = _spool(tmp_path / "spool", 3)
+    # Another extract-only machine takes the first entry after we listed the spool
+    monkeypatch.setattr(loader, "list_spool", lambda spool_dir: entries)
+    elsewhere = claim_spool(entries[0])
+    assert elsewhere is not None and claim_spool(entries[0]) is None
+
+    indexed = []
+
+    async def index(nodes, *args):
+        indexed.extend(n.metadata["file_path"] for n in nodes)
+
+    pipeline._index_nodes = index
+    result = asyncio.run(pipeline.process_spool_async(str(tmp_path / "spool")))
+
+    assert result["processed"] == 2 and result["skipped"] == 1
+    assert sorted(indexed) == ["/corpus/doc1.txt", "/corpus/doc2.txt"]
+    assert list_spool(str(tmp_path / "spool")) == []
+    assert os.listdir(tmp_path / "spool") == [os.path.basename(elsewhere)]
+
+
+def test_failed_spool_run_hands_its_entries_back(pipeline, tmp_path):
+    entries = _spool(tmp_path / "spool", 2)
+
+    async def index(nodes, *args):
+        raise RuntimeError("neo4j unavailable")
+
+    pipeline._index_nodes = index
+    with pytest.raises(IngestionError):
+        asyncio.run(pipeline.process_spool_async(str(tmp_path / "spool")))
+
+    assert list_spool(str(tmp_path / "spool")) == entries
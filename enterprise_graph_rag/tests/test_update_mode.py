@@ -0,0 +1,347 @@
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+from llama_index.core import MockEmbedding
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import Document
+
+from knowledge_engine.core.config import settings
+from knowledge_engine.core.database import GraphDatabaseManager
+from knowledge_engine.ingestion.loader import (
+    UPDATE_ADOPT_LEGACY_QUERY,
+    UPDATE_RELINK_QUERY,
+    UPDATE_REMOVE_CHUNKS_QUERY,
+    UPDATE_REMOVE_RELATIONS_QUERY,
+    IngestionPipeline,
+)
+from knowledge_engine.ingestion.parsing import chunk_documents, _get_parser
+
+FILE = "/corpus/handbook.txt"
+
+
+class TripleLLM(CustomLLM):
+    """Every chunk mentions Alice; only the Zurich one mentions Carol."""
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake")
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        raise NotImplementedError
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        text = prompt.rsplit("Text: ", 1)[1]
+        triples = ["(Alice, MANAGES, Apollo)"]
+        if "Zurich" in text:
+            triples.append("(Carol, LOCATED_AT, Zurich)")
+        return CompletionResponse(text="\n".join(triples))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs):
+        raise NotImplementedError
+
+
+class ModelGraph:
+    """
+    In-memory model of the graph the loader and writer statements maintain,
+    applied by query name. Records every write transaction.
+    """
+
+    def __init__(self):
+        self.chunks = {}        # id -> properties
+        self.entities = {}      # id -> properties
+        self.documents = []     # {"file_hash", "file_path", "chunks": set()}
+        self.mentions = set()   # (chunk_id, entity_id)
+        self.relations = {}     # (source, type, target) -> properties
+        self.transactions = []
+
+    # --- reads ---
+
+    def get_store(self):
+        graph = self
+
+        class Store:
+            def get(self, ids=None, **kwargs):
+                return [SimpleNamespace(id=i) for i in ids or [] if i in graph.entities]
+
+        return Store()
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        if query.name == "loader.known_hashes":
+            known = {d["file_hash"] for d in self.documents}
+            return [{"hash": h} for h in params["hashes"] if h in known]
+        if query.name == "loader.previous_chunk_hashes":
+            rows = []
+            for path in params["paths"]:
+                for d in self.documents:
+                    if d["file_path"] == path:
+                        hashes = [self.chunks[c].get("chunk_hash") for c in d["chunks"]]
+                        rows.append({"path": path, "file_hash": d["file_hash"],
+                                     "chunk_hashes": [h for h in hashes if h is not None]})
+                    elif d["file_path"] is None and any(
+                        self.chunks[c].get("file_path") == path for c in d["chunks"]
+                    ):
+                        rows.append({"path": path, "file_hash": d["file_hash"], "chunk_hashes": []})
+            return rows
+        raise AssertionError(f"unexpected read {query.name}")
+
+    # --- writes ---
+
+    def run_write_transaction(self, statements):
+        self.transactions.append(statements)
+        for query, params in statements:
+            getattr(self, "_" + query.name.replace(".", "_"))(query, params)
+
+    def _writer_chunks(self, query, params):
+        for row in params["rows"]:
+            self.chunks[row["id"]] = {**row["properties"], "text": row["text"]}
+
+    def _writer_entities(self, query, params):
+        for row in params["rows"]:
+            self.entities[row["id"]] = dict(row["properties"])
+            if row["source_id"]:
+                self.mentions.add((row["source_id"], row["id"]))
+
+    def _writer_mentions(self, query, params):
+        for row in params["rows"]:
+            if row["entity_id"] in self.entities:
+                self.mentions.add((row["source_id"], row["entity_id"]))
+
+    def _writer_relations(self, query, params):
+        rel_type = re.search(r"\[r:`(.+?)`\]", query).group(1)
+        for row in params["rows"]:
+            key = (row["source_id"], rel_type.upper(), row["target_id"])
+            rel = self.relations.setdefault(key, dict(row["properties"]))
+            sources = rel.setdefault("source_chunk_ids", [])
+            if row["source_chunk"] and row["source_chunk"] not in sources:
+                sources.append(row["source_chunk"])
+
+    def _writer_document_links(self, query, params):
+        for row in params["rows"]:
+            doc = next((d for d in self.documents if d["file_hash"] == row["file_hash"]), None)
+            if doc is None:
+                doc = {"file_hash": row["file_hash"], "file_path": row["file_path"], "chunks": set()}
+                self.documents.append(doc)
+            doc["chunks"].update(row["chunk_ids"])
+
+    def _stale_chunks(self, params):
+        return {
+            c for d in self.documents if d["file_path"] == params["file_path"] for c in d["chunks"]
+            if self.chunks[c].get("chunk_hash") in params["removed"] or self.chunks[c].get("chunk_hash") is None
+        }
+
+    def _loader_update_adopt_legacy(self, query, params):
+        for d in self.documents:
+            if d["file_path"] is None and any(
+                self.chunks[c].get("file_path") == params["file_path"] for c in d["chunks"]
+            ):
+                d["file_path"] = params["file_path"]
+
+    def _loader_update_remove_relations(self, query, params):
+        for chunk_id in self._stale_chunks(params):
+            mentioned = {e for c, e in self.mentions if c == chunk_id}
+            for key, rel in list(self.relations.items()):
+                if not mentioned & {key[0], key[2]}:
+                    continue
+                sources = rel.get("source_chunk_ids") or [rel["triplet_source_id"]]
+                if chunk_id not in sources and rel["triplet_source_id"] != chunk_id:
+                    continue
+                rest = [s for s in sources if s != chunk_id]
+                if rest:
+                    rel.update(source_chunk_ids=rest, triplet_source_id=rest[0])
+                else:
+                    del self.relations[key]
+
+    def _loader_update_remove_chunks(self, query, params):
+        stale = self._stale_chunks(params)
+        entities = {e for c, e in self.mentions if c in stale}
+        for chunk_id in stale:
+            del self.chunks[chunk_id]
+        for d in self.documents:
+            d["chunks"] -= stale
+        self.mentions = {(c, e) for c, e in self.mentions if c not in stale}
+        for e in entities:
+            mentioned = any(m == e for _, m in self.mentions)
+            related = any(e in (key[0], key[2]) for key in self.relations)
+            if not mentioned and not related:
+                del self.entities[e]
+
+    def _loader_update_relink(self, query, params):
+        documents = [d for d in self.documents if d["file_path"] == params["file_path"]]
+        if not documents:
+            return
+        keep = documents[0]
+        self.documents = [d for d in self.documents if d is keep or d not in documents]
+        keep["file_hash"] = params["file_hash"]
+        for chunk_id, props in self.chunks.items():
+            if props.get("file_path") == params["file_path"]:
+                props["file_hash"] = params["file_hash"]
+                keep["chunks"].add(chunk_id)
+
+    # --- helpers ---
+
+    def chunk_texts(self):
+        return sorted(p["text"] for p in self.chunks.values())
+
+    def chunk_id(self, fragment):
+        return next(c for c, p in self.chunks.items() if fragment in p["text"])
+
+
+def parsed(file_hash, *paragraphs):
+    documents = [
+        Document(text=text, metadata={"file_path": FILE, "file_hash": file_hash, "file_name": "handbook.txt"})
+        for text in paragraphs
+    ]
+    return chunk_documents(documents, _get_parser(512, 0))
+
+
+V1 = (
+    "Carol opened the Zurich office last spring.",
+    "Alice manages Project Apollo from the second floor.",
+    "Quarterly numbers for Project Apollo look healthy.",
+)
+V2 = V1[1:] + ("Apollo hired two engineers in March.",)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    for name, value in {
+        "MANIFEST_PATH": str(tmp_path / "manifest.db"),
+        "EXTRACTION_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_ENABLED": False,
+        "INGESTION_JOURNAL_ENABLED": False,
+        "PREFILTER_BACKEND": "none",
+        "NEAR_DUP_ENABLED": False,
+        "INGESTION_PARSE_WORKERS": 1,
+        # One chunk per window: later chunks find Alice already buffered or stored
+        "INGESTION_WINDOW_SIZE": 1,
+        "INGESTION_INDEX_WORKERS": 1,
+        "GRAPH_WRITE_FLUSH_INTERVAL": 60,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+    graph = ModelGraph()
+    monkeypatch.setattr(GraphDatabaseManager, "get_instance", classmethod(lambda cls: graph))
+    p = IngestionPipeline()
+    p.llm = TripleLLM()
+    p.embedding_service.embed_model = MockEmbedding(embed_dim=8)
+    p.graph = graph
+    return p
+
+
+def ingest(pipeline, file_hash, paragraphs):
+    async def files():
+        yield FILE, file_hash, parsed(file_hash, *paragraphs)
+
+    return asyncio.run(pipeline._ingest_stream(files()))
+
+
+class RecordingDB:
+    def __init__(self, previous=()):
+        self.previous = list(previous)
+        self.reads = []
+        self.transactions = []
+
+    def run_cypher(self, query, params=None, access="write", bookmarks=None):
+        self.reads.append((query.name, params, access))
+        return self.previous
+
+    def run_write_transaction(self, statements):
+        self.transactions.append(statements)
+
+
+def _bare_pipeline(db):
+    pipeline = object.__new__(IngestionPipeline)  # no clients, caches or pools
+    pipeline.db_manager = db
+    pipeline._known_hashes = {"v1"}
+    return pipeline
+
+
+def test_edit_plans_only_new_chunks_and_removes_vanished_ones():
+    old = parsed("v1", *V1)
+    new = parsed("v2", *V2)
+    db = RecordingDB([{"path": FILE, "file_hash": "v1",
+                       "chunk_hashes": [n.metadata["chunk_hash"] for n in old]}])
+    pipeline = _bare_pipeline(db)
+    stats = {"updated": 0, "chunks_kept": 0, "chunks_removed": 0}
+
+    plan = asyncio.run(pipeline._plan_file(FILE, "v2", new, stats))
+
+    assert plan.is_update
+    assert [n.get_content() for n in plan.new_nodes] == [V2[-1]]
+    assert plan.removed == [old[0].metadata["chunk_hash"]]
+    assert stats == {"updated": 1, "chunks_kept": 2, "chunks_removed": 1}
+    assert db.reads == [("loader.previous_chunk_hashes", {"paths": [FILE]}, "read")]
+    # The old version no longer counts as ingested
+    assert pipeline._known_hashes == set()
+
+
+def test_unknown_path_is_planned_as_a_new_document():
+    pipeline = _bare_pipeline(RecordingDB())
+
+    plan = asyncio.run(pipeline._plan_file(FILE, "v1", parsed("v1", *V1), {}))
+
+    assert not plan.is_update and len(plan.new_nodes) == 3 and plan.removed == []
+
+
+def test_update_runs_adopt_remove_relink_in_one_transaction():
+    db = RecordingDB()
+    pipeline = _bare_pipeline(db)
+
+    pipeline._apply_document_update(FILE, "v2", ["h1", "h2"])
+
+    params = {"file_path": FILE, "file_hash": "v2", "removed": ["h1", "h2"]}
+    assert db.transactions == [[
+        (UPDATE_ADOPT_LEGACY_QUERY, params),
+        (UPDATE_REMOVE_RELATIONS_QUERY, params),
+        (UPDATE_REMOVE_CHUNKS_QUERY, params),
+        (UPDATE_RELINK_QUERY, params),
+    ]]
+
+
+def test_entity_mentioned_by_a_surviving_chunk_outlives_its_first_chunk(pipeline):
+    graph = pipeline.graph
+    ingest(pipeline, "v1", V1)
+    first = graph.chunk_id("Zurich")
+    # Alice is created by the first chunk; the later ones only link to her
+    assert {c for c, e in graph.mentions if e == "Alice"} == set(graph.chunks)
+
+    result = ingest(pipeline, "v2", V2)
+
+    assert result["updated"] == 1 and result["chunks_extracted"] == 1
+    assert graph.chunk_texts() == sorted(V2)
+    assert first not in graph.chunks
+    # Still mentioned by the surviving chunks: kept, with the relation they produce
+    assert "Alice" in graph.entities and "Apollo" in graph.entities
+    manages = graph.relations[("Alice", "MANAGES", "Apollo")]
+    assert first not in manages["source_chunk_ids"] and manages["triplet_source_id"] != first
+    # Only the removed chunk mentioned Carol
+    assert "Carol" not in graph.entities and "Zurich" not in graph.entities
+    assert list(graph.relations) == [("Alice", "MANAGES", "Apollo")]
+    assert [(d["file_path"], d["file_hash"]) for d in graph.documents] == [(FILE, "v2")]
+
+
+def test_document_from_before_update_mode_is_adopted_and_replaced(pipeline):
+    graph = pipeline.graph
+    # What the original loader left: no Document.file_path, no chunk_hash, and
+    # an older version of the same file as a second Document
+    for version in ("v0", "v1"):
+        chunk_id = f"legacy-{version}"
+        graph.chunks[chunk_id] = {"text": f"Zed ran the {version} office.", "file_path": FILE, "file_hash": version}
+        graph.documents.append({"file_hash": version, "file_path": None, "chunks": {chunk_id}})
+        graph.mentions.add((chunk_id, "Zed"))
+    graph.entities["Zed"] = {"triplet_source_id": "legacy-v0"}
+
+    result = ingest(pipeline, "v2", V2)
+
+    assert result["updated"] == 1 and result["chunks_extracted"] == 3
+    assert graph.chunk_texts() == sorted(V2)
+    assert "Zed" not in graph.entities
+    assert len(graph.documents) == 1
+    assert graph.documents[0]["file_path"] == FILE and graph.documents[0]["file_hash"] == "v2"
+    assert graph.documents[0]["chunks"] == set(graph.chunks)